@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     UserPantry, Recipe, 
-    ShoppingList,FoodWasteRecord, ShoppingListItem, RecipeIngredient
+    ShoppingList,FoodWasteRecord, ShoppingListItem, RecipeIngredient,
+    Ingredient, PriceCatalogEntry
 ) 
 
 admin.site.register(UserPantry)
@@ -11,4 +12,5 @@ admin.site.register(ShoppingListItem)
 # admin.site.register(ConsumptionRecord)
 admin.site.register(FoodWasteRecord)
 admin.site.register(RecipeIngredient)
-
+admin.site.register(Ingredient)
+admin.site.register(PriceCatalogEntry)
@@ -7,6 +7,4 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         # Import and connect signals
-        # import core.signals
-
-        pass
\ No newline at end of file
+        import core.signals
\ No newline at end of file
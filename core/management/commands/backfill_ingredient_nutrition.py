@@ -0,0 +1,88 @@
+import statistics
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, UserPantry
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill missing nutrition and category on the shared ingredient catalog from pantry items. "
+        "A value is only used when enough different users agree on it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-users',
+            type=int,
+            default=3,
+            help='Distinct users whose pantry items must back a value (default: 3)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of catalog entries checked per batch (default: 500)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without saving them')
+
+    def handle(self, *args, **options):
+        min_users = max(options['min_users'], 1)
+        fields = Ingredient.NUTRITION_FIELDS
+        last_id = 0
+        checked = 0
+        filled = 0
+        while True:
+            chunk = list(Ingredient.objects.filter(pk__gt=last_id).order_by('pk')[:options['chunk_size']])
+            if not chunk:
+                break
+            last_id = chunk[-1].pk
+            checked += len(chunk)
+            wanted = {i.pk: i for i in chunk if not i.has_nutrition() or i.category == 'other'}
+            if not wanted:
+                continue
+
+            # One reading per user and ingredient (their latest), so one user can't outvote others
+            readings = defaultdict(dict)
+            for ingredient_id, user_id, category, *values in (
+                UserPantry.objects.filter(ingredient_id__in=wanted)
+                .order_by('ingredient_id', 'user_id', '-updated_at')
+                .values_list('ingredient_id', 'user_id', 'category', *fields)
+            ):
+                readings[ingredient_id].setdefault(user_id, (category, values))
+
+            changed = []
+            for ingredient_id, by_user in readings.items():
+                ingredient = wanted[ingredient_id]
+                updates = {}
+                with_nutrition = [values for _, values in by_user.values() if any(values)]
+                if not ingredient.has_nutrition() and len(with_nutrition) >= min_users:
+                    # Per-field median resists a single outlying entry
+                    for index, field in enumerate(fields):
+                        updates[field] = round(statistics.median(v[index] for v in with_nutrition), 2)
+                categories = Counter(c for c, _ in by_user.values() if c and c != 'other')
+                if ingredient.category == 'other' and categories:
+                    category, votes = categories.most_common(1)[0]
+                    if votes >= min_users and votes * 2 > sum(categories.values()):
+                        updates['category'] = category
+                if updates:
+                    for field, value in updates.items():
+                        setattr(ingredient, field, value)
+                    ingredient.updated_at = timezone.now()
+                    changed.append(ingredient)
+                    self.stdout.write(f"{ingredient.normalized_name}: " + ", ".join(
+                        f"{field}={value}" for field, value in updates.items()
+                    ))
+
+            filled += len(changed)
+            if changed and not options['dry_run']:
+                Ingredient.objects.bulk_update(changed, [*fields, 'category', 'updated_at'])
+                # bulk_update skips Ingredient.save(), so flag the affected recipes here
+                Recipe.objects.filter(
+                    recipeingredient__ingredient__in=[i.pk for i in changed]
+                ).update(nutrition_dirty=True)
+
+        action = "Would fill" if options['dry_run'] else "Filled"
+        self.stdout.write(self.style.SUCCESS(f"{action} {filled} of {checked} catalog entries"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.services.spending_rollup import rebuild_monthly_spending
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user monthly spending rollup from confirmed shopping lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only rebuild these user ids (repeatable; default: all users)',
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_monthly_spending(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} monthly spending rows"))
@@ -0,0 +1,74 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Budget, ShoppingList, ShoppingListItem
+from core.views import shopping_list_detail_view
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark rendering the shopping list detail page for large lists. "
+        "Seed data is created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=500, help='Items on the synthetic list (default: 500)')
+        parser.add_argument('--repeat', type=int, default=10, help='Renders to time (default: 10)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        today = timezone.now().date()
+
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(email='benchmark-detail@example.com')
+            Budget.objects.create(
+                user=user, amount=Decimal('500.00'),
+                start_date=today - timedelta(days=1), end_date=today + timedelta(days=6)
+            )
+            sl = ShoppingList.objects.create(
+                user=user, name="Benchmark list", status='generated',
+                budget_limit=Decimal('500.00'), year=today.year
+            )
+            ShoppingListItem.objects.bulk_create([
+                ShoppingListItem(
+                    shopping_list=sl,
+                    item_name=f"item {index}",
+                    quantity=rng.randint(1, 5),
+                    unit='pieces',
+                    estimated_price=Decimal(str(round(rng.uniform(0.5, 10.0), 2))),
+                    priority=rng.choice(['high', 'medium', 'low']),
+                    purchased=rng.random() < 0.3,
+                )
+                for index in range(options['items'])
+            ])
+            ShoppingList.objects.filter(pk=sl.pk).recompute_item_totals()
+
+            factory = RequestFactory()
+            timings = []
+            queries = 0
+            for _ in range(options['repeat']):
+                request = factory.get(f"/shopping-lists/{sl.id}/")
+                request.user = user
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = shopping_list_detail_view(request, sl.id)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = len(ctx.captured_queries)
+
+            self.stdout.write(
+                f"{options['items']} items: status {response.status_code}, {queries} queries, "
+                f"median {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms"
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark complete; seeded data rolled back"))
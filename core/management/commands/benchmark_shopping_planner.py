@@ -0,0 +1,50 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from core.services.shopping_planner import PRIORITY_WEIGHTS, knapsack_select
+
+
+class Command(BaseCommand):
+    help = "Benchmark the budget-constrained knapsack planner on synthetic candidate sets"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='50,200,1000,5000',
+            help='Comma-separated candidate set sizes (default: 50,200,1000,5000)',
+        )
+        parser.add_argument('--budget', type=float, default=150.0, help='Remaining budget (default: 150)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per size (default: 3)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        budget = Decimal(str(options['budget']))
+        priorities = list(PRIORITY_WEIGHTS)
+
+        self.stdout.write(f"{'candidates':>10}{'selected':>10}{'cost':>12}{'median ms':>12}")
+        for size in (int(s) for s in options['sizes'].split(',') if s.strip()):
+            candidates = []
+            for index in range(size):
+                priority = rng.choice(priorities)
+                candidates.append({
+                    'name': f"item {index}",
+                    'cost': Decimal(str(round(rng.uniform(0.5, 25.0), 2))),
+                    'value': PRIORITY_WEIGHTS[priority],
+                })
+
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                selected, _ = knapsack_select(candidates, budget)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            cost = sum((c['cost'] for c in selected), Decimal('0.00'))
+            self.stdout.write(
+                f"{size:>10}{len(selected):>10}{cost:>12}{statistics.median(timings):>12.1f}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Benchmark complete"))
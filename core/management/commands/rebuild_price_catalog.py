@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import PriceCatalogEntry, ShoppingList
+from core.services.price_catalog import record_purchases
+
+
+class Command(BaseCommand):
+    help = "Rebuild the learned price catalog by replaying confirmed shopping lists in order"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Number of shopping lists replayed per batch (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        lists = (
+            ShoppingList.objects.filter(status='confirmed', completed_at__isnull=False)
+            .order_by('completed_at', 'id')
+            .select_related('user')
+            .prefetch_related('items')
+        )
+
+        with transaction.atomic():
+            PriceCatalogEntry.objects.all().delete()
+            replayed = 0
+            # Replay in completion order so the moving averages match live updates
+            for start in range(0, lists.count(), chunk_size):
+                for shopping_list in lists[start:start + chunk_size]:
+                    record_purchases(shopping_list.user, [
+                        (item.item_name, item.quantity, item.unit, item.actual_price or item.estimated_price)
+                        for item in shopping_list.items.all()
+                        if item.purchased
+                    ])
+                    replayed += 1
+                self.stdout.write(f"Replayed {replayed} shopping lists...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt price catalog from {replayed} lists ({PriceCatalogEntry.objects.count()} entries)"
+        ))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.services.recipe_similarity import refresh_recipe_neighbors, update_signatures
+
+
+class Command(BaseCommand):
+    help = "Rebuild MinHash signatures and the precomputed similar-recipe table in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of recipes refreshed per batch (default: 500)',
+        )
+
+    def _chunks(self, chunk_size):
+        # Walk the primary key so each chunk is a cheap indexed range
+        last_id = 0
+        while True:
+            chunk = list(
+                Recipe.objects.filter(pk__gt=last_id)
+                .only('id', 'cuisine', 'tags', 'minhash_signature')
+                .order_by('pk')[:chunk_size]
+            )
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1].pk
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        # Every recipe needs its LSH bands before any neighbour list is computed
+        total = 0
+        for chunk in self._chunks(chunk_size):
+            update_signatures(chunk)
+            total += len(chunk)
+            self.stdout.write(f"Signed {total} recipes...")
+
+        links = 0
+        processed = 0
+        for chunk in self._chunks(chunk_size):
+            links += refresh_recipe_neighbors(chunk, update_reverse=False, signatures=False)
+            processed += len(chunk)
+            self.stdout.write(f"Ranked neighbours for {processed} recipes...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {links} similar-recipe links for {processed} recipes"
+        ))
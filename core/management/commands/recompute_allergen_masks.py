@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Ingredient, Recipe
+from core.services.allergens import allergen_mask_for
+
+
+class Command(BaseCommand):
+    help = "Recompute ingredient and recipe allergen masks after the allergen vocabulary changes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of recipes recomputed per batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        ingredients = list(Ingredient.objects.only('id', 'name', 'allergen_mask'))
+        changed = []
+        for ingredient in ingredients:
+            mask = allergen_mask_for(ingredient.name)
+            if mask != ingredient.allergen_mask:
+                ingredient.allergen_mask = mask
+                changed.append(ingredient)
+        Ingredient.objects.bulk_update(changed, ['allergen_mask'], batch_size=1000)
+        self.stdout.write(f"Updated {len(changed)} of {len(ingredients)} ingredient masks")
+
+        chunk_size = options['chunk_size']
+        last_id = 0
+        total = 0
+        while True:
+            # Walk the primary key so each chunk is a cheap indexed range
+            chunk_ids = list(
+                Recipe.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk_ids:
+                break
+            total += Recipe.objects.filter(pk__in=chunk_ids).recompute_allergen_masks()
+            last_id = chunk_ids[-1]
+            self.stdout.write(f"Recomputed {total} recipes...")
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed allergen masks for {total} recipes"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Recompute recipe nutrition totals from the ingredient catalog in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute every recipe instead of only those flagged as dirty',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of recipes recomputed per batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        recipes = Recipe.objects.all() if options['all'] else Recipe.objects.filter(nutrition_dirty=True)
+
+        last_id = 0
+        total = 0
+        while True:
+            # Walk the primary key so each chunk is a cheap indexed range
+            chunk_ids = list(
+                recipes.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk_ids:
+                break
+            total += Recipe.objects.filter(pk__in=chunk_ids).recompute_nutrition()
+            last_id = chunk_ids[-1]
+            self.stdout.write(f"Recomputed {total} recipes...")
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed nutrition for {total} recipes"))
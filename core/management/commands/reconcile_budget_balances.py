@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Budget
+from core.services.spending_ledger import reconcile_budget_balances
+
+
+class Command(BaseCommand):
+    help = "Compare budget amount_spent balances with the spending ledger and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of budgets checked per batch (default: 500)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        checked = 0
+        drifted = 0
+        while True:
+            ids = list(
+                Budget.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            drift = reconcile_budget_balances(Budget.objects.filter(pk__in=ids), fix=not options['dry_run'])
+            for budget_id, stored, ledger in drift:
+                self.stdout.write(f"Budget {budget_id}: amount_spent {stored} -> {ledger}")
+            drifted += len(drift)
+
+        action = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{action} drift on {drifted} of {checked} budgets"))
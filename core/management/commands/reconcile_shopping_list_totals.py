@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ITEM_TOTAL_FIELDS, ShoppingList
+
+
+class Command(BaseCommand):
+    help = "Compare shopping list running totals with their items and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of shopping lists checked per batch (default: 500)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        checked = 0
+        drifted = 0
+        while True:
+            # Walk the primary key so each chunk is a cheap indexed range
+            chunk = list(
+                ShoppingList.objects.filter(pk__gt=last_id).order_by('pk')
+                .with_computed_item_totals()
+                .only('pk', *ITEM_TOTAL_FIELDS)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].pk
+            checked += len(chunk)
+
+            stale_ids = []
+            for sl in chunk:
+                drift = {
+                    field: (getattr(sl, field), getattr(sl, f"computed_{field}"))
+                    for field in ITEM_TOTAL_FIELDS
+                    if getattr(sl, field) != getattr(sl, f"computed_{field}")
+                }
+                if drift:
+                    stale_ids.append(sl.pk)
+                    self.stdout.write(f"List {sl.pk}: " + ", ".join(
+                        f"{field} {stored} -> {computed}" for field, (stored, computed) in drift.items()
+                    ))
+            drifted += len(stale_ids)
+            if stale_ids and not options['dry_run']:
+                ShoppingList.objects.filter(pk__in=stale_ids).recompute_item_totals()
+
+        action = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{action} drift on {drifted} of {checked} shopping lists"))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.expiry_sweep import sweep_expired_items
+
+
+class Command(BaseCommand):
+    help = (
+        "Record waste for and expire every user's pantry items past their expiry date, "
+        "in chunks (the same sweep Celery beat runs hourly)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.EXPIRY_SWEEP_CHUNK_SIZE,
+            help=f'Pantry items per batch (default: {settings.EXPIRY_SWEEP_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        def report(stats, through):
+            self.stdout.write(
+                f"Chunk {stats['chunks']}: {stats['items_expired']} items expired so far "
+                f"(through {through}), {stats['items_per_second']} items/s"
+            )
+
+        stats = sweep_expired_items(chunk_size=options['chunk_size'], progress=report)
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {stats['items_expired']} items for {stats['users']} users "
+            f"in {stats['chunks']} chunks ({stats['elapsed_seconds']}s)"
+        ))
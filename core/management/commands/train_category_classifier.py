@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import UserPantry
+from core.services.category_classifier import CategoryClassifier, classifier_path
+
+
+class Command(BaseCommand):
+    help = "Train the shopping-item category classifier from pantry name/category pairs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-seed', action='store_true', help='Train without the built-in keyword vocabulary')
+
+    def handle(self, *args, **options):
+        pairs = list(
+            UserPantry.objects.exclude(category='other').values_list('name', 'category').iterator(chunk_size=5000)
+        )
+        start = time.perf_counter()
+        classifier = CategoryClassifier.train(pairs, seed=not options['no_seed'])
+        self.stdout.write(f"Trained on {len(pairs)} pantry items in {time.perf_counter() - start:.2f}s")
+
+        if pairs:
+            # Training accuracy is a sanity check, not a held-out score
+            correct = sum(1 for name, category in pairs if classifier.classify(name) == category)
+            self.stdout.write(f"Training accuracy: {correct / len(pairs):.1%}")
+
+        path = classifier_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(classifier.to_json())
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved classifier to {path}; restart workers to load it"
+        ))
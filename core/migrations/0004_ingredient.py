@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_delete_imageprocessingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('normalized_name', models.CharField(max_length=200, unique=True)),
+                ('category', models.CharField(choices=[('vegetables', 'Vegetables'), ('fruits', 'Fruits'), ('dairy', 'Dairy & Eggs'), ('meat', 'Meat & Poultry'), ('seafood', 'Seafood'), ('grains', 'Grains & Cereals'), ('legumes', 'Legumes & Nuts'), ('spices', 'Spices & Herbs'), ('condiments', 'Condiments & Sauces'), ('beverages', 'Beverages'), ('frozen', 'Frozen Foods'), ('bakery', 'Bakery'), ('canned', 'Canned Goods'), ('other', 'Other')], default='other', max_length=50)),
+                ('calories', models.FloatField(default=0, help_text='Calories per 100g')),
+                ('protein', models.FloatField(default=0, help_text='Protein in grams per 100g')),
+                ('carbs', models.FloatField(default=0, help_text='Carbohydrates in grams per 100g')),
+                ('fat', models.FloatField(default=0, help_text='Fat in grams per 100g')),
+                ('fiber', models.FloatField(default=0, help_text='Fiber in grams per 100g')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='ingredient',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='core.ingredient'),
+        ),
+        migrations.AddField(
+            model_name='userpantry',
+            name='ingredient',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pantry_items', to='core.ingredient'),
+        ),
+    ]
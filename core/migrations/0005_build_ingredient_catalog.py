@@ -0,0 +1,72 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:31
+
+from django.db import migrations
+
+NUTRITION_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber')
+
+
+def normalize(name):
+    return " ".join((name or "").lower().split())
+
+
+def has_nutrition(obj):
+    return any(getattr(obj, field) for field in NUTRITION_FIELDS)
+
+
+def build_ingredient_catalog(apps, schema_editor):
+    """
+    Create one catalog entry per distinct pantry item name and point
+    pantry items and recipe ingredients at it.
+    """
+    UserPantry = apps.get_model('core', 'UserPantry')
+    Ingredient = apps.get_model('core', 'Ingredient')
+    RecipeIngredient = apps.get_model('core', 'RecipeIngredient')
+
+    catalog = {}
+    pantry_keys = {}
+    # Real inventory first so catalog nutrition comes from actual products
+    for item in UserPantry.objects.order_by('-quantity', 'id').iterator():
+        key = normalize(item.name)
+        if not key:
+            continue
+        pantry_keys[item.id] = key
+        entry = catalog.get(key)
+        if entry is None:
+            entry = catalog[key] = Ingredient(name=item.name.strip(), normalized_name=key, category=item.category)
+        if not has_nutrition(entry) and has_nutrition(item):
+            for field in NUTRITION_FIELDS:
+                setattr(entry, field, getattr(item, field))
+        if entry.category == 'other' and item.category != 'other':
+            entry.category = item.category
+
+    Ingredient.objects.bulk_create(catalog.values(), batch_size=500)
+    ingredient_ids = dict(Ingredient.objects.values_list('normalized_name', 'id'))
+
+    pantry_updates = []
+    for item in UserPantry.objects.only('id').iterator():
+        if item.id in pantry_keys:
+            item.ingredient_id = ingredient_ids[pantry_keys[item.id]]
+            pantry_updates.append(item)
+    UserPantry.objects.bulk_update(pantry_updates, ['ingredient'], batch_size=500)
+
+    link_updates = []
+    for ri in RecipeIngredient.objects.only('id', 'pantry_item_id').iterator():
+        key = pantry_keys.get(ri.pantry_item_id)
+        if key:
+            ri.ingredient_id = ingredient_ids[key]
+            link_updates.append(ri)
+    RecipeIngredient.objects.bulk_update(link_updates, ['ingredient'], batch_size=500)
+
+    # Links to unnamed pantry rows can't be mapped to the catalog
+    RecipeIngredient.objects.filter(ingredient__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_ingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_ingredient_catalog, migrations.RunPython.noop),
+    ]
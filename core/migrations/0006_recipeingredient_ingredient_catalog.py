@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_build_ingredient_catalog'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recipeingredient',
+            name='pantry_item',
+        ),
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ingredient'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredients',
+            field=models.ManyToManyField(related_name='recipes_used_in', through='core.RecipeIngredient', to='core.ingredient'),
+        ),
+    ]
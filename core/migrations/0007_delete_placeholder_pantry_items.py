@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:33
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import F
+
+
+def delete_placeholder_pantry_items(apps, schema_editor):
+    """
+    Remove the zero-quantity pantry rows the recipe generator used to create
+    for ingredients the user didn't have. Recipes now reference the catalog.
+    """
+    UserPantry = apps.get_model('core', 'UserPantry')
+    UserPantry.objects.filter(
+        quantity=0,
+        status='active',
+        detection_source='manual',
+        price__isnull=True,
+        expiry_date=F('purchase_date') + timedelta(days=30),
+        foodwasterecord__isnull=True,
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipeingredient_ingredient_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_placeholder_pantry_items, migrations.RunPython.noop),
+    ]
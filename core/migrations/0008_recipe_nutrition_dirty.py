@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_delete_placeholder_pantry_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='nutrition_dirty',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:43
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# Frozen copies of RECIPE_TAG_MAX_LENGTH and parse_dietary_tags from core.models
+TAG_MAX_LENGTH = 50
+
+
+def parse_tags(value):
+    tags = []
+    for raw in (value or '').split(','):
+        tag = '-'.join(raw.lower().replace('_', ' ').split())[:TAG_MAX_LENGTH].rstrip('-')
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def backfill_tags(apps, schema_editor):
+    """Parse the existing comma-separated dietary_tags strings into the tags array."""
+    Recipe = apps.get_model('core', 'Recipe')
+    batch = []
+    for recipe in Recipe.objects.exclude(dietary_tags='').only('id', 'dietary_tags').iterator(chunk_size=1000):
+        recipe.tags = parse_tags(recipe.dietary_tags)
+        batch.append(recipe)
+        if len(batch) >= 1000:
+            Recipe.objects.bulk_update(batch, ['tags'])
+            batch = []
+    if batch:
+        Recipe.objects.bulk_update(batch, ['tags'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=TAG_MAX_LENGTH), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='core_recipe_tags_gin'),
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:45
+
+import re
+
+from django.contrib.postgres.aggregates import BitOr
+from django.db import migrations, models
+
+# Frozen copy of the allergen vocabulary as of this migration (bit = list
+# position), so later changes to core.services.allergens can't alter it.
+ALLERGEN_GROUPS = [
+    ('peanut', ['peanut', 'peanuts', 'groundnut', 'groundnuts', 'peanut butter', 'monkey nut']),
+    ('tree_nut', [
+        'almond', 'almonds', 'cashew', 'cashews', 'walnut', 'walnuts', 'pecan', 'pecans',
+        'hazelnut', 'hazelnuts', 'pistachio', 'pistachios', 'macadamia', 'brazil nut',
+        'tree nut', 'tree nuts', 'nut', 'nuts', 'praline', 'marzipan', 'almond milk',
+    ]),
+    ('dairy', [
+        'milk', 'dairy', 'cheese', 'butter', 'cream', 'yogurt', 'yoghurt', 'ghee', 'whey',
+        'casein', 'lactose', 'mozzarella', 'parmesan', 'cheddar', 'feta', 'paneer', 'mala',
+    ]),
+    ('egg', ['egg', 'eggs', 'mayonnaise', 'mayo', 'meringue', 'albumen']),
+    ('fish', [
+        'fish', 'tilapia', 'salmon', 'tuna', 'cod', 'sardine', 'sardines', 'anchovy',
+        'anchovies', 'mackerel', 'trout', 'omena', 'dagaa', 'fish sauce',
+    ]),
+    ('shellfish', [
+        'shellfish', 'shrimp', 'shrimps', 'prawn', 'prawns', 'crab', 'lobster', 'crayfish',
+        'mussel', 'mussels', 'oyster', 'oysters', 'clam', 'clams', 'scallop', 'scallops',
+        'squid', 'octopus',
+    ]),
+    ('gluten', [
+        'gluten', 'wheat', 'flour', 'bread', 'pasta', 'spaghetti', 'noodles', 'barley', 'rye',
+        'couscous', 'semolina', 'chapati', 'mandazi', 'bulgur',
+    ]),
+    ('soy', ['soy milk', 'soy', 'soya', 'soybean', 'soybeans', 'soy sauce', 'tofu', 'tempeh', 'edamame', 'miso']),
+    ('sesame', ['sesame', 'tahini', 'simsim']),
+    ('mustard', ['mustard']),
+    ('celery', ['celery', 'celeriac']),
+    ('sulphite', ['sulphite', 'sulphites', 'sulfite', 'sulfites', 'wine']),
+]
+
+NEUTRAL_PHRASES = [
+    'coconut milk', 'coconut cream', 'oat milk', 'rice milk', 'cocoa butter', 'shea butter',
+    'cream of tartar', 'butternut', 'butternut squash', 'gluten-free', 'gluten free',
+    'dairy-free', 'dairy free', 'lactose-free', 'lactose free', 'egg-free', 'nut-free',
+    'wheat-free', 'soy-free',
+]
+
+
+def _keyword_bits():
+    bits = {phrase: 0 for phrase in NEUTRAL_PHRASES}
+    for index, (_, keywords) in enumerate(ALLERGEN_GROUPS):
+        for keyword in keywords:
+            bits[keyword] = bits.get(keyword, 0) | 1 << index
+    return bits
+
+
+KEYWORD_BITS = _keyword_bits()
+
+# Longest alternatives first, scanned left to right: leftmost-longest
+# whole-word matches, so "coconut milk" (neutral) consumes "milk"
+KEYWORD_RE = re.compile(
+    r'(?<![^\W_])(' + '|'.join(re.escape(k) for k in sorted(KEYWORD_BITS, key=len, reverse=True)) + r')(?![^\W_])'
+)
+
+
+def allergen_mask_for(text):
+    mask = 0
+    for match in KEYWORD_RE.finditer((text or '').lower()):
+        mask |= KEYWORD_BITS[match.group(1)]
+    return mask
+
+
+def backfill_allergen_masks(apps, schema_editor):
+    """Derive ingredient masks from catalog names, then OR them into each recipe."""
+    Ingredient = apps.get_model('core', 'Ingredient')
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeIngredient = apps.get_model('core', 'RecipeIngredient')
+
+    ingredients = [i for i in Ingredient.objects.only('id', 'name') if allergen_mask_for(i.name)]
+    for ingredient in ingredients:
+        ingredient.allergen_mask = allergen_mask_for(ingredient.name)
+    Ingredient.objects.bulk_update(ingredients, ['allergen_mask'], batch_size=1000)
+
+    masks = (
+        RecipeIngredient.objects.filter(ingredient__allergen_mask__gt=0)
+        .values('recipe_id')
+        .annotate(mask=BitOr('ingredient__allergen_mask'))
+        .values_list('recipe_id', 'mask')
+    )
+    recipes = [Recipe(id=recipe_id, allergen_mask=mask) for recipe_id, mask in masks]
+    Recipe.objects.bulk_update(recipes, ['allergen_mask'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='allergen_mask',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='allergen_mask',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_allergen_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_allergen_masks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceCatalogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_name', models.CharField(max_length=200)),
+                ('unit', models.CharField(max_length=20)),
+                ('unit_price', models.FloatField(help_text='EWMA price per base unit')),
+                ('last_price', models.FloatField(help_text='Most recently observed price per base unit')),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_catalog', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['normalized_name', 'unit'], name='core_pricec_normali_c64781_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'normalized_name', 'unit'), name='unique_user_price_entry'), models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('normalized_name', 'unit'), name='unique_global_price_entry')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_price_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='expiry_date',
+            field=models.DateField(blank=True, help_text='Expiry recorded while shopping, used on confirmation', null=True),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
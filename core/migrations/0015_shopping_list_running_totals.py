@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_running_totals(apps, schema_editor):
+    """Aggregate each list's items into the new running totals in one UPDATE."""
+    ShoppingList = apps.get_model('core', 'ShoppingList')
+    ShoppingListItem = apps.get_model('core', 'ShoppingListItem')
+    items = ShoppingListItem.objects.filter(shopping_list=OuterRef('pk')).order_by().values('shopping_list')
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def aggregate(expression, output_field):
+        return Coalesce(
+            Subquery(items.annotate(value=expression).values('value'), output_field=output_field),
+            Value(0), output_field=output_field
+        )
+
+    ShoppingList.objects.update(
+        item_count=aggregate(Count('id'), models.IntegerField()),
+        purchased_count=aggregate(Count('id', filter=Q(purchased=True)), models.IntegerField()),
+        total_estimated_cost=aggregate(Sum('estimated_price'), money),
+        items_actual_cost=aggregate(Sum('actual_price'), money),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_shopping_item_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='items_actual_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='purchased_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_running_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_shopping_list_running_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='pantry_snapshot',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def backfill_monthly_spending(apps, schema_editor):
+    """Roll confirmed shopping lists up by user and calendar month."""
+    ShoppingList = apps.get_model('core', 'ShoppingList')
+    MonthlySpending = apps.get_model('core', 'MonthlySpending')
+    grouped = (
+        ShoppingList.objects.filter(status='confirmed', completed_at__isnull=False)
+        .annotate(spend_month=TruncMonth('completed_at'))
+        .values('user_id', 'spend_month')
+        .annotate(amount=Sum('total_actual_cost'), list_count=Count('id'))
+        .order_by()
+    )
+    MonthlySpending.objects.bulk_create([
+        MonthlySpending(
+            user_id=row['user_id'],
+            month=timezone.localtime(row['spend_month']).date().replace(day=1),
+            amount=row['amount'] or 0,
+            list_count=row['list_count'],
+        )
+        for row in grouped
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_shopping_list_pantry_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the calendar month')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('list_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spending', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='unique_monthly_spending')],
+            },
+        ),
+        migrations.RunPython(backfill_monthly_spending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_ledger_balances(apps, schema_editor):
+    """Record each budget's existing amount_spent as an opening adjustment entry."""
+    Budget = apps.get_model('core', 'Budget')
+    SpendingEntry = apps.get_model('core', 'SpendingEntry')
+    SpendingEntry.objects.bulk_create([
+        SpendingEntry(
+            user_id=budget.user_id, budget_id=budget.pk, kind='adjustment',
+            amount=budget.amount_spent, note='Opening balance'
+        )
+        for budget in Budget.objects.exclude(amount_spent=0).only('pk', 'user_id', 'amount_spent')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_monthly_spending'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('purchase', 'Purchase'), ('adjustment', 'Adjustment')], default='purchase', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('budget', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='spending_entries', to='core.budget')),
+                ('shopping_list', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='spending_entries', to='core.shoppinglist')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['budget', 'created_at'], name='core_spendi_budget__596fda_idx'), models.Index(fields=['user', 'created_at'], name='core_spendi_user_id_10ae20_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('kind', 'purchase')), fields=('shopping_list',), name='unique_purchase_per_shopping_list')],
+            },
+        ),
+        migrations.RunPython(open_ledger_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:53
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_waste_records(apps, schema_editor):
+    """
+    Keep the earliest expiry record for each pantry item and waste date.
+    Records with other reasons are entered by users and are all kept.
+    """
+    FoodWasteRecord = apps.get_model('core', 'FoodWasteRecord')
+    duplicates = (
+        FoodWasteRecord.objects.filter(reason='expired')
+        .values('pantry_item', 'waste_date')
+        .annotate(keep_id=Min('id'), records=Count('id'))
+        .filter(records__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        FoodWasteRecord.objects.filter(
+            pantry_item=group['pantry_item'], reason='expired', waste_date=group['waste_date']
+        ).exclude(pk=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_spending_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_waste_records, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='foodwasterecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('reason', 'expired')), fields=('pantry_item', 'waste_date'), name='unique_waste_record_per_day'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_recipe_suggestions(apps, schema_editor):
+    """Record each user's existing AI recipes as suggested when they were created."""
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeSuggestion = apps.get_model('core', 'RecipeSuggestion')
+    RecipeSuggestion.objects.bulk_create([
+        RecipeSuggestion(user_id=recipe.created_by_id, recipe_id=recipe.pk, suggested_at=recipe.created_at)
+        for recipe in Recipe.objects.filter(is_ai_generated=True, created_by__isnull=False)
+        .only('pk', 'created_by_id', 'created_at')
+        .iterator(chunk_size=1000)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_unique_waste_record_per_day'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('suggested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions', to='core.recipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_suggestions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-suggested_at'],
+                'indexes': [models.Index(fields=['user', '-suggested_at'], name='core_recipe_user_id_0066c5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'recipe'), name='unique_recipe_suggestion')],
+            },
+        ),
+        migrations.RunPython(backfill_recipe_suggestions, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,24 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Sum, F, Count, Q, OuterRef, Subquery, Value
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.aggregates import BitOr
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, SearchVectorField
+from core.services.allergens import allergen_mask_for
+import re
 from decimal import Decimal
-from django.db.models.functions import Lower
-from django.db.models import Sum
+from django.db.models.functions import Coalesce, Lower
 
 User = settings.AUTH_USER_MODEL
 
+
+def normalize_ingredient_name(name):
+    """Normalize an ingredient name into the catalog lookup key."""
+    return " ".join((name or "").lower().split())
+
+
 # Model representing items in a user's pantry
 class UserPantry(models.Model):
     CATEGORY_CHOICES = [
@@ -38,6 +49,13 @@ class UserPantry(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='other')
+    ingredient = models.ForeignKey(
+        'Ingredient',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='pantry_items'
+    )
     
     # Nutritional information (per 100g)
     calories = models.FloatField(default=0, help_text="Calories per 100g")
@@ -96,9 +114,36 @@ class UserPantry(models.Model):
     def __str__(self):
         return f"{self.user.email} - {self.name} ({self.quantity}{self.unit})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Saved rows are linked by name, so the catalog key is the loaded name's
+        if instance.__dict__.get('ingredient_id') is not None and 'name' in instance.__dict__:
+            instance._ingredient_key = normalize_ingredient_name(instance.name)
+        return instance
+
+    def _linked_ingredient_key(self):
+        """Catalog key of the linked ingredient, without querying for it."""
+        if self.ingredient_id is None:
+            return None
+        if UserPantry.ingredient.is_cached(self):
+            return self.ingredient.normalized_name
+        return getattr(self, '_ingredient_key', None)
+
     def save(self, *args, **kwargs):
-        """Override save to prevent automatic expiration handling"""
+        """
+        Link the item to the shared ingredient catalog before saving. The
+        catalog is only queried when the name's key changed; pantry nutrition
+        is never copied into the shared catalog here (see
+        backfill_ingredient_nutrition).
+        """
+        key = normalize_ingredient_name(self.name)
+        if key and self._linked_ingredient_key() != key:
+            self.ingredient = Ingredient.objects.resolve([self.name], category=self.category)[key]
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'ingredient'}
         super().save(*args, **kwargs)
+        self._ingredient_key = key if self.ingredient_id else None
     
     def get_nutritional_info(self):
         """Get formatted nutritional information"""
@@ -164,7 +209,9 @@ class UserPantry(models.Model):
             unit=self.unit,
             cost=self.price or Decimal('0.00'),
             reason=reason,
-            reason_details=f"Wasted from pantry: {self.name}"
+            reason_details=f"Wasted from pantry: {self.name}",
+            purchase_date=self.purchase_date,
+            expiry_date=self.expiry_date,
         )
         
         if wasted_quantity >= self.quantity:
@@ -200,6 +247,276 @@ class UserPantry(models.Model):
         """
         return self.mark_as_expired()
 
+class IngredientManager(models.Manager):
+    def resolve(self, names, category='other', categories=None):
+        """
+        Map ingredient names to catalog entries, creating missing ones in bulk.
+        categories optionally maps normalized names to the category for new entries.
+        Returns a dict keyed by normalized name.
+        """
+        wanted = {}
+        for name in names:
+            key = normalize_ingredient_name(name)
+            if key:
+                wanted.setdefault(key, name.strip())
+
+        catalog = {i.normalized_name: i for i in self.filter(normalized_name__in=wanted)}
+        missing = [key for key in wanted if key not in catalog]
+        if missing:
+            self.bulk_create(
+                [
+                    self.model(
+                        name=wanted[key],
+                        normalized_name=key,
+                        category=(categories or {}).get(key, category),
+                        # bulk_create skips save(), so derive the mask here
+                        allergen_mask=allergen_mask_for(wanted[key]),
+                    )
+                    for key in missing
+                ],
+                ignore_conflicts=True
+            )
+            # ignore_conflicts doesn't return primary keys, so read them back
+            catalog.update({i.normalized_name: i for i in self.filter(normalized_name__in=missing)})
+        return catalog
+
+
+class Ingredient(models.Model):
+    """
+    Shared ingredient catalog that recipes reference and pantry items link to.
+    """
+    name = models.CharField(max_length=200)
+    normalized_name = models.CharField(max_length=200, unique=True)
+    category = models.CharField(max_length=50, choices=UserPantry.CATEGORY_CHOICES, default='other')
+
+    # Nutritional information (per 100g)
+    calories = models.FloatField(default=0, help_text="Calories per 100g")
+    protein = models.FloatField(default=0, help_text="Protein in grams per 100g")
+    carbs = models.FloatField(default=0, help_text="Carbohydrates in grams per 100g")
+    fat = models.FloatField(default=0, help_text="Fat in grams per 100g")
+    fiber = models.FloatField(default=0, help_text="Fiber in grams per 100g")
+
+    # Bitmask of allergen groups detected in the name (see core.services.allergens)
+    allergen_mask = models.IntegerField(default=0, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    NUTRITION_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber')
+
+    objects = IngredientManager()
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_nutrition = instance.nutrition_values()
+        instance._loaded_allergen_mask = instance.__dict__.get('allergen_mask')
+        return instance
+
+    def nutrition_values(self):
+        return tuple(self.__dict__.get(field) for field in self.NUTRITION_FIELDS)
+
+    def save(self, *args, **kwargs):
+        """
+        Flag recipes using this ingredient for recomputation when its nutrition
+        changes, and refresh their allergen masks when its allergens change.
+        """
+        self.allergen_mask = allergen_mask_for(self.name)
+        nutrition_changed = (
+            not self._state.adding
+            and getattr(self, '_loaded_nutrition', None) != self.nutrition_values()
+        )
+        allergens_changed = (
+            not self._state.adding
+            and getattr(self, '_loaded_allergen_mask', None) != self.allergen_mask
+        )
+        super().save(*args, **kwargs)
+        if nutrition_changed:
+            Recipe.objects.filter(recipeingredient__ingredient=self).update(nutrition_dirty=True)
+        if allergens_changed:
+            Recipe.objects.filter(recipeingredient__ingredient=self).recompute_allergen_masks()
+        self._loaded_nutrition = self.nutrition_values()
+        self._loaded_allergen_mask = self.allergen_mask
+
+    def has_nutrition(self):
+        return any([self.calories, self.protein, self.carbs, self.fat, self.fiber])
+
+    def get_nutritional_contribution(self, quantity):
+        """
+        Estimate nutritional contribution for a quantity based on the 100g values.
+        """
+        factor = quantity / 100.0
+
+        return {
+            "calories": self.calories * factor,
+            "protein": self.protein * factor,
+            "carbs": self.carbs * factor,
+            "fat": self.fat * factor,
+            "fiber": self.fiber * factor,
+        }
+
+
+def nutrition_sums():
+    """
+    Sum expressions for recipe nutrition over RecipeIngredient rows,
+    scaling the catalog's per-100g values by each ingredient quantity.
+    """
+    return {
+        field: Sum(
+            F('quantity') * F(f'ingredient__{field}') / 100.0,
+            output_field=models.FloatField()
+        )
+        for field in ('calories', 'protein', 'carbs', 'fat')
+    }
+
+
+# Longest normalized tag stored in Recipe.tags
+RECIPE_TAG_MAX_LENGTH = 50
+
+
+def parse_dietary_tags(value):
+    """
+    Split a comma-separated dietary tag string into normalized, de-duplicated tags
+    ("Gluten Free, vegan" -> ['gluten-free', 'vegan']), truncated to
+    RECIPE_TAG_MAX_LENGTH so they always fit Recipe.tags.
+    """
+    tags = []
+    for raw in (value or '').split(','):
+        tag = '-'.join(raw.lower().replace('_', ' ').split())[:RECIPE_TAG_MAX_LENGTH].rstrip('-')
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+# Text search configuration and the fields folded into Recipe.search_vector
+SEARCH_CONFIG = 'english'
+RECIPE_SEARCH_FIELDS = ('name', 'dietary_tags', 'description')
+
+
+def recipe_search_vector():
+    """Weighted tsvector expression: name ranks above tags, tags above description."""
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('dietary_tags', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def prefix_search_query(text):
+    """
+    Build a tsquery that matches every word of the input as a prefix
+    ("chick cur" -> chick:* & cur:*) so partially typed terms still match.
+    Returns None when the input has no searchable words.
+    """
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return None
+    raw = ' & '.join(f"{term}:*" for term in terms)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+class RecipeQuerySet(models.QuerySet):
+    def safe_for(self, allergen_mask):
+        """Exclude recipes containing any allergen group in the mask."""
+        if not allergen_mask:
+            return self
+        return self.alias(
+            allergen_hits=F('allergen_mask').bitand(allergen_mask)
+        ).filter(allergen_hits=0)
+
+    def recompute_allergen_masks(self):
+        """
+        OR together ingredient allergen masks for every recipe in the queryset
+        with one grouped aggregate and one bulk update. Returns the count.
+        """
+        masks = dict(
+            RecipeIngredient.objects.filter(recipe__in=self)
+            .values('recipe_id')
+            .annotate(mask=BitOr('ingredient__allergen_mask'))
+            .values_list('recipe_id', 'mask')
+        )
+        recipes = list(self.only('id'))
+        for recipe in recipes:
+            recipe.allergen_mask = masks.get(recipe.id) or 0
+        self.model.objects.bulk_update(recipes, ['allergen_mask'])
+        return len(recipes)
+
+    def update_search_vector(self):
+        """Recompute the stored search vector for every recipe in the queryset."""
+        return self.update(search_vector=recipe_search_vector())
+
+    def with_tags(self, tags, mode='any'):
+        """
+        Filter by normalized tags using the GIN index: mode 'any' matches
+        recipes with at least one of the tags, 'all' requires every tag.
+        """
+        tags = parse_dietary_tags(','.join(tags))
+        if not tags:
+            return self
+        if mode == 'all':
+            return self.filter(tags__contains=tags)
+        return self.filter(tags__overlap=tags)
+
+    def suggested_to(self, user):
+        """Recipes served to the user as suggestions, most recently suggested first."""
+        return self.filter(suggestions__user=user).order_by('-suggestions__suggested_at', '-pk')
+
+    def recent_for(self, user, since):
+        """Recipes the user created or was suggested since the given time."""
+        return self.filter(
+            Q(created_by=user, created_at__gte=since)
+            | Q(suggestions__user=user, suggestions__suggested_at__gte=since)
+        ).distinct()
+
+    def search(self, text):
+        """
+        Full-text search over the indexed search vector with prefix matching,
+        ordered by weighted rank.
+        """
+        query = prefix_search_query(text)
+        if query is None:
+            return self
+        return (
+            self.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F('search_vector'), query))
+            .order_by('-search_rank', '-created_at')
+        )
+
+    def recompute_nutrition(self):
+        """
+        Recompute nutrition totals for every recipe in the queryset with one
+        grouped aggregate over the ingredient catalog and one bulk update.
+        Returns the number of recipes updated.
+        """
+        totals = {
+            row['recipe_id']: row
+            for row in RecipeIngredient.objects.filter(recipe__in=self)
+            .values('recipe_id')
+            .annotate(**nutrition_sums())
+        }
+
+        recipes = list(self.only('id'))
+        for recipe in recipes:
+            row = totals.get(recipe.id, {})
+            recipe.total_calories = row.get('calories') or 0
+            recipe.total_protein = row.get('protein') or 0
+            recipe.total_carbs = row.get('carbs') or 0
+            recipe.total_fat = row.get('fat') or 0
+            recipe.nutrition_dirty = False
+
+        self.model.objects.bulk_update(
+            recipes,
+            ['total_calories', 'total_protein', 'total_carbs', 'total_fat', 'nutrition_dirty']
+        )
+        return len(recipes)
+
+
 class Recipe(models.Model):
     DIFFICULTY_LEVELS = [
         ('easy', 'Easy'),
@@ -230,8 +547,8 @@ class Recipe(models.Model):
     cuisine = models.CharField(max_length=50, choices=CUISINE_CHOICES)
     servings = models.IntegerField()
 
-    # Linking recipes directly to pantry items 
-    ingredients = models.ManyToManyField('UserPantry', through='RecipeIngredient', related_name='recipes_used_in')
+    # Linking recipes to the shared ingredient catalog
+    ingredients = models.ManyToManyField('Ingredient', through='RecipeIngredient', related_name='recipes_used_in')
 
     instructions = models.TextField()
 
@@ -241,69 +558,245 @@ class Recipe(models.Model):
     total_fat = models.FloatField(null=True, blank=True)
 
     dietary_tags = models.CharField(max_length=200, blank=True)
+    # Normalized copy of dietary_tags, kept in sync on save and indexed for filtering
+    tags = ArrayField(
+        models.CharField(max_length=RECIPE_TAG_MAX_LENGTH), default=list, blank=True, editable=False
+    )
 
     image = models.ImageField(upload_to='recipe_images/', blank=True, null=True)
     average_rating = models.FloatField(default=0)
     rating_count = models.IntegerField(default=0)
 
+    # Set when a linked ingredient's nutrition changes; cleared on recomputation
+    nutrition_dirty = models.BooleanField(default=False, db_index=True)
+
+    # MinHash signature of the ingredient set, used to maintain RecipeSimilarity
+    minhash_signature = models.JSONField(default=list, blank=True)
+
+    # OR of ingredient allergen masks, so listings can exclude unsafe recipes in SQL
+    allergen_mask = models.IntegerField(default=0, editable=False)
+
+    # Weighted tsvector over name, dietary tags and description (see recipe_search_vector)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     is_ai_generated = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['cuisine']),
             models.Index(fields=['difficulty']),
             models.Index(fields=['average_rating']),
+            GinIndex(fields=['search_vector'], name='core_recipe_search_gin'),
+            GinIndex(fields=['tags'], name='core_recipe_tags_gin'),
         ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_search_text = instance.search_text()
+        return instance
+
+    def search_text(self):
+        """Loaded values of the fields folded into search_vector."""
+        return tuple(self.__dict__.get(field) for field in RECIPE_SEARCH_FIELDS)
+
+    def save(self, *args, **kwargs):
+        self.tags = parse_dietary_tags(self.dietary_tags)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'dietary_tags' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'tags'}
+
+        # Keep the search index current; skip saves that don't change searchable text
+        search_changed = (
+            (update_fields is None or set(update_fields) & set(RECIPE_SEARCH_FIELDS))
+            and getattr(self, '_loaded_search_text', None) != self.search_text()
+        )
+        super().save(*args, **kwargs)
+
+        if search_changed:
+            Recipe.objects.filter(pk=self.pk).update_search_vector()
+            # Reload it so a later full save doesn't write the stale vector back
+            self.refresh_from_db(fields=['search_vector'])
+        self._loaded_search_text = self.search_text()
+
+    @staticmethod
+    def nutrition_totals(ingredient_quantities):
+        """
+        Sum nutrition for (ingredient, quantity) pairs without touching the database.
+        """
+        totals = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}
+        for ingredient, quantity in ingredient_quantities:
+            contrib = ingredient.get_nutritional_contribution(quantity)
+            for key in totals:
+                totals[key] += contrib[key]
+        return totals
+
     def calculate_nutrition(self):
         """
-        Dynamically calculates total nutrition from linked pantry items.
+        Calculates total nutrition from linked catalog ingredients with a single aggregate query.
         """
-        recipe_ingredients = self.recipeingredient_set.all()
-        total_calories = total_protein = total_carbs = total_fat = 0
-        
-        for ri in recipe_ingredients:
-            # Get nutritional contribution from the pantry item
-            contrib = ri.pantry_item.get_nutritional_contribution(ri.quantity)
-            total_calories += contrib['calories']
-            total_protein += contrib['protein']
-            total_carbs += contrib['carbs']
-            total_fat += contrib['fat']
-            
-        self.total_calories = total_calories
-        self.total_protein = total_protein
-        self.total_carbs = total_carbs
-        self.total_fat = total_fat
-        self.save()
+        totals = self.recipeingredient_set.aggregate(**nutrition_sums())
+
+        self.total_calories = totals['calories'] or 0
+        self.total_protein = totals['protein'] or 0
+        self.total_carbs = totals['carbs'] or 0
+        self.total_fat = totals['fat'] or 0
+        self.nutrition_dirty = False
+        self.save(update_fields=[
+            'total_calories', 'total_protein', 'total_carbs', 'total_fat',
+            'nutrition_dirty', 'updated_at'
+        ])
 
 
 class RecipeIngredient(models.Model):
     """
-    A bridge table linking recipes and pantry items.
+    A bridge table linking recipes and catalog ingredients.
     """
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
-    pantry_item = models.ForeignKey(UserPantry, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
     quantity = models.FloatField()
     unit = models.CharField(max_length=50, default="g")
     
     optional = models.BooleanField(default=False, help_text="Whether ingredient is optional")
 
     def __str__(self):
-        return f"{self.pantry_item.name} ({self.quantity}{self.unit}) for {self.recipe.name}"
+        return f"{self.ingredient.name} ({self.quantity}{self.unit}) for {self.recipe.name}"
 
     def get_nutritional_contribution(self):
         """
         Returns nutritional info scaled to the quantity used.
         """
-        return self.pantry_item.get_nutritional_contribution(self.quantity)
+        return self.ingredient.get_nutritional_contribution(self.quantity)
+
+
+class RecipeSimilarity(models.Model):
+    """
+    Precomputed top-k neighbours for a recipe, scored from ingredient-set
+    MinHash similarity plus cuisine and dietary tag overlap.
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='similar_links')
+    similar_recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'similar_recipe'], name='unique_recipe_similarity'),
+        ]
+        indexes = [
+            models.Index(fields=['recipe', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_recipe_id} ({self.score:.2f})"
+
+
+class RecipeMinHashBand(models.Model):
+    """
+    Locality-sensitive hashing bucket for one band of a recipe's MinHash
+    signature. Recipes sharing a bucket are candidate neighbours.
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='minhash_bands')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['band', 'bucket']),
+        ]
+
+
+class RecipeSuggestionQuerySet(models.QuerySet):
+    def record(self, user, recipes):
+        """
+        Mark recipes as just suggested to the user, whether generated for them
+        or reused from the catalog, with one upsert.
+        """
+        now = timezone.now()
+        return self.bulk_create(
+            [self.model(user=user, recipe=recipe, suggested_at=now) for recipe in recipes],
+            update_conflicts=True,
+            unique_fields=['user', 'recipe'],
+            update_fields=['suggested_at'],
+        )
+
+
+class RecipeSuggestion(models.Model):
+    """
+    A recipe served to a user. The latest suggestions are the recipes shopping
+    lists are planned for, and recent ones aren't suggested again.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recipe_suggestions')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='suggestions')
+    suggested_at = models.DateTimeField(default=timezone.now)
+
+    objects = RecipeSuggestionQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-suggested_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'], name='unique_recipe_suggestion'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-suggested_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} for {self.user_id} ({self.suggested_at:%Y-%m-%d})"
+
+
+# Running totals kept on ShoppingList, in the order of ShoppingListItem.totals_contribution()
+ITEM_TOTAL_FIELDS = ('item_count', 'purchased_count', 'total_estimated_cost', 'items_actual_cost')
+
+
+class ShoppingListQuerySet(models.QuerySet):
+    def add_item_totals(self, delta):
+        """
+        Apply a (count, purchased, estimated, actual) delta to the running
+        totals with one atomic F() UPDATE. No-op for an all-zero delta.
+        """
+        if not any(delta):
+            return 0
+        return self.update(**{
+            field: F(field) + change for field, change in zip(ITEM_TOTAL_FIELDS, delta)
+        })
+
+    def _item_aggregates(self):
+        items = ShoppingListItem.objects.filter(shopping_list=OuterRef('pk')).order_by().values('shopping_list')
+
+        def aggregate(expression, output_field):
+            return Coalesce(
+                Subquery(items.annotate(value=expression).values('value'), output_field=output_field),
+                Value(0), output_field=output_field
+            )
+
+        money = models.DecimalField(max_digits=10, decimal_places=2)
+        return {
+            'item_count': aggregate(Count('id'), models.IntegerField()),
+            'purchased_count': aggregate(Count('id', filter=Q(purchased=True)), models.IntegerField()),
+            'total_estimated_cost': aggregate(Sum('estimated_price'), money),
+            'items_actual_cost': aggregate(Sum('actual_price'), money),
+        }
+
+    def with_computed_item_totals(self):
+        """Annotate computed_<field> with the totals aggregated from the items."""
+        return self.annotate(**{
+            f"computed_{field}": expression for field, expression in self._item_aggregates().items()
+        })
+
+    def recompute_item_totals(self):
+        """Reset the running totals from the items in one UPDATE."""
+        return self.update(**self._item_aggregates())
 
 
 class ShoppingList(models.Model):
@@ -322,6 +815,14 @@ class ShoppingList(models.Model):
     budget_limit = models.DecimalField(max_digits=10, decimal_places=2)
     total_estimated_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_actual_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    # Running totals over the items, maintained with F() deltas (see ShoppingListItem.save)
+    item_count = models.PositiveIntegerField(default=0)
+    purchased_count = models.PositiveIntegerField(default=0)
+    items_actual_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # Pantry index and recipe ids the list was generated from, for incremental regeneration
+    pantry_snapshot = models.JSONField(default=dict, blank=True)
     
     pantry_utilization = models.FloatField(default=0)
     goal_alignment = models.FloatField(default=0)
@@ -335,6 +836,8 @@ class ShoppingList(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShoppingListQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -366,14 +869,104 @@ class ShoppingListItem(models.Model):
     
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='medium')
     purchased = models.BooleanField(default=False)
+    expiry_date = models.DateField(null=True, blank=True, help_text="Expiry recorded while shopping, used on confirmation")
     notes = models.TextField(blank=True)
     reason = models.CharField(max_length=200, blank=True)
+
+    # Bumped on every write; item PATCH requests must send the version they read
+    version = models.PositiveIntegerField(default=1)
     
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['priority', 'item_name']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {'purchased', 'estimated_price', 'actual_price'} <= set(field_names):
+            instance._saved_totals = instance.totals_contribution()
+        return instance
+
+    def totals_contribution(self):
+        """This item's share of the list totals: (count, purchased, estimated, actual)."""
+        return (
+            1,
+            1 if self.purchased else 0,
+            Decimal(str(self.estimated_price or 0)),
+            Decimal(str(self.actual_price)) if self.actual_price is not None else Decimal('0'),
+        )
+
+    @staticmethod
+    def totals_delta(pairs):
+        """Sum (before, after) contributions into one delta; None means absent."""
+        delta = [0, 0, Decimal('0'), Decimal('0')]
+        for before, after in pairs:
+            for index in range(4):
+                delta[index] += (after[index] if after else 0) - (before[index] if before else 0)
+        return tuple(delta)
+
+    def _stored_totals(self):
+        stored = ShoppingListItem.objects.filter(pk=self.pk).only(
+            'purchased', 'estimated_price', 'actual_price'
+        ).first()
+        return stored.totals_contribution() if stored else None
+
+    def save(self, *args, **kwargs):
+        """Keep the list's running totals in step with this item"""
+        before = None
+        if not self._state.adding:
+            before = getattr(self, '_saved_totals', None) or self._stored_totals()
+        super().save(*args, **kwargs)
+        after = self.totals_contribution()
+        ShoppingList.objects.filter(pk=self.shopping_list_id).add_item_totals(
+            self.totals_delta([(before, after)])
+        )
+        self._saved_totals = after
+
+    def delete(self, *args, **kwargs):
+        before = getattr(self, '_saved_totals', None) or self._stored_totals()
+        list_id = self.shopping_list_id
+        result = super().delete(*args, **kwargs)
+        ShoppingList.objects.filter(pk=list_id).add_item_totals(self.totals_delta([(before, None)]))
+        return result
+
+
+class PriceCatalogEntry(models.Model):
+    """
+    Learned price per base unit (g, ml, pieces or a custom unit) for a
+    normalized item name, kept as an exponentially weighted moving average.
+    Rows with user=None form the global catalog shared by all users.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='price_catalog')
+    normalized_name = models.CharField(max_length=200)
+    unit = models.CharField(max_length=20)
+    unit_price = models.FloatField(help_text="EWMA price per base unit")
+    last_price = models.FloatField(help_text="Most recently observed price per base unit")
+    sample_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'normalized_name', 'unit'],
+                condition=models.Q(user__isnull=False),
+                name='unique_user_price_entry'
+            ),
+            models.UniqueConstraint(
+                fields=['normalized_name', 'unit'],
+                condition=models.Q(user__isnull=True),
+                name='unique_global_price_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['normalized_name', 'unit']),
+        ]
+
+    def __str__(self):
+        owner = self.user.email if self.user_id else 'global'
+        return f"{owner} - {self.normalized_name}: {self.unit_price:.4f}/{self.unit}"
+
 
 class FoodWasteRecord(models.Model):
     WASTE_REASONS = [
@@ -405,11 +998,69 @@ class FoodWasteRecord(models.Model):
         indexes = [
             models.Index(fields=['user', 'waste_date']),
         ]
+        constraints = [
+            # One expiry record per item and day, so the sweep can insert with ignore_conflicts;
+            # other reasons allow repeated partial waste on the same day
+            models.UniqueConstraint(
+                fields=['pantry_item', 'waste_date'],
+                condition=Q(reason='expired'),
+                name='unique_waste_record_per_day',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.pantry_item.name} waste"
 
 
+def purchased_item_cost():
+    """What a purchased item cost: its actual price, else the estimate."""
+    return Coalesce(
+        'actual_price', 'estimated_price', Value(Decimal('0.00')),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+class BudgetQuerySet(models.QuerySet):
+    def current_for(self, user, today=None):
+        """
+        The user's budget for today: the newest active budget whose period
+        covers today (open-ended budgets included). Planning reads it and
+        confirmed spending is charged to it.
+        """
+        today = today or timezone.now().date()
+        return self.filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=today),
+            user=user,
+            active=True,
+            start_date__lte=today,
+        ).order_by('-start_date', '-pk').first()
+
+    def summary(self):
+        """Count, allocated and spent totals over the budgets in one aggregate query."""
+        return self.aggregate(
+            total_budgets=Count('id'),
+            total_allocated=Coalesce(Sum('amount'), Value(Decimal('0.00'))),
+            total_spent=Coalesce(Sum('amount_spent'), Value(Decimal('0.00'))),
+        )
+
+    def with_spent_from_lists(self):
+        """
+        Annotate spent_from_lists: the cost of items purchased on confirmed
+        lists completed within each budget's period, as one correlated subquery.
+        """
+        items = ShoppingListItem.objects.filter(
+            purchased=True,
+            shopping_list__user=OuterRef('user'),
+            shopping_list__status='confirmed',
+            shopping_list__completed_at__date__gte=OuterRef('start_date'),
+            shopping_list__completed_at__date__lte=Coalesce(OuterRef('end_date'), Value(timezone.now().date())),
+        ).order_by().values('shopping_list__user').annotate(total=Sum(purchased_item_cost())).values('total')
+        return self.annotate(spent_from_lists=Coalesce(
+            Subquery(items, output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+            Value(Decimal('0.00'))
+        ))
+
+
 class Budget(models.Model):
     PERIOD_CHOICES = [
         ('weekly', 'Weekly'),
@@ -427,6 +1078,8 @@ class Budget(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BudgetQuerySet.as_manager()
+
     class Meta:
         ordering = ['-start_date']
         indexes = [
@@ -447,57 +1100,121 @@ class Budget(models.Model):
     def get_status_display(self):
         return "Active" if self.active else "Inactive"
     
+    def get_period_end(self):
+        return self.end_date if self.end_date else timezone.now().date()
+
     def get_confirmed_shopping_lists(self):
         """Get all confirmed shopping lists for this budget period"""
         return ShoppingList.objects.filter(
-            user=self.user,
+            user_id=self.user_id,
             status='confirmed',
             completed_at__date__gte=self.start_date,
-            completed_at__date__lte=self.end_date if self.end_date else timezone.now().date()
+            completed_at__date__lte=self.get_period_end()
         ).order_by('-completed_at')
+
+    def get_purchased_items(self):
+        """Items purchased on confirmed lists within this budget period"""
+        return ShoppingListItem.objects.filter(
+            shopping_list__user_id=self.user_id,
+            shopping_list__status='confirmed',
+            shopping_list__completed_at__date__gte=self.start_date,
+            shopping_list__completed_at__date__lte=self.get_period_end(),
+            purchased=True
+        )
     
     def get_total_spent_from_shopping_lists(self):
         """Calculate total spent from confirmed shopping lists in this period"""
-        confirmed_lists = self.get_confirmed_shopping_lists()
-        return confirmed_lists.aggregate(
-            total=Sum('total_actual_cost')
+        if hasattr(self, 'spent_from_lists'):
+            return self.spent_from_lists
+        return self.get_purchased_items().aggregate(
+            total=Sum(purchased_item_cost())
         )['total'] or Decimal('0.00')
     
+    def get_ledger_balance(self):
+        """Sum of this budget's spending ledger entries"""
+        return self.spending_entries.aggregate(
+            total=Coalesce(Sum('amount'), Value(Decimal('0.00')))
+        )['total']
+
     def sync_amount_spent(self):
-        """Sync amount_spent with actual shopping list data"""
-        self.amount_spent = self.get_total_spent_from_shopping_lists()
-        self.save()
+        """Reset amount_spent to the spending ledger balance"""
+        self.amount_spent = self.get_ledger_balance()
+        Budget.objects.filter(pk=self.pk).update(amount_spent=self.amount_spent)
         return self.amount_spent
     
     def get_spending_breakdown(self):
-        """Get spending breakdown by category for analytics"""
-     
-        shopping_items = ShoppingListItem.objects.filter(
-            shopping_list__user=self.user,
-            shopping_list__status='confirmed',
-            shopping_list__completed_at__date__gte=self.start_date,
-            shopping_list__completed_at__date__lte=self.end_date if self.end_date else timezone.now().date(),
-            purchased=True
+        """Spending per category for analytics, grouped in SQL"""
+        rows = (
+            self.get_purchased_items()
+            .values('category')
+            .annotate(amount=Sum(purchased_item_cost()), count=Count('id'))
+            .order_by('-amount')
         )
-        
-        category_breakdown = {}
-        for item in shopping_items:
-            actual_price = item.actual_price or item.estimated_price or Decimal('0.00')
-            category = item.category
-            
-            if category not in category_breakdown:
-                category_breakdown[category] = {
-                    'amount': Decimal('0.00'),
-                    'count': 0,
-                    'items': []
-                }
-            
-            category_breakdown[category]['amount'] += actual_price
-            category_breakdown[category]['count'] += 1
-            category_breakdown[category]['items'].append({
-                'name': item.item_name,
-                'amount': actual_price,
-                'quantity': item.quantity
-            })
-        
-        return category_breakdown
\ No newline at end of file
+        return {row['category']: {'amount': row['amount'], 'count': row['count']} for row in rows}
+
+class MonthlySpending(models.Model):
+    """
+    Per-user spending rollup for a calendar month, incremented as shopping
+    lists are confirmed so analytics read a single indexed range.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_spending')
+    month = models.DateField(help_text="First day of the calendar month")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    list_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_monthly_spending'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.month:%b %Y}: {self.amount}"
+
+
+class SpendingEntry(models.Model):
+    """
+    Append-only spending ledger. Each confirmed shopping list writes one
+    purchase entry; Budget.amount_spent is the running balance of a budget's
+    entries, kept with F() updates and checked by reconcile_budget_balances.
+    """
+    KIND_CHOICES = [
+        ('purchase', 'Purchase'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_entries')
+    budget = models.ForeignKey(
+        Budget, on_delete=models.CASCADE, null=True, blank=True, related_name='spending_entries'
+    )
+    shopping_list = models.ForeignKey(
+        ShoppingList, on_delete=models.SET_NULL, null=True, blank=True, related_name='spending_entries'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='purchase')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['budget', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+        constraints = [
+            # A shopping list can only be charged once
+            models.UniqueConstraint(
+                fields=['shopping_list'],
+                condition=Q(kind='purchase'),
+                name='unique_purchase_per_shopping_list',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} {self.amount} ({self.created_at:%Y-%m-%d})"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and not self._state.adding:
+            raise ValueError("Spending entries are append-only; record an adjustment instead.")
+        super().save(*args, **kwargs)
@@ -5,94 +5,170 @@ import re
 from decimal import Decimal
 from datetime import timedelta
 from django.utils import timezone
-from django.db import transaction
+from django.db import DatabaseError, transaction
 
 from accounts.models import UserProfile, UserGoal
 from core.models import (
     UserPantry, ShoppingList, ShoppingListItem, Budget,
-    Recipe, RecipeIngredient
+    Recipe, Ingredient, normalize_ingredient_name
 )
+from core.services.prompt_builder import build_pantry_table, SHOPPING_PANTRY_COLUMNS
+from core.services.generation_cache import (
+    get_cached_generation, set_cached_generation, invalidate_pantry_fingerprint
+)
+from core.services.allergens import get_user_allergen_matcher, parse_allergies
+from core.services.pantry_gap import build_pantry_index, compute_gap, recipe_requirements, snapshot_pantry
+from core.services.shopping_planner import PRIORITY_WEIGHTS, knapsack_select
+from core.services.price_catalog import estimate_from_catalog, lookup_unit_prices, record_purchases
+from core.services.category_classifier import classify_category
+from core.services.spending_rollup import record_monthly_spend
+from core.services.spending_ledger import record_spending
+
+
+def _parse_ai_json(ai_text):
+    """Parse the model's JSON reply, tolerating prose around the object."""
+    try:
+        return json.loads(ai_text)
+    except json.JSONDecodeError:
+        match = re.search(r'\{.*\}', ai_text, re.DOTALL)
+        if match:
+            return json.loads(match.group())
+        raise ValueError("No valid JSON found in AI response")
+
+
+def ai_candidates(user, items, pantry_index, allergen_matcher):
+    """
+    Turn LLM shopping items into planner candidates: drop items already in
+    the pantry or containing allergens, and replace the model's price guesses
+    with learned catalog prices where known.
+    """
+    candidates = []
+    for item in items:
+        name = item.get("item_name")
+        if not name:
+            continue
+
+        # Double-check this isn't in pantry
+        key = normalize_ingredient_name(name)
+        if key in pantry_index:
+            continue
+
+        allergen = allergen_matcher.find(name)
+        if allergen:
+            print(f"Skipping shopping item '{name}': contains allergen '{allergen}'")
+            continue
+
+        priority = item.get("priority", "medium")
+        try:
+            cost = Decimal(str(item.get("estimated_price", 0) or 0))
+        except ArithmeticError:
+            cost = Decimal("0.00")
+        candidates.append({
+            "name": name,
+            "key": key,
+            "quantity": item.get("quantity", 0),
+            "unit": item.get("unit", "g"),
+            "cost": max(cost, Decimal("0.00")),
+            "priority": priority if priority in PRIORITY_WEIGHTS else "medium",
+            "value": PRIORITY_WEIGHTS.get(priority, PRIORITY_WEIGHTS["medium"]),
+            "reason": item.get("reason", ""),
+        })
+
+    # Learned prices replace the model's guesses wherever the catalog knows the item
+    prices = lookup_unit_prices(user, [c["name"] for c in candidates])
+    for candidate in candidates:
+        learned = estimate_from_catalog(prices, candidate["name"], candidate["quantity"], candidate["unit"])
+        if learned is not None:
+            candidate["cost"] = Decimal(str(round(learned, 2)))
+    return candidates
+
 
+def suggest_items_for_changes(user, changes, pantry_index, allergen_matcher, budget,
+                              model="gpt-4o-mini", temperature=0.5):
+    """
+    Ask the model about changed ingredients only, for incremental list
+    regeneration. changes is a list of {"name", "quantity", "unit", "reason"};
+    returns planner candidates.
+    """
+    if not changes:
+        return []
+    prompt = (
+        f"You are an AI grocery planner updating an existing shopping list.\n\n"
+        f"Only these ingredients changed since the list was made:\n"
+        f"{json.dumps(changes)}\n\n"
+        f"Suggest what to buy for these ingredients only, within {budget.amount} {budget.currency}. "
+        f"Skip anything the user no longer needs.\n\n"
+        f"RESPONSE FORMAT (JSON only):\n"
+        f'{{"items": [{{"item_name": "Item Name", "quantity": 2, "unit": "kg", "estimated_price": 5.00, "priority": "high", "reason": "Why"}}]}}'
+    )
+    response = openai.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        timeout=30.0,
+    )
+    ai_json = _parse_ai_json(response.choices[0].message.content.strip())
+    return ai_candidates(user, ai_json.get("items", []), pantry_index, allergen_matcher)
 
-def generate_ai_shopping_list(user, model="gpt-4o-mini", temperature=0.5):
+
+def generate_ai_shopping_list(user, model="gpt-4o-mini", temperature=0.5, regenerate=False):
     """
     Generate an AI-powered shopping list based on:
     1. User's current pantry inventory
     2. Expiring items
     3. Missing recipe ingredients
     4. User budget and preferences
+
+    An unconfirmed list generated for the same pantry fingerprint and recipes
+    is returned without calling the LLM, unless regenerate=True.
     """
     try:
         # Get user profile and preferences
         profile = UserProfile.objects.filter(user=user).first()
-        budget = Budget.objects.filter(user=user, active=True).order_by('-start_date').first()
+        budget = Budget.objects.current_for(user)
         if not budget:
             raise ValueError("No active budget found for user.")
 
+        # Recipes most recently suggested to the user
+        recipes = list(Recipe.objects.suggested_to(user)[:3])
+
+        # Reuse the list generated for an unchanged pantry, profile, goal and recipe set
+        cache_params = f"{model}:{','.join(str(r.id) for r in recipes)}"
+        if not regenerate:
+            cached_list_id = get_cached_generation('shopping_list', user.id, params=cache_params)
+            if cached_list_id:
+                cached_list = ShoppingList.objects.filter(
+                    id=cached_list_id, user=user, status='generated'
+                ).first()
+                if cached_list:
+                    print(f"Serving cached AI shopping list {cached_list.id} for user {user.id}")
+                    return cached_list
+
         # Get current pantry with detailed information
         pantry = UserPantry.objects.filter(user=user, quantity__gt=0, status='active')
         expiring_soon = [
             p for p in pantry if p.expiry_date and p.expiry_date <= timezone.now().date() + timedelta(days=3)
         ]
 
-        # Get user's recipes
-        recipes = Recipe.objects.filter(created_by=user, is_ai_generated=True).order_by('-created_at')[:3]
-        
-        # Analyze pantry against recipes to find missing ingredients
-        truly_missing_ingredients = []
-        pantry_usage_suggestions = []
-        
-        for recipe in recipes:
-            print(f"Analyzing recipe: {recipe.name}")
-            
-            for ri in RecipeIngredient.objects.filter(recipe=recipe).select_related("pantry_item"):
-                recipe_ingredient_name = ri.pantry_item.name.lower()
-                recipe_quantity_needed = ri.quantity
-                recipe_unit = ri.unit
-                
-                print(f"  Needs: {recipe_ingredient_name} - {recipe_quantity_needed} {recipe_unit}")
-                
-                # Check pantry for this ingredient
-                pantry_items = [p for p in pantry if p.name.lower() == recipe_ingredient_name]
-                
-                if not pantry_items:
-                    # Item not in pantry at all
-                    truly_missing_ingredients.append({
-                        "name": ri.pantry_item.name,
-                        "quantity": float(ri.quantity),
-                        "unit": ri.unit,
-                        "reason": f"Missing for recipe: {recipe.name}",
-                        "recipe": recipe.name,
-                        "priority": "high"
-                    })
-                    
-                else:
-                    # Item exists in pantry - check quantity and quality
-                    total_available = sum(p.quantity for p in pantry_items)
-                    
-                    if total_available >= recipe_quantity_needed:
-                        # Sufficient quantity available
-                        pantry_usage_suggestions.append({
-                            "ingredient": ri.pantry_item.name,
-                            "use_quantity": float(recipe_quantity_needed),
-                            "available_quantity": float(total_available),
-                            "unit": ri.unit,
-                            "reason": f"Use from pantry for {recipe.name}",
-                            "recipe": recipe.name
-                        })
-                        
-                    else:
-                        # Insufficient quantity - calculate how much to buy
-                        quantity_to_buy = recipe_quantity_needed - total_available
-                        truly_missing_ingredients.append({
-                            "name": ri.pantry_item.name,
-                            "quantity": float(quantity_to_buy),
-                            "unit": ri.unit,
-                            "reason": f"Insufficient for {recipe.name} (have {total_available}, need {recipe_quantity_needed})",
-                            "recipe": recipe.name,
-                            "priority": "high"
-                        })
-                        print(f"  INSUFFICIENT: have {total_available}, need {recipe_quantity_needed} - buy {quantity_to_buy}")
+        # Local gap analysis: pantry hashed by normalized name, units converted
+        pantry_index = build_pantry_index((p.name, p.quantity, p.unit) for p in pantry)
+        gap = compute_gap(pantry_index, recipe_requirements(recipes))
+        truly_missing_ingredients = [
+            {
+                "name": entry["name"],
+                "quantity": entry["quantity"],
+                "unit": entry["unit"],
+                "reason": entry["reason"],
+                "recipe": ", ".join(entry["recipes"]),
+                "priority": entry["priority"],
+            }
+            for entry in gap["missing"] + gap["short"]
+        ]
+        print(
+            f"Pantry gap for {len(recipes)} recipes: {gap['stats']['missing']} missing, "
+            f"{gap['stats']['short']} short ({gap['stats']['unit_mismatch']} in other units), "
+            f"{gap['stats']['covered']} covered"
+        )
         
         # Get expiring items that should be used
         expiring_items_to_use = []
@@ -106,19 +182,23 @@ def generate_ai_shopping_list(user, model="gpt-4o-mini", temperature=0.5):
             })
 
         # Get user preferences
-        allergies = [a.strip().lower() for a in (profile.allergies or "").split(",") if a.strip()]
+        allergies = parse_allergies(profile.allergies) if profile else []
+        allergen_matcher = get_user_allergen_matcher(profile.allergies if profile else "")
         goal = UserGoal.objects.filter(user_profile__user=user, active=True).first()
         goal_text = goal.goal_type.replace("_", " ") if goal else "healthy eating"
 
-        # Prepare data for AI
-        pantry_json = json.dumps([
-            {
-                "name": p.name, 
-                "quantity": float(p.quantity), 
-                "unit": p.unit,
-                "expiry_date": str(p.expiry_date) if p.expiry_date else None
-            } for p in pantry
-        ])
+        # Prepare data for AI - the pantry goes in as a compact table. It is the
+        # "do not suggest" list, so it is never truncated to the token budget
+        pantry_table, prompt_stats = build_pantry_table(
+            pantry,
+            SHOPPING_PANTRY_COLUMNS,
+            goal_type=goal.goal_type if goal else None,
+            truncate=False,
+        )
+        print(
+            f"Shopping prompt pantry: {prompt_stats['items_included']}/{prompt_stats['items_total']} items, "
+            f"{prompt_stats['tokens_used']} tokens ({prompt_stats['tokens_saved']} saved)"
+        )
         
         expiring_json = json.dumps(expiring_items_to_use)
         missing_json = json.dumps(truly_missing_ingredients)
@@ -131,8 +211,8 @@ def generate_ai_shopping_list(user, model="gpt-4o-mini", temperature=0.5):
             f"- Budget: {budget.amount} {budget.currency} (DO NOT EXCEED THIS)\n"
             f"- Allergies to AVOID: {allergies_json}\n"
             f"- Health/Fitness Goal: {goal_text}\n\n"
-            f"CURRENT PANTRY INVENTORY (DO NOT SUGGEST THESE ITEMS):\n"
-            f"{pantry_json}\n\n"
+            f"CURRENT PANTRY INVENTORY (DO NOT SUGGEST THESE ITEMS, pipe-separated table):\n"
+            f"{pantry_table}\n\n"
             f"ITEMS EXPIRING SOON (prioritize using these):\n"
             f"{expiring_json}\n\n"
             f"TRULY MISSING INGREDIENTS (MUST INCLUDE THESE FIRST):\n"
@@ -160,15 +240,16 @@ def generate_ai_shopping_list(user, model="gpt-4o-mini", temperature=0.5):
         ai_text = response.choices[0].message.content.strip()
         
         # Parse JSON response
-        ai_json = {}
-        try:
-            ai_json = json.loads(ai_text)
-        except json.JSONDecodeError:
-            match = re.search(r'\{.*\}', ai_text, re.DOTALL)
-            if match:
-                ai_json = json.loads(match.group())
-            else:
-                raise ValueError("No valid JSON found in AI response")
+        ai_json = _parse_ai_json(ai_text)
+
+        # Validate the LLM items locally before anything is saved
+        candidates = ai_candidates(user, ai_json.get("items", []), pantry_index, allergen_matcher)
+
+        # "Stay under budget" is enforced here rather than trusted to the prompt
+        remaining_budget = max(budget.amount - budget.amount_spent, Decimal("0.00"))
+        selected, skipped = knapsack_select(candidates, remaining_budget)
+        if skipped:
+            print(f"Trimmed {len(skipped)} AI items to fit the remaining budget of {remaining_budget}")
 
         # Create shopping list and items
         with transaction.atomic():
@@ -178,7 +259,10 @@ def generate_ai_shopping_list(user, model="gpt-4o-mini", temperature=0.5):
                 name=ai_json.get("list_name", "AI Smart Shopping List"),
                 status="generated",
                 budget_limit=Decimal(str(budget.amount)),
-                total_estimated_cost=Decimal(str(ai_json.get("total_estimated_cost", 0))),
+                # Running totals for the bulk-created items below
+                item_count=len(selected),
+                total_estimated_cost=sum((c["cost"] for c in selected), Decimal("0.00")),
+                pantry_snapshot=snapshot_pantry(pantry_index, recipes),
                 total_actual_cost=None,
                 pantry_utilization=0.0,
                 goal_alignment=0.0,
@@ -188,38 +272,24 @@ def generate_ai_shopping_list(user, model="gpt-4o-mini", temperature=0.5):
                 year=timezone.now().year,
             )
 
-            # Create shopping list items with validation
-            items_created = 0
-            for item in ai_json.get("items", []):
-                name = item.get("item_name")
-                if not name:
-                    continue
-                
-                # Double-check this isn't in pantry
-                pantry_item_exists = any(
-                    p.name.lower() == name.lower() 
-                    for p in pantry
-                )
-                
-                if pantry_item_exists:
-                    continue
-                    
-                # Create shopping list item
-                ShoppingListItem.objects.create(
+            ShoppingListItem.objects.bulk_create([
+                ShoppingListItem(
                     shopping_list=sl,
-                    item_name=name,
-                    category='other',  # Default category, can be improved
-                    quantity=item.get("quantity", 0),
-                    unit=item.get("unit", "g"),
-                    estimated_price=Decimal(str(item.get("estimated_price", 0))),
-                    priority=item.get("priority", "medium"),
-                    notes=item.get("reason", ""),
+                    item_name=c["name"],
+                    category=classify_category(c["name"]),
+                    quantity=c["quantity"],
+                    unit=c["unit"],
+                    estimated_price=c["cost"],
+                    priority=c["priority"],
+                    notes=c["reason"],
                     purchased=False,
                 )
-                items_created += 1
-                print(f"Added to shopping list: {name}")
+                for c in selected
+            ])
+            items_created = len(selected)
 
         print(f"AI shopping list generated successfully with {items_created} items")
+        set_cached_generation('shopping_list', user.id, sl.id, params=cache_params)
         return sl
 
     except Exception as e:
@@ -227,90 +297,125 @@ def generate_ai_shopping_list(user, model="gpt-4o-mini", temperature=0.5):
         return None
 
 
+def _parse_expiry_date(value, default):
+    """Parse a YYYY-MM-DD expiry date, falling back to the default."""
+    if not value:
+        return default
+    try:
+        return timezone.datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return default
+
+
 def confirm_shopping_list(user, shopping_list_id, purchased_items_payload, total_actual_cost=None):
     """
     Confirm a shopping list purchase and add items to pantry.
+
+    Runs a fixed number of queries regardless of list size: the list's items
+    are loaded once, updated with bulk_update, pantry rows are inserted with
+    bulk_create and the spend is written to the ledger, which moves the
+    budget balance with a single F() update.
     """
     try:
-        sl = ShoppingList.objects.select_for_update().get(id=shopping_list_id, user=user)
-        if sl.status not in ("generated", "draft"):
-            raise ValueError("Shopping list is not in a confirmable state.")
-
         with transaction.atomic():
+            # Lock the list for the whole confirmation so it can only be confirmed once
+            sl = ShoppingList.objects.select_for_update().get(id=shopping_list_id, user=user)
+            if sl.status not in ("generated", "draft"):
+                raise ValueError("Shopping list is not in a confirmable state.")
+
             total_spent = Decimal("0.00")
-            
+            purchases = []
+            updated_items = {}
+            pantry_rows = []
+            today = timezone.now().date()
+            default_expiry = today + timedelta(days=7)
+
+            # Load every item on the list once, keyed by id
+            items = sl.items.in_bulk()
+
             # Process only the purchased items from the payload
             for p in purchased_items_payload:
-                sli = None
-                if p.get("shopping_list_item_id"):
-                    sli = ShoppingListItem.objects.filter(
-                        id=p["shopping_list_item_id"], 
-                        shopping_list=sl
-                    ).first()
-
-                if sli:
-                    # Mark as purchased and update with actual data
-                    sli.purchased = True
-                    if p.get("actual_price") is not None:
-                        sli.actual_price = Decimal(str(p["actual_price"]))
-                    if p.get("purchased_quantity") is not None:
-                        sli.quantity = p["purchased_quantity"]
-                    sli.save()
-
-                    # Use actual price if provided, otherwise use estimated
-                    actual_price = sli.actual_price if sli.actual_price is not None else sli.estimated_price
-                    total_spent += actual_price or Decimal("0.00")
-                    purchase_qty = sli.quantity or 0
-
-                    # Parse expiry date, set default expiry date if not provided
-                    expiry_date = None
-                    if p.get("expiry_date"):
-                        try:
-                            expiry_date = timezone.datetime.strptime(p["expiry_date"], "%Y-%m-%d").date()
-                        except Exception:
-                            # If invalid date, set default expiry (7 days from now)
-                            expiry_date = timezone.now().date() + timedelta(days=7)
-                    else:
-                        # Set default expiry date (7 days from now) if not provided
-                        expiry_date = timezone.now().date() + timedelta(days=7)
-
-                    # Add to pantry only if purchased
-                    UserPantry.objects.create(
-                        user=user,
-                        name=sli.item_name,
-                        category=sli.category,
-                        quantity=purchase_qty,
-                        unit=sli.unit,
-                        purchase_date=timezone.now().date(),
-                        expiry_date=expiry_date,
-                        price=actual_price or None,
-                        status='active',
-                        detection_source='manual'
-                    )
+                try:
+                    sli = items.get(int(p.get("shopping_list_item_id") or 0))
+                except (TypeError, ValueError):
+                    sli = None
+                if sli is None:
+                    continue
+
+                # Mark as purchased and update with actual data
+                sli.purchased = True
+                if p.get("actual_price") is not None:
+                    sli.actual_price = Decimal(str(p["actual_price"]))
+                if p.get("purchased_quantity") is not None:
+                    sli.quantity = p["purchased_quantity"]
+                updated_items[sli.id] = sli
+
+                # Use actual price if provided, otherwise use estimated
+                actual_price = sli.actual_price if sli.actual_price is not None else sli.estimated_price
+                total_spent += actual_price or Decimal("0.00")
+                purchase_qty = sli.quantity or 0
+                purchases.append((sli.item_name, purchase_qty, sli.unit, actual_price))
+
+                # Add to pantry only if purchased (default expiry is 7 days from now)
+                pantry_rows.append(UserPantry(
+                    user=user,
+                    name=sli.item_name,
+                    category=sli.category,
+                    quantity=purchase_qty,
+                    unit=sli.unit,
+                    purchase_date=today,
+                    expiry_date=_parse_expiry_date(p.get("expiry_date"), sli.expiry_date or default_expiry),
+                    price=actual_price or None,
+                    status='active',
+                    detection_source='manual'
+                ))
+
+            if updated_items:
+                for sli in updated_items.values():
+                    sli.version += 1
+                ShoppingListItem.objects.bulk_update(
+                    updated_items.values(), ["purchased", "actual_price", "quantity", "version"]
+                )
+                ShoppingList.objects.filter(pk=sl.pk).add_item_totals(ShoppingListItem.totals_delta(
+                    (sli._saved_totals, sli.totals_contribution()) for sli in updated_items.values()
+                ))
+
+            if pantry_rows:
+                # bulk_create skips UserPantry.save(), so link the catalog entries here
+                catalog = Ingredient.objects.resolve(
+                    [row.name for row in pantry_rows],
+                    categories={normalize_ingredient_name(row.name): row.category for row in pantry_rows}
+                )
+                for row in pantry_rows:
+                    row.ingredient = catalog.get(normalize_ingredient_name(row.name))
+                UserPantry.objects.bulk_create(pantry_rows)
+
+            # Learn prices for future estimates (per-user and global EWMA). This is
+            # best-effort: its savepoint rolls back alone and the purchase still confirms
+            try:
+                record_purchases(user, purchases)
+            except DatabaseError as e:
+                print(f"Could not learn prices from shopping list {sl.id}: {e}")
 
             # Update shopping list status and actual cost
             sl.status = "confirmed"
             sl.total_actual_cost = Decimal(str(total_actual_cost)) if total_actual_cost else total_spent
             sl.completed_at = timezone.now()
-            sl.save()
+            sl.save(update_fields=["status", "total_actual_cost", "completed_at", "updated_at"])
+            record_monthly_spend(user, sl.completed_at, sl.total_actual_cost)
 
-            # Update budget with the actual spent amount
-            today = timezone.now().date()
-            active_budget = Budget.objects.filter(
-                user=user,
-                active=True,
-                start_date__lte=today,
-                end_date__gte=today
-            ).first()
-            
-            if active_budget:
-                # Add the spent amount to the budget
-                active_budget.amount_spent += total_spent
-                active_budget.save()
-                print(f"Updated budget: {active_budget.amount_spent} spent of {active_budget.amount}")
+            # Charge the active budget through the spending ledger, with the same
+            # amount as the list and the monthly rollup (the receipt total if given)
+            if sl.total_actual_cost:
+                budget = Budget.objects.current_for(user, today)
+                record_spending(user, sl.total_actual_cost, budget=budget, shopping_list=sl)
+                print(f"Recorded {sl.total_actual_cost} spent against budget {budget.id if budget else None}")
+
+            # Bulk writes don't send post_save, so drop the pantry fingerprint explicitly
+            invalidate_pantry_fingerprint(user.id)
 
         return sl
 
     except Exception as e:
         print(f"Error confirming shopping list: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,234 @@
+# core/services/allergens.py
+"""
+Allergen vocabulary, bitmasks and a word-boundary Aho-Corasick matcher.
+
+This module has no model imports so it can be used from models. Migrations
+keep their own frozen copy (see 0012_allergen_masks).
+"""
+from collections import deque
+from functools import lru_cache
+
+# Major food allergen groups: (group, keywords). The position is the bit in
+# Ingredient.allergen_mask / Recipe.allergen_mask, so only append new groups.
+ALLERGEN_GROUPS = [
+    ('peanut', ['peanut', 'peanuts', 'groundnut', 'groundnuts', 'peanut butter', 'monkey nut']),
+    ('tree_nut', [
+        'almond', 'almonds', 'cashew', 'cashews', 'walnut', 'walnuts', 'pecan', 'pecans',
+        'hazelnut', 'hazelnuts', 'pistachio', 'pistachios', 'macadamia', 'brazil nut',
+        'tree nut', 'tree nuts', 'nut', 'nuts', 'praline', 'marzipan', 'almond milk',
+    ]),
+    ('dairy', [
+        'milk', 'dairy', 'cheese', 'butter', 'cream', 'yogurt', 'yoghurt', 'ghee', 'whey',
+        'casein', 'lactose', 'mozzarella', 'parmesan', 'cheddar', 'feta', 'paneer', 'mala',
+    ]),
+    ('egg', ['egg', 'eggs', 'mayonnaise', 'mayo', 'meringue', 'albumen']),
+    ('fish', [
+        'fish', 'tilapia', 'salmon', 'tuna', 'cod', 'sardine', 'sardines', 'anchovy',
+        'anchovies', 'mackerel', 'trout', 'omena', 'dagaa', 'fish sauce',
+    ]),
+    ('shellfish', [
+        'shellfish', 'shrimp', 'shrimps', 'prawn', 'prawns', 'crab', 'lobster', 'crayfish',
+        'mussel', 'mussels', 'oyster', 'oysters', 'clam', 'clams', 'scallop', 'scallops',
+        'squid', 'octopus',
+    ]),
+    ('gluten', [
+        'gluten', 'wheat', 'flour', 'bread', 'pasta', 'spaghetti', 'noodles', 'barley', 'rye',
+        'couscous', 'semolina', 'chapati', 'mandazi', 'bulgur',
+    ]),
+    ('soy', ['soy milk', 'soy', 'soya', 'soybean', 'soybeans', 'soy sauce', 'tofu', 'tempeh', 'edamame', 'miso']),
+    ('sesame', ['sesame', 'tahini', 'simsim']),
+    ('mustard', ['mustard']),
+    ('celery', ['celery', 'celeriac']),
+    ('sulphite', ['sulphite', 'sulphites', 'sulfite', 'sulfites', 'wine']),
+]
+
+# Phrases that contain an allergen keyword but aren't that allergen
+NEUTRAL_PHRASES = [
+    'coconut milk', 'coconut cream', 'oat milk', 'rice milk', 'cocoa butter', 'shea butter',
+    'cream of tartar', 'butternut', 'butternut squash', 'gluten-free', 'gluten free',
+    'dairy-free', 'dairy free', 'lactose-free', 'lactose free', 'egg-free', 'nut-free',
+    'wheat-free', 'soy-free',
+]
+
+ALLERGEN_BITS = {group: 1 << index for index, (group, _) in enumerate(ALLERGEN_GROUPS)}
+
+# Words users type for a group that aren't ingredient keywords themselves
+GROUP_ALIASES = {
+    'peanut': ['peanut allergy'],
+    'tree_nut': ['tree nut', 'nut allergy'],
+    'dairy': ['lactose intolerance', 'lactose intolerant'],
+    'egg': ['eggs'],
+    'gluten': ['celiac', 'coeliac', 'gluten intolerance'],
+    'shellfish': ['seafood', 'crustacean', 'crustaceans', 'molluscs', 'mollusks'],
+}
+
+
+def parse_allergies(value):
+    """Split UserProfile.allergies CSV text into normalized terms."""
+    return [
+        " ".join(term.lower().split())
+        for term in (value or '').replace(';', ',').split(',')
+        if term.strip()
+    ]
+
+
+def _is_word_char(char):
+    return char.isalnum()
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: one pass over the text finds every pattern
+    occurrence, regardless of how many patterns are loaded. Matches must sit
+    on word boundaries so "nut" matches "nut butter" but not "nutmeg".
+    """
+
+    def __init__(self, patterns):
+        # patterns: iterable of (keyword, payload)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for keyword, payload in patterns:
+            self._add(keyword.lower(), payload)
+        self._build()
+
+    def _add(self, keyword, payload):
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(keyword), payload))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _raw_matches(self, text):
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if not self._out[state]:
+                continue
+            end = index + 1
+            if end < len(text) and _is_word_char(text[end]):
+                continue
+            for length, payload in self._out[state]:
+                start = end - length
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                yield start, end, payload
+
+    def iter_matches(self, text):
+        """
+        Yield (start, end, payload) for whole-word matches, keeping the
+        leftmost-longest match where patterns overlap so a phrase like
+        "coconut milk" wins over "milk". Matches with a None payload are
+        consumed but not reported.
+        """
+        matches = sorted(self._raw_matches((text or '').lower()), key=lambda m: (m[0], m[0] - m[1]))
+        covered_until = 0
+        for start, end, payload in matches:
+            if start < covered_until:
+                continue
+            covered_until = end
+            if payload is not None:
+                yield start, end, payload
+
+    def search(self, text):
+        """First whole-word match payload, or None."""
+        for _, _, payload in self.iter_matches(text):
+            return payload
+        return None
+
+
+_VOCABULARY = AhoCorasick(
+    [(keyword, group) for group, keywords in ALLERGEN_GROUPS for keyword in keywords]
+    + [(phrase, None) for phrase in NEUTRAL_PHRASES]
+)
+
+
+def allergen_mask_for(text):
+    """Bitmask of allergen groups whose keywords appear in the text (e.g. an ingredient name)."""
+    mask = 0
+    for _, _, group in _VOCABULARY.iter_matches(text):
+        mask |= ALLERGEN_BITS[group]
+    return mask
+
+
+def groups_for_mask(mask):
+    return [group for group, bit in ALLERGEN_BITS.items() if mask & bit]
+
+
+class UserAllergenMatcher:
+    """
+    A user's allergies resolved against the vocabulary: `mask` covers known
+    allergen groups (for SQL filtering), and `find` checks free text against
+    both the group keywords and any terms outside the vocabulary.
+    """
+
+    def __init__(self, terms):
+        self.terms = terms
+        self.mask = 0
+        self.unmapped_terms = []
+
+        aliases = AhoCorasick(
+            [(alias, group) for group, words in GROUP_ALIASES.items() for alias in words]
+            + [(group.replace('_', ' '), group) for group in ALLERGEN_BITS]
+        )
+        for term in terms:
+            mask = allergen_mask_for(term)
+            for _, _, group in aliases.iter_matches(term):
+                mask |= ALLERGEN_BITS[group]
+            if mask:
+                self.mask |= mask
+            else:
+                self.unmapped_terms.append(term)
+
+        patterns = [
+            (keyword, group)
+            for group, keywords in ALLERGEN_GROUPS
+            if self.mask & ALLERGEN_BITS[group]
+            for keyword in keywords
+        ]
+        patterns += [(term, term) for term in self.unmapped_terms]
+        patterns += [(phrase, None) for phrase in NEUTRAL_PHRASES]
+        self._matcher = AhoCorasick(patterns)
+
+    def __bool__(self):
+        return bool(self.terms)
+
+    def find(self, *texts):
+        """First allergen (group or raw term) found in any of the texts, or None."""
+        for text in texts:
+            hit = self._matcher.search(text)
+            if hit:
+                return hit
+        return None
+
+
+@lru_cache(maxsize=1024)
+def _matcher_for(allergies_key):
+    return UserAllergenMatcher(list(allergies_key))
+
+
+def get_user_allergen_matcher(allergies):
+    """Cached matcher for a UserProfile.allergies string."""
+    return _matcher_for(tuple(parse_allergies(allergies)))
@@ -0,0 +1,170 @@
+# core/services/category_classifier.py
+"""
+Local shopping-item category classifier: a word trie of name phrases with
+learned per-category weights, trained from UserPantry name/category pairs.
+"""
+import json
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULT_CATEGORY = 'other'
+
+# Longest phrase (in words) stored in the trie
+MAX_PHRASE_WORDS = 3
+
+# Phrases seen fewer times than this in training are dropped
+MIN_PHRASE_COUNT = 2
+
+# Built-in vocabulary so the classifier works before any pantry data exists;
+# each keyword counts as this many training examples
+SEED_WEIGHT = 3
+SEED_KEYWORDS = {
+    'vegetables': [
+        'tomato', 'onion', 'potato', 'carrot', 'cabbage', 'spinach', 'kale', 'sukuma wiki', 'lettuce',
+        'pepper', 'bell pepper', 'broccoli', 'cauliflower', 'cucumber', 'garlic', 'courgette', 'zucchini',
+        'aubergine', 'eggplant', 'pumpkin', 'celery', 'mushroom', 'leek', 'sweet potato', 'green beans',
+    ],
+    'fruits': [
+        'apple', 'banana', 'orange', 'mango', 'pineapple', 'avocado', 'lemon', 'lime', 'grape',
+        'strawberry', 'blueberry', 'watermelon', 'pear', 'peach', 'passion fruit', 'pawpaw', 'papaya',
+    ],
+    'dairy': ['milk', 'cheese', 'butter', 'yogurt', 'yoghurt', 'cream', 'egg', 'ghee', 'mala'],
+    'meat': ['chicken', 'beef', 'pork', 'lamb', 'mutton', 'goat', 'turkey', 'sausage', 'bacon', 'mince', 'ham'],
+    'seafood': ['fish', 'salmon', 'tuna', 'tilapia', 'prawn', 'shrimp', 'cod', 'omena', 'crab', 'sardine'],
+    'grains': ['rice', 'flour', 'maize flour', 'oats', 'pasta', 'spaghetti', 'noodles', 'quinoa', 'couscous', 'cereal'],
+    'legumes': ['beans', 'lentils', 'chickpeas', 'peas', 'green grams', 'ndengu', 'peanuts', 'almonds', 'cashews', 'nuts'],
+    'spices': [
+        'salt', 'black pepper', 'cumin', 'turmeric', 'paprika', 'cinnamon', 'ginger', 'chilli', 'curry powder',
+        'masala', 'oregano', 'basil', 'thyme', 'coriander', 'dhania', 'parsley', 'rosemary', 'nutmeg',
+    ],
+    'condiments': [
+        'oil', 'cooking oil', 'olive oil', 'vinegar', 'ketchup', 'tomato sauce', 'soy sauce', 'mayonnaise',
+        'mustard', 'honey', 'jam', 'sugar', 'stock cubes', 'sauce',
+    ],
+    'beverages': ['water', 'juice', 'tea', 'coffee', 'soda', 'wine', 'beer', 'cocoa'],
+    'frozen': ['frozen', 'ice cream', 'frozen peas', 'frozen vegetables', 'fish fingers'],
+    'bakery': ['bread', 'bun', 'buns', 'cake', 'croissant', 'bagel', 'chapati', 'tortilla', 'muffin'],
+    'canned': ['canned', 'tinned', 'baked beans', 'canned tomatoes', 'tomato paste', 'coconut milk'],
+}
+
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+
+def _stem(token):
+    """Crude plural folding so 'tomatoes' and 'tomato' share a trie path."""
+    if len(token) > 4 and token.endswith('oes'):
+        return token[:-2]
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(name):
+    return [_stem(token) for token in _TOKEN_RE.findall((name or '').lower())]
+
+
+def _phrases(tokens):
+    for start in range(len(tokens)):
+        for end in range(start + 1, min(start + MAX_PHRASE_WORDS, len(tokens)) + 1):
+            yield tuple(tokens[start:end])
+
+
+class CategoryClassifier:
+    """
+    Trie keyed by word phrases; each node stores {category: weight}.
+    classify() walks every phrase in the name through the trie, so the cost
+    is O(words * MAX_PHRASE_WORDS) dictionary lookups per item.
+    """
+
+    def __init__(self, root=None):
+        # node: {'w': {category: weight}, 'c': {token: child}}
+        self.root = root or {'w': {}, 'c': {}}
+
+    @classmethod
+    def train(cls, pairs, seed=True):
+        """Build a classifier from (name, category) pairs, plus the seed vocabulary."""
+        counts = defaultdict(lambda: defaultdict(float))
+        for name, category in pairs:
+            if not category or category == DEFAULT_CATEGORY:
+                continue
+            for phrase in set(_phrases(tokenize(name))):
+                counts[phrase][category] += 1
+        if seed:
+            for category, keywords in SEED_KEYWORDS.items():
+                for keyword in keywords:
+                    counts[tuple(tokenize(keyword))][category] += SEED_WEIGHT
+
+        classifier = cls()
+        for phrase, by_category in counts.items():
+            total = sum(by_category.values())
+            if total < MIN_PHRASE_COUNT:
+                continue
+            # Purity times log-frequency, boosted for longer (more specific) phrases
+            scale = math.log1p(total) * len(phrase)
+            classifier._insert(phrase, {
+                category: round(count / total * scale, 4) for category, count in by_category.items()
+            })
+        return classifier
+
+    def _insert(self, phrase, weights):
+        node = self.root
+        for token in phrase:
+            node = node['c'].setdefault(token, {'w': {}, 'c': {}})
+        node['w'] = weights
+
+    def scores(self, name):
+        tokens = tokenize(name)
+        totals = defaultdict(float)
+        for start in range(len(tokens)):
+            node = self.root
+            for token in tokens[start:start + MAX_PHRASE_WORDS]:
+                node = node['c'].get(token)
+                if node is None:
+                    break
+                for category, weight in node['w'].items():
+                    totals[category] += weight
+        return totals
+
+    def classify(self, name, default=DEFAULT_CATEGORY):
+        totals = self.scores(name)
+        if not totals:
+            return default
+        return max(totals.items(), key=lambda item: item[1])[0]
+
+    def to_json(self):
+        return json.dumps(self.root, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(json.loads(data))
+
+
+def classifier_path():
+    return Path(settings.CATEGORY_CLASSIFIER_PATH)
+
+
+@lru_cache(maxsize=1)
+def get_category_classifier():
+    """
+    The trained classifier, loaded once per worker process. Falls back to the
+    seed vocabulary until train_category_classifier has been run.
+    """
+    path = classifier_path()
+    if path.exists():
+        try:
+            return CategoryClassifier.from_json(path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Could not load category classifier from {path}: {e}")
+    return CategoryClassifier.train([])
+
+
+def classify_category(name):
+    """Best UserPantry category for an item name."""
+    return get_category_classifier().classify(name)
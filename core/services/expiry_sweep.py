@@ -0,0 +1,100 @@
+# core/services/expiry_sweep.py
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import FoodWasteRecord, UserPantry
+from core.services.generation_cache import invalidate_pantry_fingerprint
+
+EXPIRED_ITEM_FIELDS = ('id', 'user_id', 'quantity', 'unit', 'price', 'purchase_date', 'expiry_date')
+
+# Pantry items expired per sweep transaction
+DEFAULT_CHUNK_SIZE = 500
+
+
+def expire_pantry_items(items, today):
+    """
+    Record waste for and mark expired the given pantry items (a queryset of
+    active, in-stock items past their expiry date) in three queries: one SELECT, one
+    bulk INSERT of waste records (today's duplicates are skipped by the unique
+    constraint) and one UPDATE of their status.
+    Returns (items expired, ids of the users they belong to).
+    """
+    with transaction.atomic():
+        rows = list(items.values_list(*EXPIRED_ITEM_FIELDS))
+        # Keep the original quantity for historical accuracy: all of it expired
+        FoodWasteRecord.objects.bulk_create([
+            FoodWasteRecord(
+                user_id=user_id,
+                pantry_item_id=item_id,
+                original_quantity=quantity,
+                quantity_wasted=quantity,
+                unit=unit,
+                cost=price or Decimal('0.00'),
+                reason='expired',
+                reason_details=f"Item expired on {expiry_date}",
+                purchase_date=purchase_date,
+                expiry_date=expiry_date,
+                waste_date=today
+            )
+            for item_id, user_id, quantity, unit, price, purchase_date, expiry_date in rows
+            if quantity > 0
+        ], batch_size=500, ignore_conflicts=True)
+        expired = UserPantry.objects.filter(pk__in=[row[0] for row in rows], status='active').update(status='expired')
+
+    # update() doesn't send post_save, so drop the pantry fingerprints explicitly
+    user_ids = {row[1] for row in rows}
+    for user_id in user_ids:
+        invalidate_pantry_fingerprint(user_id)
+    return expired, user_ids
+
+
+def sweep_expired_items(chunk_size=DEFAULT_CHUNK_SIZE, today=None, progress=None):
+    """
+    Expire every user's pantry items that are past their date, in chunks
+    walked by (expiry_date, id) so each batch is a range scan of the
+    expiry_date index. progress, if given, is called with the running stats after
+    each chunk. Returns the final stats.
+    """
+    today = today or timezone.now().date()
+    # Used-up (zero quantity) items are left alone, as before
+    expired_items = UserPantry.objects.filter(status='active', expiry_date__lt=today, quantity__gt=0)
+    stats = {'chunks': 0, 'items_expired': 0, 'users': 0, 'elapsed_seconds': 0.0, 'items_per_second': 0.0}
+    users = set()
+    started = time.monotonic()
+    last_date, last_id = date.min, 0
+
+    while True:
+        chunk = list(
+            expired_items.filter(Q(expiry_date__gt=last_date) | Q(expiry_date=last_date, id__gt=last_id))
+            .order_by('expiry_date', 'id')
+            .values_list('expiry_date', 'id')[:chunk_size]
+        )
+        if not chunk:
+            break
+        last_date, last_id = chunk[-1]
+
+        expired, user_ids = expire_pantry_items(
+            expired_items.filter(pk__in=[item_id for _, item_id in chunk]), today
+        )
+        users |= user_ids
+        elapsed = time.monotonic() - started
+        stats.update(
+            chunks=stats['chunks'] + 1,
+            items_expired=stats['items_expired'] + expired,
+            users=len(users),
+            elapsed_seconds=round(elapsed, 3),
+            items_per_second=round((stats['items_expired'] + expired) / elapsed, 1) if elapsed else 0.0,
+        )
+        if progress:
+            progress(stats, last_date)
+
+    print(
+        f"Expiry sweep: {stats['items_expired']} items expired for {stats['users']} users "
+        f"in {stats['chunks']} chunks ({stats['elapsed_seconds']}s)"
+    )
+    return stats
@@ -0,0 +1,83 @@
+# core/services/generation_cache.py
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from accounts.models import UserProfile, UserGoal
+from core.models import UserPantry, Budget
+
+FINGERPRINT_KEY = "pantry_fingerprint:{user_id}"
+GENERATION_KEY = "ai_generation:{kind}:{user_id}:{fingerprint}:{day}:{params}"
+
+
+def compute_pantry_fingerprint(user_id):
+    """
+    Stable hash over everything that shapes an AI prompt for the user:
+    active pantry items (quantities, expiry dates), profile, goals and budget.
+    """
+    pantry = list(
+        UserPantry.objects.filter(user_id=user_id, status='active', quantity__gt=0)
+        .order_by('id')
+        .values_list('id', 'name', 'quantity', 'unit', 'expiry_date')
+    )
+    profile = (
+        UserProfile.objects.filter(user_id=user_id)
+        .values_list(
+            'height', 'weight', 'allergies', 'dietary_restrictions',
+            'disliked_ingredients', 'preferred_cuisines'
+        )
+        .first()
+    )
+    goals = list(
+        UserGoal.objects.filter(user_profile__user_id=user_id, active=True)
+        .order_by('priority', 'id')
+        .values_list('goal_type', 'priority')
+    )
+    budget = (
+        Budget.objects.filter(user_id=user_id, active=True)
+        .order_by('-start_date')
+        .values_list('amount', 'currency')
+        .first()
+    )
+
+    payload = json.dumps([pantry, profile, goals, budget], default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_pantry_fingerprint(user_id):
+    """Return the cached fingerprint for a user, computing it on first use."""
+    key = FINGERPRINT_KEY.format(user_id=user_id)
+    fingerprint = cache.get(key)
+    if fingerprint is None:
+        fingerprint = compute_pantry_fingerprint(user_id)
+        cache.set(key, fingerprint, None)
+    return fingerprint
+
+
+def invalidate_pantry_fingerprint(user_id):
+    """Drop the cached fingerprint so the next request recomputes it."""
+    cache.delete(FINGERPRINT_KEY.format(user_id=user_id))
+
+
+def _generation_key(kind, user_id, params):
+    return GENERATION_KEY.format(
+        kind=kind,
+        user_id=user_id,
+        fingerprint=get_pantry_fingerprint(user_id),
+        # Expiry windows shift daily even when nothing is edited
+        day=timezone.now().date().isoformat(),
+        params=params,
+    )
+
+
+def get_cached_generation(kind, user_id, params=''):
+    """Look up a previous AI generation for an unchanged pantry/profile/goal."""
+    return cache.get(_generation_key(kind, user_id, params))
+
+
+def set_cached_generation(kind, user_id, value, params=''):
+    """Remember an AI generation result for AI_GENERATION_CACHE_TTL seconds."""
+    ttl = getattr(settings, 'AI_GENERATION_CACHE_TTL', 6 * 60 * 60)
+    cache.set(_generation_key(kind, user_id, params), value, ttl)
@@ -0,0 +1,222 @@
+# core/services/pantry_gap.py
+from collections import defaultdict
+
+from core.models import UserPantry, RecipeIngredient, normalize_ingredient_name
+
+# unit alias -> (dimension, factor to the dimension's base unit: g, ml or piece)
+UNIT_CONVERSIONS = {
+    'g': ('mass', 1), 'gram': ('mass', 1), 'grams': ('mass', 1), 'gr': ('mass', 1),
+    'kg': ('mass', 1000), 'kilogram': ('mass', 1000), 'kilograms': ('mass', 1000), 'kgs': ('mass', 1000),
+    'mg': ('mass', 0.001),
+    'lb': ('mass', 453.592), 'lbs': ('mass', 453.592), 'pound': ('mass', 453.592), 'pounds': ('mass', 453.592),
+    'oz': ('mass', 28.3495), 'ounce': ('mass', 28.3495), 'ounces': ('mass', 28.3495),
+    'ml': ('volume', 1), 'milliliter': ('volume', 1), 'millilitre': ('volume', 1), 'milliliters': ('volume', 1),
+    'l': ('volume', 1000), 'liter': ('volume', 1000), 'litre': ('volume', 1000), 'liters': ('volume', 1000),
+    'litres': ('volume', 1000),
+    'cup': ('volume', 240), 'cups': ('volume', 240),
+    'tbsp': ('volume', 15), 'tablespoon': ('volume', 15), 'tablespoons': ('volume', 15),
+    'tsp': ('volume', 5), 'teaspoon': ('volume', 5), 'teaspoons': ('volume', 5),
+    'piece': ('count', 1), 'pieces': ('count', 1), 'pcs': ('count', 1), 'pc': ('count', 1),
+    'unit': ('count', 1), 'units': ('count', 1), 'whole': ('count', 1), 'item': ('count', 1),
+    'items': ('count', 1), 'dozen': ('count', 12),
+}
+
+BASE_UNITS = {'mass': 'g', 'volume': 'ml', 'count': 'pieces'}
+
+
+def normalize_unit(unit):
+    """
+    Return (dimension, factor) for a unit string. Unknown units form their own
+    dimension so they only ever add up with the exact same unit.
+    """
+    key = " ".join((unit or '').lower().replace('.', '').split())
+    if not key:
+        return 'count', 1
+    return UNIT_CONVERSIONS.get(key, (f"unit:{key}", 1))
+
+
+def base_unit(unit):
+    """Base unit name for a unit string: 'g', 'ml', 'pieces' or the unknown unit itself."""
+    dimension, _ = normalize_unit(unit)
+    return BASE_UNITS.get(dimension, dimension.split(':', 1)[-1])
+
+
+def to_base_quantity(quantity, unit):
+    """Convert a quantity to its dimension's base unit: returns (dimension, amount)."""
+    dimension, factor = normalize_unit(unit)
+    return dimension, float(quantity or 0) * factor
+
+
+def _display(dimension, amount, units):
+    """Express an amount in the recipe's own unit when only one was used."""
+    if len(units) == 1:
+        unit = next(iter(units))
+        _, factor = normalize_unit(unit)
+        return round(amount / factor, 2), unit
+    return round(amount, 2), (BASE_UNITS.get(dimension) or dimension.split(':', 1)[-1])
+
+
+def build_pantry_index(pantry_rows):
+    """
+    Hash pantry rows by normalized name: {key: {dimension: base_amount}}.
+    pantry_rows is an iterable of (name, quantity, unit).
+    """
+    index = defaultdict(lambda: defaultdict(float))
+    for name, quantity, unit in pantry_rows:
+        key = normalize_ingredient_name(name)
+        if not key or not quantity or quantity <= 0:
+            continue
+        dimension, amount = to_base_quantity(quantity, unit)
+        index[key][dimension] += amount
+    return index
+
+
+# Relative change in a stocked amount that counts as a pantry change
+SNAPSHOT_TOLERANCE = 0.01
+
+
+def snapshot_pantry(pantry_index, recipes):
+    """
+    JSON-serializable record of what a shopping list was built from: the
+    pantry index ({key: {dimension: amount}}) and the recipe ids.
+    """
+    return {
+        'pantry': {
+            key: {dimension: round(amount, 3) for dimension, amount in stock.items()}
+            for key, stock in pantry_index.items()
+        },
+        'recipes': sorted(recipe.id for recipe in recipes),
+    }
+
+
+def diff_pantry_snapshots(old_pantry, new_pantry, tolerance=SNAPSHOT_TOLERANCE):
+    """Normalized names added, removed or restocked between two snapshot pantries."""
+    changed = set(old_pantry.keys() ^ new_pantry.keys())
+    for key in old_pantry.keys() & new_pantry.keys():
+        old_stock, new_stock = old_pantry[key], new_pantry[key]
+        if old_stock.keys() != new_stock.keys():
+            changed.add(key)
+            continue
+        for dimension, amount in new_stock.items():
+            before = old_stock[dimension]
+            if abs(amount - before) > tolerance * max(abs(before), 1e-9):
+                changed.add(key)
+                break
+    return changed
+
+
+def compute_gap(pantry_index, requirements):
+    """
+    Compare summed recipe requirements with the pantry index.
+
+    requirements is an iterable of (key, name, quantity, unit, recipe_name).
+    Returns {'missing', 'short', 'covered', 'stats'}; every lookup is a dict
+    hit, so the cost is linear in the number of ingredients. Stock held only
+    in an incompatible unit is reported as short with unit_mismatch set.
+    """
+    needed = {}
+    for key, name, quantity, unit, recipe_name in requirements:
+        dimension, amount = to_base_quantity(quantity, unit)
+        entry = needed.setdefault((key, dimension), {
+            'name': name, 'amount': 0.0, 'units': set(), 'recipes': [],
+        })
+        entry['amount'] += amount
+        entry['units'].add(unit)
+        if recipe_name not in entry['recipes']:
+            entry['recipes'].append(recipe_name)
+
+    missing, short, covered = [], [], []
+    for (key, dimension), entry in needed.items():
+        stock = pantry_index.get(key)
+        recipes = entry['recipes']
+        quantity, unit = _display(dimension, entry['amount'], entry['units'])
+
+        if not stock:
+            missing.append({
+                'name': entry['name'],
+                'key': key,
+                'quantity': quantity,
+                'unit': unit,
+                'recipes': recipes,
+                'reason': f"Missing for recipe: {', '.join(recipes)}",
+                'priority': 'high',
+            })
+            continue
+
+        if dimension not in stock:
+            # Stocked in an incompatible unit (e.g. pieces vs grams): whether it's enough
+            # is unknown, so list it as short at a lower priority instead of assuming coverage
+            stocked = ', '.join(sorted(BASE_UNITS.get(d) or d.split(':', 1)[-1] for d in stock))
+            short.append({
+                'name': entry['name'],
+                'key': key,
+                'quantity': quantity,
+                'unit': unit,
+                'recipes': recipes,
+                'reason': (
+                    f"Check stock for {', '.join(recipes)}: pantry has it in {stocked}, "
+                    f"recipe needs {quantity} {unit}"
+                ),
+                'priority': 'medium',
+                'unit_mismatch': True,
+            })
+            continue
+
+        available = stock[dimension]
+        if available >= entry['amount']:
+            covered.append({
+                'name': entry['name'],
+                'key': key,
+                'use_quantity': quantity,
+                'available_quantity': _display(dimension, available, entry['units'])[0],
+                'unit': unit,
+                'recipes': recipes,
+            })
+        else:
+            to_buy, _ = _display(dimension, entry['amount'] - available, entry['units'])
+            have, _ = _display(dimension, available, entry['units'])
+            short.append({
+                'name': entry['name'],
+                'key': key,
+                'quantity': to_buy,
+                'unit': unit,
+                'recipes': recipes,
+                'reason': f"Insufficient for {', '.join(recipes)} (have {have}, need {quantity} {unit})",
+                'priority': 'high',
+                'unit_mismatch': False,
+            })
+
+    return {
+        'missing': missing,
+        'short': short,
+        'covered': covered,
+        'stats': {
+            'ingredients': len(needed),
+            'missing': len(missing),
+            'short': len(short),
+            'covered': len(covered),
+            'unit_mismatch': sum(1 for entry in short if entry['unit_mismatch']),
+        },
+    }
+
+
+def recipe_requirements(recipes):
+    """Requirement rows (key, name, quantity, unit, recipe_name) for compute_gap, in one query."""
+    return [
+        (ri.ingredient.normalized_name, ri.ingredient.name, ri.quantity, ri.unit, ri.recipe.name)
+        for ri in RecipeIngredient.objects.filter(recipe__in=recipes)
+        .select_related('ingredient', 'recipe')
+        .only('quantity', 'unit', 'ingredient__name', 'ingredient__normalized_name', 'recipe__name')
+    ]
+
+
+def analyze_pantry_gap(user, recipes):
+    """
+    Gap analysis of the user's active pantry against a set of recipes,
+    with one query for the pantry and one for the recipe ingredients.
+    """
+    pantry_index = build_pantry_index(
+        UserPantry.objects.filter(user=user, status='active', quantity__gt=0)
+        .values_list('name', 'quantity', 'unit')
+    )
+    return compute_gap(pantry_index, recipe_requirements(recipes))
@@ -0,0 +1,110 @@
+# core/services/price_catalog.py
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import PriceCatalogEntry, normalize_ingredient_name
+from core.services.pantry_gap import base_unit, to_base_quantity
+
+# Weight of the newest observation in the moving average
+PRICE_EWMA_ALPHA = 0.3
+
+
+def _observations(purchases):
+    """
+    Per-base-unit prices from (name, quantity, unit, total_price) tuples,
+    averaged when the same item appears more than once in a purchase.
+    """
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for name, quantity, unit, total_price in purchases:
+        key = normalize_ingredient_name(name)
+        _, amount = to_base_quantity(quantity, unit)
+        if not key or amount <= 0 or total_price is None or total_price <= 0:
+            continue
+        totals[(key, base_unit(unit))][0] += float(total_price)
+        totals[(key, base_unit(unit))][1] += amount
+    return {k: spent / amount for k, (spent, amount) in totals.items()}
+
+
+def record_purchases(user, purchases):
+    """
+    Fold confirmed purchases into the user's and the global price catalog.
+
+    purchases is an iterable of (name, quantity, unit, total_price). Missing
+    entries are inserted first with ON CONFLICT DO NOTHING, so concurrent
+    confirmations of a new item don't collide. Every entry is then locked
+    and updated with an exponentially weighted moving average, so concurrent
+    updates don't lose samples. The batch costs one insert, one locking read
+    and one bulk update, inside a savepoint.
+    """
+    observed = _observations(purchases)
+    if not observed:
+        return 0
+
+    owners = (user.id, None)
+    with transaction.atomic():
+        # Sorted so concurrent batches insert and lock rows in the same order
+        PriceCatalogEntry.objects.bulk_create([
+            PriceCatalogEntry(
+                user_id=owner_id, normalized_name=name, unit=unit,
+                unit_price=price, last_price=price, sample_count=0,
+            )
+            for (name, unit), price in sorted(observed.items())
+            for owner_id in owners
+        ], ignore_conflicts=True)
+
+        entries = (
+            PriceCatalogEntry.objects.select_for_update()
+            .filter(Q(user=user) | Q(user__isnull=True), normalized_name__in={name for name, _ in observed})
+            .order_by('pk')
+        )
+        now = timezone.now()
+        to_update = []
+        for entry in entries:
+            price = observed.get((entry.normalized_name, entry.unit))
+            if price is None:
+                continue
+            if entry.sample_count:
+                entry.unit_price = PRICE_EWMA_ALPHA * price + (1 - PRICE_EWMA_ALPHA) * entry.unit_price
+            else:
+                # Inserted above by this batch: the first observation is the price
+                entry.unit_price = price
+            entry.last_price = price
+            entry.sample_count += 1
+            entry.updated_at = now
+            to_update.append(entry)
+
+        PriceCatalogEntry.objects.bulk_update(to_update, ['unit_price', 'last_price', 'sample_count', 'updated_at'])
+    return len(observed)
+
+
+def lookup_unit_prices(user, names):
+    """
+    Learned prices for item names in one indexed query:
+    {normalized_name: {base_unit: price_per_base_unit}}. The user's own
+    prices take precedence over the global catalog.
+    """
+    keys = {normalize_ingredient_name(name) for name in names} - {''}
+    if not keys:
+        return {}
+
+    prices = defaultdict(dict)
+    entries = (
+        PriceCatalogEntry.objects.filter(Q(user=user) | Q(user__isnull=True), normalized_name__in=keys)
+        .values_list('user_id', 'normalized_name', 'unit', 'unit_price')
+    )
+    # Global rows first so the user's rows overwrite them
+    for user_id, name, unit, price in sorted(entries, key=lambda row: row[0] is not None):
+        prices[name][unit] = price
+    return dict(prices)
+
+
+def estimate_from_catalog(prices, name, quantity, unit):
+    """Estimated total for a quantity from lookup_unit_prices() output, or None if unknown."""
+    unit_price = prices.get(normalize_ingredient_name(name), {}).get(base_unit(unit))
+    if unit_price is None:
+        return None
+    _, amount = to_base_quantity(quantity, unit)
+    return unit_price * amount
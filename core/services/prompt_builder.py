@@ -0,0 +1,151 @@
+# core/services/prompt_builder.py
+import json
+import math
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+
+# Rough chars-per-token ratio for English/JSON text on OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+# Pantry categories that matter most for each UserGoal.goal_type
+GOAL_CATEGORY_RELEVANCE = {
+    'lose_weight': ('vegetables', 'fruits', 'seafood', 'legumes'),
+    'gain_weight': ('grains', 'dairy', 'meat', 'legumes', 'bakery'),
+    'build_muscle': ('meat', 'seafood', 'dairy', 'legumes'),
+    'maintain_weight': ('vegetables', 'grains', 'meat', 'fruits'),
+    'more_fiber': ('legumes', 'grains', 'vegetables', 'fruits'),
+    'more_iron': ('meat', 'legumes', 'vegetables', 'seafood'),
+    'more_veggies': ('vegetables', 'fruits'),
+    'reduce_waste': (),
+    'budget_friendly': ('grains', 'legumes', 'canned', 'frozen'),
+}
+
+# Column layouts used in the prompts: (header, getter)
+RECIPE_PANTRY_COLUMNS = [
+    ('name', lambda p: p.name),
+    ('cat', lambda p: p.category),
+    ('qty', lambda p: float(p.quantity)),
+    ('unit', lambda p: p.unit),
+    ('exp', lambda p: str(p.expiry_date)),
+    ('soon', lambda p: p.expiry_date <= timezone.now().date() + timedelta(days=3)),
+    ('kcal', lambda p: p.calories),
+    ('prot', lambda p: p.protein),
+    ('carb', lambda p: p.carbs),
+    ('fat', lambda p: p.fat),
+]
+
+SHOPPING_PANTRY_COLUMNS = [
+    ('name', lambda p: p.name),
+    ('qty', lambda p: float(p.quantity)),
+    ('unit', lambda p: p.unit),
+    ('exp', lambda p: str(p.expiry_date) if p.expiry_date else None),
+]
+
+
+def estimate_tokens(text):
+    """Approximate the number of tokens a piece of prompt text will cost."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _format_cell(value):
+    """Render a single table cell as compactly as possible."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value).replace('|', '/').replace('\n', ' ').strip()
+
+
+def goal_relevance(item, goal_type=None):
+    """Score how useful a pantry item is for the user's goal (higher is better)."""
+    categories = GOAL_CATEGORY_RELEVANCE.get(goal_type or '', ())
+    if item.category in categories:
+        # Earlier categories in the tuple are the most relevant ones
+        return len(categories) - categories.index(item.category)
+    return 0
+
+
+def rank_pantry_items(pantry_items, goal_type=None, expiring_within_days=3):
+    """
+    Order pantry items by prompt relevance:
+    items expiring soon first, then by goal relevance, then by expiry date.
+    """
+    today = timezone.now().date()
+    soon = today + timedelta(days=expiring_within_days)
+
+    def sort_key(item):
+        expiry = item.expiry_date or today + timedelta(days=3650)
+        return (
+            0 if expiry <= soon else 1,
+            -goal_relevance(item, goal_type),
+            expiry,
+            item.name.lower(),
+        )
+
+    return sorted(pantry_items, key=sort_key)
+
+
+def build_pantry_table(pantry_items, columns, goal_type=None, token_budget=None, truncate=True):
+    """
+    Encode pantry items as a pipe-separated table that fits within a token budget.
+
+    Zero-quantity rows are dropped, the remaining items are ranked by relevance
+    and rows are added until the budget is used up. Pass truncate=False when
+    the table must be complete (e.g. an exclusion list): every row is kept
+    and the budget is ignored.
+
+    Returns a tuple (table_text, stats) where stats reports how many items
+    were included and how many tokens were saved compared to indented JSON.
+    """
+    if token_budget is None:
+        token_budget = getattr(settings, 'AI_PROMPT_TOKEN_BUDGET', 1500)
+
+    items = [p for p in pantry_items if (p.quantity or 0) > 0]
+    ranked = rank_pantry_items(items, goal_type=goal_type)
+
+    headers = [header for header, _ in columns]
+    header_line = "|".join(headers)
+    lines = [header_line]
+    tokens_used = estimate_tokens(header_line)
+    baseline_rows = []
+    budget_exhausted = False
+
+    for item in ranked:
+        values = [getter(item) for _, getter in columns]
+        baseline_rows.append(dict(zip(headers, values)))
+
+        if budget_exhausted:
+            # Keep counting the baseline so the savings report stays accurate
+            continue
+
+        line = "|".join(_format_cell(v) for v in values)
+        line_tokens = estimate_tokens(line) + 1
+        if truncate and tokens_used + line_tokens > token_budget:
+            budget_exhausted = True
+            continue
+        lines.append(line)
+        tokens_used += line_tokens
+
+    included = len(lines) - 1
+    omitted = len(ranked) - included
+    if omitted:
+        lines.append(f"(+{omitted} lower-priority items omitted)")
+
+    text = "\n".join(lines)
+    tokens_used = estimate_tokens(text)
+    tokens_baseline = estimate_tokens(json.dumps(baseline_rows, indent=2, default=str))
+
+    stats = {
+        'items_total': len(pantry_items),
+        'items_included': included,
+        'items_omitted': omitted,
+        'tokens_used': tokens_used,
+        'tokens_baseline': tokens_baseline,
+        'tokens_saved': max(tokens_baseline - tokens_used, 0),
+    }
+    return text, stats
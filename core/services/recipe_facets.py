@@ -0,0 +1,111 @@
+# core/services/recipe_facets.py
+import hashlib
+import json
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, Value, When
+
+from core.models import Recipe
+
+FACET_VERSION_KEY = "recipe_facets:version"
+FACET_KEY = "recipe_facets:v{version}:{user_id}:{filters}"
+FACET_CACHE_TTL = 60 * 60
+
+
+def get_facet_version():
+    version = cache.get(FACET_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(FACET_VERSION_KEY, version, None)
+    return version
+
+
+def bump_facet_version():
+    """Invalidate every cached facet set; called whenever recipes are written."""
+    try:
+        cache.incr(FACET_VERSION_KEY)
+    except ValueError:
+        cache.set(FACET_VERSION_KEY, 2, None)
+
+
+def _choice_counts(counter, choices):
+    """Facet entries in the model's choice order, skipping empty buckets."""
+    return [
+        {'value': value, 'label': label, 'count': counter[value]}
+        for value, label in choices
+        if counter[value]
+    ]
+
+
+def compute_recipe_facets(recipes, user, cuisine='', difficulty=''):
+    """
+    Facet counts from a single grouped query.
+
+    recipes is the listing queryset *before* the cuisine and difficulty
+    filters, which are passed separately: each of those facets is counted
+    with every filter except its own (disjunctive faceting), so choosing a
+    cuisine still shows how many recipes the other cuisines have. Totals
+    and tag counts cover the fully filtered result.
+    """
+    rows = (
+        recipes.order_by()
+        .annotate(is_mine=Case(
+            When(created_by_id=user.id, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField()
+        ))
+        .values('cuisine', 'difficulty', 'is_ai_generated', 'is_mine', 'tags')
+        .annotate(count=Count('id'))
+    )
+
+    cuisines, difficulties, tags = Counter(), Counter(), Counter()
+    total = ai_generated = mine = 0
+    for row in rows:
+        count = row['count']
+        cuisine_match = not cuisine or row['cuisine'] == cuisine
+        difficulty_match = not difficulty or row['difficulty'] == difficulty
+        if difficulty_match:
+            cuisines[row['cuisine']] += count
+        if cuisine_match:
+            difficulties[row['difficulty']] += count
+        if not (cuisine_match and difficulty_match):
+            continue
+        total += count
+        if row['is_ai_generated']:
+            ai_generated += count
+        if row['is_mine']:
+            mine += count
+        for tag in row['tags'] or ():
+            tags[tag] += count
+
+    return {
+        'total': total,
+        'mine': mine,
+        'ai_generated': ai_generated,
+        'manual': total - ai_generated,
+        'cuisine': _choice_counts(cuisines, Recipe.CUISINE_CHOICES),
+        'difficulty': _choice_counts(difficulties, Recipe.DIFFICULTY_LEVELS),
+        'tags': [{'value': tag, 'count': count} for tag, count in tags.most_common()],
+    }
+
+
+def get_recipe_facets(recipes, user, filters=None):
+    """
+    Cached facet counts for the listing. recipes must not yet have the
+    cuisine/difficulty filters applied; they are read from filters. The
+    cache key covers the user and the active filter set and embeds a
+    version number that recipe writes bump.
+    """
+    filters_hash = hashlib.sha1(
+        json.dumps(filters or {}, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    key = FACET_KEY.format(version=get_facet_version(), user_id=user.id, filters=filters_hash)
+
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_recipe_facets(
+            recipes, user, cuisine=(filters or {}).get('cuisine', ''), difficulty=(filters or {}).get('difficulty', '')
+        )
+        cache.set(key, facets, FACET_CACHE_TTL)
+    return facets
@@ -0,0 +1,138 @@
+# core/services/recipe_retrieval.py
+from datetime import timedelta
+from functools import reduce
+import operator
+
+from django.db.models import Case, Count, Exists, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Q, Value, When
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from core.models import Recipe, RecipeIngredient, RecipeSuggestion, UserPantry
+from core.services.recipe_suggestion_ai import generate_multiple_ai_recipes
+from core.services.allergens import get_user_allergen_matcher
+
+# Share of a recipe's ingredients the user must already have for it to be reused
+MIN_PANTRY_COVERAGE = 0.6
+RECENT_RECIPE_DAYS = 21
+
+
+def find_reusable_recipes(user, limit=3, min_coverage=MIN_PANTRY_COVERAGE):
+    """
+    Score existing AI recipes against the user's pantry and preferences.
+
+    A recipe qualifies when enough of its ingredients are in the user's active
+    pantry, none of its ingredients match the user's allergies and it isn't one
+    of the recipes the user created or was suggested in the last 21 days. Preferred cuisines rank
+    first, then pantry coverage and rating. Scoring runs as a single query.
+    """
+    today = timezone.now().date()
+    profile = UserProfile.objects.filter(user=user).first()
+    allergen_matcher = get_user_allergen_matcher(profile.allergies if profile else "")
+    cuisines = [c.strip().lower() for c in (profile.preferred_cuisines.split(",") if profile and profile.preferred_cuisines else []) if c.strip()]
+
+    pantry_ingredient_ids = list(
+        UserPantry.objects.filter(
+            user=user,
+            status='active',
+            expiry_date__gte=today,
+            quantity__gt=0,
+            ingredient__isnull=False
+        ).values_list('ingredient_id', flat=True).distinct()
+    )
+    if not pantry_ingredient_ids:
+        return []
+
+    recent_names = [
+        name.lower() for name in Recipe.objects.recent_for(
+            user, timezone.now() - timedelta(days=RECENT_RECIPE_DAYS)
+        ).values_list('name', flat=True)
+    ]
+
+    candidates = (
+        Recipe.objects.filter(is_ai_generated=True)
+        .annotate(name_lower=Lower('name'))
+        .exclude(name_lower__in=recent_names)
+        .annotate(
+            ingredient_total=Count('recipeingredient', distinct=True),
+            ingredient_matched=Count(
+                'recipeingredient',
+                filter=Q(recipeingredient__ingredient_id__in=pantry_ingredient_ids),
+                distinct=True
+            ),
+        )
+        .filter(ingredient_matched__gt=0)
+        .annotate(
+            coverage=ExpressionWrapper(
+                F('ingredient_matched') * 1.0 / F('ingredient_total'),
+                output_field=FloatField()
+            ),
+            cuisine_match=Case(
+                When(cuisine__in=cuisines, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+        )
+        .filter(coverage__gte=min_coverage)
+    )
+
+    # Known allergen groups are excluded through the precomputed mask
+    candidates = candidates.safe_for(allergen_matcher.mask)
+    if allergen_matcher.unmapped_terms:
+        # Terms outside the allergen vocabulary fall back to name matching
+        allergen_filter = reduce(
+            operator.or_,
+            [Q(ingredient__normalized_name__contains=term) for term in allergen_matcher.unmapped_terms]
+        )
+        candidates = candidates.exclude(
+            Exists(RecipeIngredient.objects.filter(allergen_filter, recipe=OuterRef('pk')))
+        )
+
+    candidates = candidates.order_by('-cuisine_match', '-coverage', '-average_rating', '-created_at')
+
+    # The catalog can hold near-duplicates from different users - keep one per name
+    reusable = []
+    seen_names = set()
+    for recipe in candidates[:limit * 3]:
+        if recipe.name_lower in seen_names:
+            continue
+        seen_names.add(recipe.name_lower)
+        reusable.append(recipe)
+        if len(reusable) == limit:
+            break
+    return reusable
+
+
+def suggest_recipes(user, num_recipes=3, regenerate=False):
+    """
+    Return num_recipes suggestions, reusing qualifying catalog recipes first
+    and only asking the LLM for the shortfall.
+
+    Returns (recipes, stats) where stats reports how many recipes were reused,
+    how many were generated and how many LLM calls were avoided.
+    """
+    reused = [] if regenerate else find_reusable_recipes(user, limit=num_recipes)
+    if reused:
+        # Generated recipes are recorded as they're served; reused ones are recorded here
+        RecipeSuggestion.objects.record(user, reused)
+    shortfall = num_recipes - len(reused)
+
+    generated = []
+    if shortfall > 0:
+        generated = generate_multiple_ai_recipes(
+            user,
+            num_recipes=shortfall,
+            regenerate=regenerate,
+            exclude_names=[recipe.name for recipe in reused],
+        )
+
+    stats = {
+        'reused': len(reused),
+        'generated': len(generated),
+        'llm_calls_avoided': 0 if shortfall > 0 else 1,
+    }
+    print(
+        f"Recipe suggestions for user {user.id}: {stats['reused']} reused, "
+        f"{stats['generated']} generated, {stats['llm_calls_avoided']} LLM call(s) avoided"
+    )
+    return reused + generated, stats
@@ -0,0 +1,232 @@
+# core/services/recipe_similarity.py
+import hashlib
+import random
+from collections import Counter, defaultdict
+from functools import reduce
+import operator
+
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import Recipe, RecipeIngredient, RecipeSimilarity, RecipeMinHashBand
+
+# 32 hash functions split into 16 bands of 2 rows: recipes with an ingredient
+# Jaccard similarity around 0.25 or more are likely to share a bucket.
+NUM_PERMUTATIONS = 32
+ROWS_PER_BAND = 2
+NUM_BANDS = NUM_PERMUTATIONS // ROWS_PER_BAND
+
+NEIGHBORS_PER_RECIPE = 8
+MAX_CANDIDATES = 200
+
+# Score weights: ingredient similarity dominates, cuisine and tags break ties
+INGREDIENT_WEIGHT = 0.7
+CUISINE_WEIGHT = 0.2
+TAG_WEIGHT = 0.1
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20251118)
+_HASH_PARAMS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def minhash_signature(ingredient_ids):
+    """MinHash signature of a set of ingredient ids (empty for an empty set)."""
+    if not ingredient_ids:
+        return []
+    return [
+        min((a * x + b) % _MERSENNE_PRIME for x in ingredient_ids)
+        for a, b in _HASH_PARAMS
+    ]
+
+
+def band_buckets(signature):
+    """Hash each band of a signature into a signed 64-bit LSH bucket."""
+    buckets = []
+    for band in range(NUM_BANDS if signature else 0):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr(rows).encode('ascii'), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big', signed=True))
+    return buckets
+
+
+def estimated_jaccard(sig_a, sig_b):
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERMUTATIONS
+
+
+def similarity_score(recipe, other):
+    """Combine ingredient MinHash similarity with cuisine and dietary tag overlap."""
+    score = INGREDIENT_WEIGHT * estimated_jaccard(recipe.minhash_signature, other.minhash_signature)
+    if recipe.cuisine and recipe.cuisine == other.cuisine:
+        score += CUISINE_WEIGHT
+    tags_a, tags_b = set(recipe.tags), set(other.tags)
+    if tags_a and tags_b:
+        score += TAG_WEIGHT * len(tags_a & tags_b) / len(tags_a | tags_b)
+    return score
+
+
+def update_signatures(recipes):
+    """Recompute signatures and LSH bands for the given recipes."""
+    ingredient_sets = defaultdict(set)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe__in=recipes
+    ).values_list('recipe_id', 'ingredient_id'):
+        ingredient_sets[recipe_id].add(ingredient_id)
+
+    bands = []
+    for recipe in recipes:
+        recipe.minhash_signature = minhash_signature(ingredient_sets[recipe.id])
+        bands.extend(
+            RecipeMinHashBand(recipe=recipe, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_buckets(recipe.minhash_signature))
+        )
+
+    Recipe.objects.bulk_update(recipes, ['minhash_signature'])
+    RecipeMinHashBand.objects.filter(recipe__in=recipes).delete()
+    RecipeMinHashBand.objects.bulk_create(bands)
+
+
+def _candidate_map(recipes):
+    """
+    Recipes sharing at least one LSH bucket with each recipe, most collisions
+    first, for the whole batch from a single query on the (band, bucket) index.
+    """
+    wanted = {
+        recipe.id: list(enumerate(band_buckets(recipe.minhash_signature)))
+        for recipe in recipes
+    }
+    keys = {key for buckets in wanted.values() for key in buckets}
+    if not keys:
+        return {recipe_id: [] for recipe_id in wanted}
+
+    members = defaultdict(list)
+    for band, bucket, recipe_id in RecipeMinHashBand.objects.filter(
+        band__in={band for band, _ in keys}, bucket__in={bucket for _, bucket in keys}
+    ).values_list('band', 'bucket', 'recipe_id'):
+        if (band, bucket) in keys:
+            members[(band, bucket)].append(recipe_id)
+
+    candidate_map = {}
+    for recipe_id, buckets in wanted.items():
+        hits = Counter(
+            other_id for key in buckets for other_id in members[key] if other_id != recipe_id
+        )
+        ranked = sorted(hits.items(), key=lambda pair: (-pair[1], pair[0]))[:MAX_CANDIDATES]
+        candidate_map[recipe_id] = [other_id for other_id, _ in ranked]
+    return candidate_map
+
+
+def refresh_recipe_neighbors(recipes, update_reverse=True, signatures=True):
+    """
+    Incrementally refresh the neighbour table for new or edited recipes.
+
+    Signatures are recomputed, candidates come from shared LSH buckets, and
+    each recipe keeps its top NEIGHBORS_PER_RECIPE matches. When update_reverse
+    is set, the recipe is also inserted into candidates' lists it now belongs in.
+    Pass signatures=False when update_signatures() has already run for them.
+    """
+    recipes = list(recipes)
+    if not recipes:
+        return 0
+
+    with transaction.atomic():
+        if signatures:
+            update_signatures(recipes)
+
+        candidate_map = _candidate_map(recipes)
+        candidate_ids = {cid for ids in candidate_map.values() for cid in ids}
+        candidates = Recipe.objects.only(
+            'id', 'cuisine', 'tags', 'minhash_signature'
+        ).in_bulk(candidate_ids)
+
+        new_links = []
+        scored_pairs = []
+        fresh_scores = {}
+        for recipe in recipes:
+            fresh_scores[recipe.id] = {
+                cid: similarity_score(recipe, candidates[cid])
+                for cid in candidate_map[recipe.id] if cid in candidates
+            }
+            scored = sorted(
+                ((score, cid) for cid, score in fresh_scores[recipe.id].items()),
+                reverse=True
+            )[:NEIGHBORS_PER_RECIPE]
+            new_links.extend(
+                RecipeSimilarity(recipe_id=recipe.id, similar_recipe_id=cid, score=score)
+                for score, cid in scored
+            )
+            scored_pairs.extend((cid, recipe.id, score) for score, cid in scored)
+
+        RecipeSimilarity.objects.filter(recipe__in=recipes).delete()
+        RecipeSimilarity.objects.bulk_create(new_links)
+
+        if update_reverse:
+            _merge_reverse_links(scored_pairs, fresh_scores)
+
+    return len(new_links)
+
+
+def _merge_reverse_links(scored_pairs, fresh_scores):
+    """
+    Offer each (candidate, recipe, score) pair to the candidate's own top-k
+    list, writing only the links that enter, leave or change score.
+
+    fresh_scores maps each refreshed recipe to {candidate_id: score} for all
+    of its LSH candidates. Existing links to a refreshed recipe are rescored
+    from it, or dropped when the linking recipe is no longer a candidate.
+    """
+    offered = defaultdict(dict)
+    for candidate_id, recipe_id, score in scored_pairs:
+        offered[candidate_id][recipe_id] = score
+
+    existing = defaultdict(dict)
+    for recipe_id, similar_id, score in RecipeSimilarity.objects.filter(
+        Q(recipe_id__in=offered.keys()) | Q(similar_recipe_id__in=fresh_scores.keys())
+    ).values_list('recipe_id', 'similar_recipe_id', 'score'):
+        existing[recipe_id][similar_id] = score
+
+    upserts = []
+    removed = []
+    # Lists not offered anything were loaded partially (links to refreshed recipes
+    # only), but never grow here, so the top-k cut below can't drop their other links
+    for candidate_id in existing.keys() | offered.keys():
+        if candidate_id in fresh_scores:
+            # Its own list was just rewritten from fresh scores
+            continue
+        current = existing[candidate_id]
+        merged = {}
+        for rid, score in current.items():
+            if rid in fresh_scores:
+                if candidate_id not in fresh_scores[rid]:
+                    continue
+                score = fresh_scores[rid][candidate_id]
+            merged[rid] = score
+        merged.update(offered.get(candidate_id, {}))
+        top = dict(sorted(merged.items(), key=lambda pair: pair[1], reverse=True)[:NEIGHBORS_PER_RECIPE])
+        upserts.extend(
+            RecipeSimilarity(recipe_id=candidate_id, similar_recipe_id=rid, score=score)
+            for rid, score in top.items() if current.get(rid) != score
+        )
+        removed.extend((candidate_id, rid) for rid in current if rid not in top)
+
+    if removed:
+        RecipeSimilarity.objects.filter(reduce(operator.or_, (
+            Q(recipe_id=candidate_id, similar_recipe_id=rid) for candidate_id, rid in removed
+        ))).delete()
+    if upserts:
+        RecipeSimilarity.objects.bulk_create(
+            upserts,
+            update_conflicts=True,
+            unique_fields=['recipe', 'similar_recipe'],
+            update_fields=['score'],
+        )
+
+
+def get_similar_recipes(recipe, limit=4):
+    """Similar recipes from the precomputed neighbour table (one indexed query)."""
+    links = RecipeSimilarity.objects.filter(recipe=recipe).select_related('similar_recipe')[:limit]
+    return [link.similar_recipe for link in links]
@@ -2,14 +2,24 @@
 import openai
 import re
 import json
+import operator
+from functools import reduce
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from accounts.models import UserProfile, UserGoal
-from core.models import Recipe, UserPantry, RecipeIngredient, Budget
+from core.models import Recipe, RecipeSuggestion, UserPantry, RecipeIngredient, Budget, Ingredient, normalize_ingredient_name, parse_dietary_tags
+from core.services.prompt_builder import build_pantry_table, RECIPE_PANTRY_COLUMNS
+from core.services.generation_cache import get_cached_generation, set_cached_generation
+from core.services.recipe_similarity import refresh_recipe_neighbors
+from core.services.recipe_facets import bump_facet_version
+from core.services.allergens import get_user_allergen_matcher, parse_allergies
 
 openai.api_key = settings.OPENAI_API_KEY
 
+DIETARY_TAGS_MAX_LENGTH = Recipe._meta.get_field('dietary_tags').max_length
+
 
 def build_ai_recipe_context(user):
     """Build structured user + pantry context for OpenAI recipe generation."""
@@ -37,7 +47,7 @@ def build_ai_recipe_context(user):
             "height": profile.height if profile else "Unknown",
             "weight": profile.weight if profile else "Unknown",
             "goal": getattr(profile, "goal", "Healthy eating") if profile else "Healthy eating",
-            "allergies": [a.strip().lower() for a in profile.allergies.split(",")] if profile and profile.allergies else [],
+            "allergies": parse_allergies(profile.allergies) if profile else [],
             "preferred_cuisines": [c.strip().lower() for c in profile.preferred_cuisines.split(",")] if profile and profile.preferred_cuisines else [],
         },
         "pantry": [
@@ -59,27 +69,134 @@ def build_ai_recipe_context(user):
     return context
 
 
-def generate_multiple_ai_recipes(user, num_recipes=3):
+def save_ai_recipes(user, recipes_list):
+    """
+    Persist parsed AI recipes with a constant number of queries:
+    one batched catalog lookup (plus a bulk insert for unseen ingredients),
+    then bulk inserts for recipes and ingredient links. Nutrition is
+    computed in memory from the catalog before the recipes are inserted.
+    """
+    # Collect every ingredient up front so names can be resolved in one query
+    parsed_recipes = []
+    ingredient_names = []
+    for recipe_data in recipes_list:
+        ingredients = []
+        for ing_data in recipe_data.get("ingredients", []):
+            name = (ing_data.get("name") or "").strip()
+            if not name:
+                continue
+            try:
+                quantity = float(ing_data.get("quantity") or 0)
+            except (TypeError, ValueError):
+                quantity = 0.0
+            ingredients.append({
+                "key": normalize_ingredient_name(name),
+                "quantity": quantity,
+                "unit": ing_data.get("unit", "g"),
+            })
+            ingredient_names.append(name)
+        parsed_recipes.append((recipe_data, ingredients))
+
+    with transaction.atomic():
+        # Shared catalog entries - no placeholder pantry rows are needed
+        catalog = Ingredient.objects.resolve(ingredient_names)
+
+        # Build recipes with nutrition calculated from the catalog
+        recipes = []
+        for recipe_data, ingredients in parsed_recipes:
+            nutrition = Recipe.nutrition_totals(
+                (catalog[ing["key"]], ing["quantity"]) for ing in ingredients
+            )
+            dietary_tags = recipe_data.get("dietary_tags", "")
+            if isinstance(dietary_tags, list):
+                dietary_tags = ", ".join(str(tag) for tag in dietary_tags)
+            if len(dietary_tags) > DIETARY_TAGS_MAX_LENGTH:
+                # Drop whole tags past the column limit rather than failing the bulk insert
+                dietary_tags = dietary_tags[:DIETARY_TAGS_MAX_LENGTH].rsplit(',', 1)[0]
+            recipes.append(Recipe(
+                name=recipe_data.get("name", f"AI Recipe {timezone.now().strftime('%Y%m%d%H%M%S')}"),
+                description=recipe_data.get("description", "A delicious AI-generated recipe"),
+                cuisine=recipe_data.get("cuisine", "other"),
+                difficulty=recipe_data.get("difficulty", "medium"),
+                prep_time=recipe_data.get("prep_time", 15),
+                cook_time=recipe_data.get("cook_time", 25),
+                servings=recipe_data.get("servings", 2),
+                instructions=recipe_data.get("instructions", ""),
+                total_calories=nutrition["calories"],
+                total_protein=nutrition["protein"],
+                total_carbs=nutrition["carbs"],
+                total_fat=nutrition["fat"],
+                dietary_tags=dietary_tags,
+                # bulk_create skips save(), so normalize tags and derive allergens here
+                tags=parse_dietary_tags(dietary_tags),
+                allergen_mask=reduce(
+                    operator.or_, (catalog[ing["key"]].allergen_mask for ing in ingredients), 0
+                ),
+                created_by=user,
+                is_ai_generated=True,
+            ))
+        Recipe.objects.bulk_create(recipes)
+
+        # Link catalog ingredients to recipes through RecipeIngredient
+        links = [
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=catalog[ing["key"]],
+                quantity=ing["quantity"],
+                unit=ing["unit"],
+                optional=False
+            )
+            for recipe, (_, ingredients) in zip(recipes, parsed_recipes)
+            for ing in ingredients
+        ]
+        RecipeIngredient.objects.bulk_create(links)
+
+        # bulk_create skips save(), so index the new recipes for search in one update
+        Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes]).update_search_vector()
+
+    # bulk_create doesn't send post_save, so invalidate cached facet counts here
+    bump_facet_version()
+    refresh_recipe_neighbors(recipes)
+    return recipes
+
+
+def generate_multiple_ai_recipes(user, num_recipes=3, regenerate=False, exclude_names=None):
     """
     Generate multiple AI-powered recipe suggestions that use different pantry ingredients.
     Ensures variety by using different main ingredients across recipes.
+
+    Results are cached against the user's pantry fingerprint, so repeating the
+    request with an unchanged pantry/profile/goal skips the LLM call.
+    Pass regenerate=True to bypass the cache. exclude_names lists recipes
+    already suggested alongside these, which the model must not repeat.
     """
     try:
+        exclude_names = sorted(exclude_names or [])
+        cache_params = f"{num_recipes}:{'|'.join(exclude_names)}"
+        if not regenerate:
+            cached_ids = get_cached_generation('recipes', user.id, params=cache_params)
+            if cached_ids:
+                cached = Recipe.objects.in_bulk(cached_ids)
+                if len(cached) == len(cached_ids):
+                    print(f"Serving {len(cached_ids)} cached AI recipes for user {user.id}")
+                    recipes = [cached[recipe_id] for recipe_id in cached_ids]
+                    RecipeSuggestion.objects.record(user, recipes)
+                    return recipes
+
         # Get user profile and preferences
         try:
             profile = UserProfile.objects.get(user=user)
         except UserProfile.DoesNotExist:
             profile = None
             
-        budget = Budget.objects.filter(user=user, active=True).order_by('-start_date').first()
+        budget = Budget.objects.current_for(user)
         
         # Get user goal from UserGoal model
         goal = UserGoal.objects.filter(user_profile__user=user, active=True).order_by('priority').first()
 
         # Get recent recipes to avoid repetition
-        recent_recipes = Recipe.objects.filter(
-            created_by=user,
-            created_at__gte=timezone.now() - timedelta(days=21)
+        recent_recipes = Recipe.objects.recent_for(
+            user, timezone.now() - timedelta(days=21)
         ).values_list('name', flat=True)
 
         # Get available pantry items
@@ -90,29 +207,19 @@ def generate_multiple_ai_recipes(user, num_recipes=3):
             quantity__gt=0
         ).order_by('expiry_date')
 
-        expiring_soon = [
-            p for p in pantry_items 
-            if p.expiry_date <= timezone.now().date() + timedelta(days=3)
-        ]
-
-        pantry_data = [
-            {
-                "name": p.name,
-                "category": p.category,
-                "quantity": float(p.quantity),
-                "unit": p.unit,
-                "expiry_date": str(p.expiry_date),
-                "is_expiring_soon": p in expiring_soon,
-                "calories": p.calories,
-                "protein": p.protein,
-                "carbs": p.carbs,
-                "fat": p.fat,
-            }
-            for p in pantry_items
-        ]
+        # Compact, token-budgeted pantry table instead of indented JSON
+        pantry_table, prompt_stats = build_pantry_table(
+            pantry_items,
+            RECIPE_PANTRY_COLUMNS,
+            goal_type=goal.goal_type if goal else None,
+        )
+        print(
+            f"Recipe prompt pantry: {prompt_stats['items_included']}/{prompt_stats['items_total']} items, "
+            f"{prompt_stats['tokens_used']} tokens ({prompt_stats['tokens_saved']} saved)"
+        )
 
         # Prepare user constraints
-        allergies = [a.strip().lower() for a in (profile.allergies.split(",") if profile and profile.allergies else []) if a.strip()]
+        allergies = parse_allergies(profile.allergies) if profile else []
         cuisines = [c.strip().lower() for c in (profile.preferred_cuisines.split(",") if profile and profile.preferred_cuisines else []) if c.strip()]
         goal_text = goal.goal_type.replace("_", " ") if goal else "general healthy eating"
         budget_text = f"{budget.amount} {budget.currency}" if budget else "reasonable budget"
@@ -126,8 +233,9 @@ def generate_multiple_ai_recipes(user, num_recipes=3):
         - Budget: {budget_text}
         - Allergies (strictly avoid): {allergies}
         - Preferred cuisines: {cuisines or ["any"]}
-        - Available pantry ingredients: {json.dumps(pantry_data, indent=2)}
-        - Recently cooked recipes: {list(recent_recipes)}
+        - Available pantry ingredients (pipe-separated table, soon=1 means expiring within 3 days, nutrition per 100g):
+{pantry_table}
+        - Recently cooked recipes: {list(recent_recipes) + exclude_names}
 
         Your job:
         Create {num_recipes} DISTINCT recipes that:
@@ -194,70 +302,28 @@ def generate_multiple_ai_recipes(user, num_recipes=3):
             
         recipes_data = json.loads(match.group())
         recipes_list = recipes_data.get("recipes", [])
-        
-        created_recipes = []
-        
-        for recipe_data in recipes_list:
-            # Create Recipe in DB
-            recipe = Recipe.objects.create(
-                name=recipe_data.get("name", f"AI Recipe {timezone.now().strftime('%Y%m%d%H%M%S')}"),
-                description=recipe_data.get("description", "A delicious AI-generated recipe"),
-                cuisine=recipe_data.get("cuisine", "other"),
-                difficulty=recipe_data.get("difficulty", "medium"),
-                prep_time=recipe_data.get("prep_time", 15),
-                cook_time=recipe_data.get("cook_time", 25),
-                servings=recipe_data.get("servings", 2),
-                instructions=recipe_data.get("instructions", ""),
-                total_calories=recipe_data.get("total_calories", 0),
-                total_protein=recipe_data.get("total_protein", 0),
-                total_carbs=recipe_data.get("total_carbs", 0),
-                total_fat=recipe_data.get("total_fat", 0),
-                dietary_tags=recipe_data.get("dietary_tags", ""),
-                created_by=user,
-                is_ai_generated=True,
-            )
 
-            # Link ingredients to recipe through RecipeIngredient
-            for ing_data in recipe_data.get("ingredients", []):
-                name = ing_data.get("name", "").strip()
-                quantity = ing_data.get("quantity", 0)
-                unit = ing_data.get("unit", "g")
-                
-                if not name:
-                    continue
-                    
-                # Try to find matching pantry item, or create a reference
-                pantry_item = UserPantry.objects.filter(
-                    user=user,
-                    name__iexact=name
-                ).first()
-                
-                if not pantry_item:
-                    # Create a placeholder pantry item for the recipe
-                    pantry_item = UserPantry.objects.create(
-                        user=user,
-                        name=name,
-                        category='other',
-                        quantity=0,  # Not actually in pantry
-                        unit=unit,
-                        purchase_date=timezone.now().date(),
-                        expiry_date=timezone.now().date() + timedelta(days=30),
-                        status='active',
-                        detection_source='manual'
-                    )
-                
-                # Create RecipeIngredient link
-                RecipeIngredient.objects.create(
-                    recipe=recipe,
-                    pantry_item=pantry_item,
-                    quantity=quantity,
-                    unit=unit,
-                    optional=False
+        # The prompt asks the model to avoid allergens; verify instead of trusting it
+        matcher = get_user_allergen_matcher(profile.allergies if profile else "")
+        if matcher:
+            safe_recipes = []
+            for recipe_data in recipes_list:
+                hit = matcher.find(
+                    recipe_data.get("name", ""),
+                    *(str(ing.get("name", "")) for ing in recipe_data.get("ingredients", []) if isinstance(ing, dict))
                 )
-
-            # Calculate nutrition based on linked pantry items
-            recipe.calculate_nutrition()
-            created_recipes.append(recipe)
+                if hit:
+                    print(f"Dropping AI recipe '{recipe_data.get('name')}': contains allergen '{hit}'")
+                    continue
+                safe_recipes.append(recipe_data)
+            recipes_list = safe_recipes
+        
+        created_recipes = save_ai_recipes(user, recipes_list)
+        if created_recipes:
+            RecipeSuggestion.objects.record(user, created_recipes)
+            set_cached_generation(
+                'recipes', user.id, [recipe.id for recipe in created_recipes], params=cache_params
+            )
 
         return created_recipes
 
@@ -0,0 +1,152 @@
+# core/services/shopping_items.py
+import decimal
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from core.models import ShoppingList, ShoppingListItem, ITEM_TOTAL_FIELDS
+
+EDITABLE_LIST_STATUSES = ("generated", "draft")
+
+# Largest batch accepted by a single PATCH request
+MAX_BATCH_ITEMS = 50
+
+
+class ItemVersionConflict(Exception):
+    """Raised when an item changed since the client read it; carries the current items."""
+
+    def __init__(self, items):
+        super().__init__("Shopping list item was modified by another request.")
+        self.items = items
+
+
+def parse_item_changes(data):
+    """
+    Validate one item PATCH body. Returns (version, changes) where changes maps
+    model fields to new values; raises ValueError on bad input.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Each item update must be an object.")
+    try:
+        version = int(data["version"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("A numeric 'version' is required.")
+
+    changes = {}
+    if "purchased" in data:
+        if not isinstance(data["purchased"], bool):
+            raise ValueError("'purchased' must be true or false.")
+        changes["purchased"] = data["purchased"]
+    if "actual_price" in data:
+        if data["actual_price"] in (None, ""):
+            changes["actual_price"] = None
+        else:
+            try:
+                price = Decimal(str(data["actual_price"])).quantize(Decimal("0.01"))
+            except decimal.InvalidOperation:
+                raise ValueError("'actual_price' must be a number.")
+            if price < 0:
+                raise ValueError("'actual_price' cannot be negative.")
+            changes["actual_price"] = price
+    if "quantity" in data:
+        try:
+            quantity = float(data["quantity"])
+        except (TypeError, ValueError):
+            raise ValueError("'quantity' must be a number.")
+        if quantity <= 0:
+            raise ValueError("'quantity' must be positive.")
+        changes["quantity"] = quantity
+    if "expiry_date" in data:
+        if data["expiry_date"] in (None, ""):
+            changes["expiry_date"] = None
+        else:
+            try:
+                changes["expiry_date"] = datetime.strptime(str(data["expiry_date"]), "%Y-%m-%d").date()
+            except ValueError:
+                raise ValueError("'expiry_date' must be YYYY-MM-DD.")
+
+    if not changes:
+        raise ValueError("Nothing to update.")
+    return version, changes
+
+
+def serialize_item(item):
+    return {
+        "id": item.id,
+        "item_name": item.item_name,
+        "quantity": float(item.quantity),
+        "unit": item.unit,
+        "estimated_price": float(item.estimated_price),
+        "actual_price": float(item.actual_price) if item.actual_price is not None else None,
+        "purchased": item.purchased,
+        "expiry_date": item.expiry_date.isoformat() if item.expiry_date else None,
+        "version": item.version,
+    }
+
+
+def get_list_totals(shopping_list):
+    """Running totals as stored on the list (no aggregation)."""
+    return {
+        "item_count": shopping_list.item_count,
+        "purchased_count": shopping_list.purchased_count,
+        "total_estimated": float(shopping_list.total_estimated_cost),
+        "total_actual": float(shopping_list.items_actual_cost),
+    }
+
+
+def update_items(user, shopping_list_id, updates):
+    """
+    Apply item changes with optimistic concurrency. updates is a list of
+    (item_id, version, changes); each row is only written if its version
+    still matches, and the version is bumped on write. The batch is
+    all-or-nothing: any stale version raises ItemVersionConflict and rolls
+    everything back.
+
+    Returns (items, totals) with the updated items and the list's totals.
+    """
+    if not updates:
+        raise ValueError("No item updates supplied.")
+    if len(updates) > MAX_BATCH_ITEMS:
+        raise ValueError(f"At most {MAX_BATCH_ITEMS} items can be updated per request.")
+
+    with transaction.atomic():
+        # Lock the list so totals read below reflect exactly this batch
+        sl = ShoppingList.objects.select_for_update().get(id=shopping_list_id, user=user)
+        if sl.status not in EDITABLE_LIST_STATUSES:
+            raise ValueError("Shopping list can no longer be edited.")
+
+        item_ids = [item_id for item_id, _, _ in updates]
+        items = {item.id: item for item in sl.items.filter(id__in=item_ids)}
+        missing = [item_id for item_id in item_ids if item_id not in items]
+        if missing:
+            raise ShoppingListItem.DoesNotExist(f"Items not on this list: {missing}")
+
+        stale = []
+        totals_changes = []
+        for item_id, version, changes in updates:
+            written = ShoppingListItem.objects.filter(
+                id=item_id, shopping_list=sl, version=version
+            ).update(version=F("version") + 1, **changes)
+            if not written:
+                stale.append(item_id)
+                continue
+            item = items[item_id]
+            before = item.totals_contribution()
+            for field, value in changes.items():
+                setattr(item, field, value)
+            item.version = version + 1
+            totals_changes.append((before, item.totals_contribution()))
+
+        if stale:
+            # Report the rows as stored; this batch's writes are rolled back
+            current = sl.items.filter(id__in=stale)
+            raise ItemVersionConflict([serialize_item(item) for item in current])
+
+        delta = ShoppingListItem.totals_delta(totals_changes)
+        ShoppingList.objects.filter(pk=sl.pk).add_item_totals(delta)
+        for field, change in zip(ITEM_TOTAL_FIELDS, delta):
+            setattr(sl, field, getattr(sl, field) + change)
+
+        return [items[item_id] for item_id in item_ids], get_list_totals(sl)
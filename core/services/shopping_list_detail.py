@@ -0,0 +1,54 @@
+# core/services/shopping_list_detail.py
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+
+from accounts.models import UserProfile, UserGoal
+from core.models import UserPantry, Recipe, Budget
+
+PRIORITY_LEVELS = ('high', 'medium', 'low')
+
+
+def summarize_items(shopping_list, items):
+    """
+    Partition already-fetched list items by priority; totals come from the
+    list's running totals, so the detail page needs a single items query.
+    """
+    partitions = {priority: [] for priority in PRIORITY_LEVELS}
+    for item in items:
+        partitions.setdefault(item.priority, []).append(item)
+
+    total = shopping_list.item_count
+    purchased = shopping_list.purchased_count
+    return {
+        'high_priority_items': partitions['high'],
+        'medium_priority_items': partitions['medium'],
+        'low_priority_items': partitions['low'],
+        'total_items': total,
+        'purchased_items': purchased,
+        'purchased_percentage': (purchased / total * 100) if total > 0 else 0,
+        'total_estimated': shopping_list.total_estimated_cost,
+        'total_actual': shopping_list.items_actual_cost,
+    }
+
+
+def get_onboarding_status(user):
+    """
+    What the user has set up (pantry, recipes, budget, profile, goals),
+    answered with one query of EXISTS subqueries.
+    """
+    status = get_user_model().objects.filter(pk=user.pk).annotate(
+        has_pantry_items=Exists(UserPantry.objects.filter(user=OuterRef('pk'), status='active')),
+        has_recipes=Exists(Recipe.objects.filter(created_by=OuterRef('pk'))),
+        has_budget=Exists(Budget.objects.filter(user=OuterRef('pk'), active=True)),
+        has_user_profile=Exists(UserProfile.objects.filter(user=OuterRef('pk'))),
+        has_user_goal=Exists(UserGoal.objects.filter(user_profile__user=OuterRef('pk'), active=True)),
+    ).values(
+        'has_pantry_items', 'has_recipes', 'has_budget', 'has_user_profile', 'has_user_goal'
+    ).first()
+    return status or {
+        'has_pantry_items': False,
+        'has_recipes': False,
+        'has_budget': False,
+        'has_user_profile': False,
+        'has_user_goal': False,
+    }
@@ -0,0 +1,233 @@
+# core/services/shopping_planner.py
+import math
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from core.models import (
+    UserPantry, ShoppingList, ShoppingListItem, Budget, Recipe, Ingredient,
+    normalize_ingredient_name
+)
+from core.services.allergens import get_user_allergen_matcher
+from core.services.pantry_gap import (
+    build_pantry_index, compute_gap, recipe_requirements, snapshot_pantry, to_base_quantity
+)
+from core.services.price_catalog import estimate_from_catalog, lookup_unit_prices
+from core.services.category_classifier import classify_category
+
+PRIORITY_WEIGHTS = {'high': 10, 'medium': 4, 'low': 1}
+
+# Budget resolution for the knapsack: the remaining budget is split into at
+# most this many cost buckets, so planning time doesn't grow with the amount
+MAX_BUDGET_BUCKETS = 1000
+
+# Fallback prices per base unit (per g, ml or piece) when nothing has been learned
+DEFAULT_UNIT_PRICES = {
+    'vegetables': 0.002, 'fruits': 0.003, 'dairy': 0.004, 'meat': 0.009,
+    'seafood': 0.012, 'grains': 0.002, 'legumes': 0.003, 'spices': 0.02,
+    'condiments': 0.006, 'beverages': 0.002, 'frozen': 0.005, 'bakery': 0.003,
+    'canned': 0.004, 'other': 0.005,
+}
+DEFAULT_PIECE_PRICE = 0.5
+DEFAULT_PACK_PRICE = 2.0
+
+# Weekly basics offered at low priority when the budget has room left
+STAPLE_ITEMS = [
+    ('Rice', 'grains', 1, 'kg'),
+    ('Eggs', 'dairy', 12, 'pieces'),
+    ('Onions', 'vegetables', 1, 'kg'),
+    ('Tomatoes', 'vegetables', 1, 'kg'),
+    ('Milk', 'dairy', 2, 'l'),
+    ('Bread', 'bakery', 1, 'pieces'),
+    ('Cooking oil', 'condiments', 1, 'l'),
+    ('Beans', 'legumes', 500, 'g'),
+    ('Bananas', 'fruits', 6, 'pieces'),
+    ('Spinach', 'vegetables', 250, 'g'),
+]
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def estimate_price(name, category, quantity, unit, prices):
+    """Estimated cost of buying a quantity, preferring learned catalog prices."""
+    learned = estimate_from_catalog(prices, name, quantity, unit)
+    if learned is not None:
+        return _money(max(learned, 0.01))
+
+    dimension, amount = to_base_quantity(quantity, unit)
+    if dimension == 'count':
+        unit_price = DEFAULT_PIECE_PRICE
+    elif dimension in ('mass', 'volume'):
+        unit_price = DEFAULT_UNIT_PRICES.get(category, DEFAULT_UNIT_PRICES['other'])
+    else:
+        unit_price = DEFAULT_PACK_PRICE
+    return _money(max(unit_price * amount, 0.01))
+
+
+def knapsack_select(candidates, budget, max_buckets=MAX_BUDGET_BUCKETS):
+    """
+    Pick the candidates with the highest total value whose cost fits the budget.
+
+    candidates are dicts with 'cost' (Decimal) and 'value' (number). Costs are
+    rounded up into buckets of budget / max_buckets, so the selection never
+    exceeds the budget. Runs in O(len(candidates) * max_buckets).
+    Returns (selected, skipped) preserving the input order.
+    """
+    budget = Decimal(budget or 0)
+    if budget <= 0 or not candidates:
+        return [], list(candidates)
+
+    bucket_size = max(budget / max_buckets, Decimal('0.01'))
+    capacity = int(budget / bucket_size)
+    weights = [math.ceil(c['cost'] / bucket_size) for c in candidates]
+
+    best = [0.0] * (capacity + 1)
+    taken = []
+    for weight, candidate in zip(weights, candidates):
+        row = bytearray(capacity + 1)
+        value = candidate['value']
+        if weight <= capacity:
+            for c in range(capacity, weight - 1, -1):
+                with_item = best[c - weight] + value
+                if with_item > best[c]:
+                    best[c] = with_item
+                    row[c] = 1
+        taken.append(row)
+
+    chosen = set()
+    c = capacity
+    for index in range(len(candidates) - 1, -1, -1):
+        if taken[index][c]:
+            chosen.add(index)
+            c -= weights[index]
+
+    selected = [cand for i, cand in enumerate(candidates) if i in chosen]
+    skipped = [cand for i, cand in enumerate(candidates) if i not in chosen]
+    return selected, skipped
+
+
+def build_candidates(user, recipes, pantry_index, include_staples=True):
+    """Shopping candidates from the pantry gap plus staples, priced and filtered for allergens."""
+    gap = compute_gap(pantry_index, recipe_requirements(recipes))
+
+    candidates = []
+    for entry in gap['missing'] + gap['short']:
+        candidates.append({
+            'name': entry['name'],
+            'key': entry['key'],
+            'quantity': entry['quantity'],
+            'unit': entry['unit'],
+            'priority': entry['priority'],
+            'value': PRIORITY_WEIGHTS[entry['priority']] * len(entry['recipes']),
+            'reason': entry['reason'],
+        })
+
+    if include_staples:
+        wanted = {c['key'] for c in candidates}
+        for name, category, quantity, unit in STAPLE_ITEMS:
+            key = normalize_ingredient_name(name)
+            if key in pantry_index or key in wanted:
+                continue
+            candidates.append({
+                'name': name,
+                'key': key,
+                'category': category,
+                'quantity': quantity,
+                'unit': unit,
+                'priority': 'low',
+                'value': PRIORITY_WEIGHTS['low'],
+                'reason': 'Pantry staple',
+            })
+
+    profile = UserProfile.objects.filter(user=user).only('allergies').first()
+    matcher = get_user_allergen_matcher(profile.allergies if profile else '')
+    if matcher:
+        candidates = [c for c in candidates if not matcher.find(c['name'])]
+
+    keys = {c['key'] for c in candidates}
+    categories = dict(
+        Ingredient.objects.filter(normalized_name__in=keys).values_list('normalized_name', 'category')
+    )
+    prices = lookup_unit_prices(user, keys)
+    for candidate in candidates:
+        if 'category' not in candidate:
+            known = categories.get(candidate['key'])
+            candidate['category'] = known if known and known != 'other' else classify_category(candidate['name'])
+        candidate['cost'] = estimate_price(
+            candidate['key'], candidate['category'], candidate['quantity'], candidate['unit'], prices
+        )
+    return candidates
+
+
+def create_planned_list(user, budget, selected, pantry_snapshot, name=None):
+    """Save a generated list and its selected candidates, with running totals set."""
+    now = timezone.now()
+    with transaction.atomic():
+        sl = ShoppingList.objects.create(
+            user=user,
+            name=name or f"Smart Shopping List - {now.strftime('%d %b')}",
+            status="generated",
+            budget_limit=budget.amount,
+            item_count=len(selected),
+            total_estimated_cost=sum((c['cost'] for c in selected), Decimal('0.00')),
+            pantry_snapshot=pantry_snapshot,
+            week_number=now.isocalendar()[1],
+            month=now.month,
+            year=now.year,
+        )
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(
+                shopping_list=sl,
+                item_name=c['name'],
+                category=c['category'],
+                quantity=c['quantity'],
+                unit=c['unit'],
+                estimated_price=c['cost'],
+                priority=c['priority'],
+                notes=c['reason'],
+                purchased=False,
+            )
+            for c in selected
+        ])
+    return sl
+
+
+def plan_shopping_list(user, recipes=None, include_staples=True):
+    """
+    Build a shopping list locally, without an LLM call: gap analysis against
+    the recipes, priced candidates and a priority-weighted knapsack under the
+    remaining budget (amount minus amount_spent).
+
+    Returns (shopping_list, stats).
+    """
+    budget = Budget.objects.current_for(user)
+    if not budget:
+        raise ValueError("No active budget found for user.")
+    remaining = max(budget.amount - budget.amount_spent, Decimal('0.00'))
+
+    if recipes is None:
+        recipes = list(Recipe.objects.suggested_to(user)[:3])
+    pantry_index = build_pantry_index(
+        UserPantry.objects.filter(user=user, quantity__gt=0, status='active').values_list('name', 'quantity', 'unit')
+    )
+
+    candidates = build_candidates(user, recipes, pantry_index, include_staples=include_staples)
+    selected, skipped = knapsack_select(candidates, remaining)
+    sl = create_planned_list(user, budget, selected, snapshot_pantry(pantry_index, recipes))
+
+    stats = {
+        'candidates': len(candidates),
+        'selected': len(selected),
+        'skipped': [c['name'] for c in skipped],
+        'remaining_budget': remaining,
+        'estimated_cost': sl.total_estimated_cost,
+    }
+    print(
+        f"Planned shopping list {sl.id}: {stats['selected']}/{stats['candidates']} items, "
+        f"{stats['estimated_cost']} of {remaining} remaining budget"
+    )
+    return sl, stats
@@ -0,0 +1,113 @@
+# core/services/shopping_regeneration.py
+from decimal import Decimal
+
+from accounts.models import UserProfile
+from core.models import UserPantry, ShoppingList, Budget, Recipe, normalize_ingredient_name
+from core.services.allergens import get_user_allergen_matcher
+from core.services.ai_shopping_service import suggest_items_for_changes
+from core.services.category_classifier import classify_category
+from core.services.pantry_gap import (
+    build_pantry_index, compute_gap, diff_pantry_snapshots, recipe_requirements, snapshot_pantry
+)
+from core.services.shopping_planner import PRIORITY_WEIGHTS, build_candidates, create_planned_list, knapsack_select
+
+
+def latest_snapshot_list(user):
+    """Most recent list that recorded the pantry it was built from."""
+    return (
+        ShoppingList.objects.filter(user=user)
+        .exclude(pantry_snapshot={})
+        .order_by('-created_at')
+        .first()
+    )
+
+
+def _carried_candidates(base_list, changed, pantry_index, allergen_matcher):
+    """Unpurchased items from the previous list whose ingredient did not change."""
+    carried = []
+    for item in base_list.items.filter(purchased=False):
+        key = normalize_ingredient_name(item.item_name)
+        if key in changed or key in pantry_index or allergen_matcher.find(item.item_name):
+            continue
+        carried.append({
+            'name': item.item_name,
+            'key': key,
+            'category': item.category,
+            'quantity': item.quantity,
+            'unit': item.unit,
+            'cost': item.estimated_price,
+            'priority': item.priority,
+            'value': PRIORITY_WEIGHTS.get(item.priority, PRIORITY_WEIGHTS['medium']),
+            'reason': item.notes or item.reason,
+        })
+    return carried
+
+
+def regenerate_shopping_list(user, use_ai=False, model="gpt-4o-mini", temperature=0.5):
+    """
+    Rebuild the user's shopping list from pantry deltas: diff the current
+    pantry against the snapshot of the previous list, carry over items whose
+    ingredient is unchanged, and plan (locally, or via the model when use_ai)
+    only for the changed ingredients.
+
+    Returns (shopping_list, stats); shopping_list is None when there is no
+    usable previous list (none with a snapshot, or a different recipe set),
+    and the caller should generate a full list instead.
+    """
+    budget = Budget.objects.current_for(user)
+    if not budget:
+        raise ValueError("No active budget found for user.")
+
+    base_list = latest_snapshot_list(user)
+    recipes = list(Recipe.objects.suggested_to(user)[:3])
+    if not base_list or base_list.pantry_snapshot.get('recipes') != sorted(r.id for r in recipes):
+        return None, {'reason': 'no comparable previous list'}
+
+    pantry_index = build_pantry_index(
+        UserPantry.objects.filter(user=user, quantity__gt=0, status='active').values_list('name', 'quantity', 'unit')
+    )
+    changed = diff_pantry_snapshots(base_list.pantry_snapshot.get('pantry', {}), pantry_index)
+    if not changed and base_list.status in ('generated', 'draft'):
+        print(f"Pantry unchanged since shopping list {base_list.id}; reusing it")
+        return base_list, {'base_list': base_list.id, 'changed_ingredients': [], 'carried_over': base_list.item_count}
+
+    profile = UserProfile.objects.filter(user=user).only('allergies').first()
+    allergen_matcher = get_user_allergen_matcher(profile.allergies if profile else '')
+    carried = _carried_candidates(base_list, changed, pantry_index, allergen_matcher)
+    carried_keys = {c['key'] for c in carried}
+
+    if use_ai:
+        gap = compute_gap(pantry_index, [r for r in recipe_requirements(recipes) if r[0] in changed])
+        changes = [
+            {'name': e['name'], 'quantity': e['quantity'], 'unit': e['unit'], 'reason': e['reason']}
+            for e in gap['missing'] + gap['short']
+        ]
+        fresh = suggest_items_for_changes(
+            user, changes, pantry_index, allergen_matcher, budget, model=model, temperature=temperature
+        )
+        for candidate in fresh:
+            candidate['category'] = classify_category(candidate['name'])
+    else:
+        fresh = [c for c in build_candidates(user, recipes, pantry_index) if c['key'] in changed]
+    fresh = [c for c in fresh if c['key'] not in carried_keys]
+
+    remaining = max(budget.amount - budget.amount_spent, Decimal('0.00'))
+    selected, skipped = knapsack_select(carried + fresh, remaining)
+    sl = create_planned_list(
+        user, budget, selected, snapshot_pantry(pantry_index, recipes),
+        name=f"{base_list.name} (updated)" if not base_list.name.endswith("(updated)") else base_list.name,
+    )
+
+    stats = {
+        'base_list': base_list.id,
+        'changed_ingredients': sorted(changed),
+        'carried_over': len(carried),
+        'new_candidates': len(fresh),
+        'selected': len(selected),
+        'skipped': [c['name'] for c in skipped],
+    }
+    print(
+        f"Regenerated shopping list {sl.id} from {base_list.id}: {len(changed)} changed ingredients, "
+        f"{len(carried)} carried over, {len(fresh)} new candidates"
+    )
+    return sl, stats
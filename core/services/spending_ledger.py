@@ -0,0 +1,53 @@
+# core/services/spending_ledger.py
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Budget, SpendingEntry
+
+
+def record_spending(user, amount, budget=None, shopping_list=None, kind='purchase', note=''):
+    """
+    Append a ledger entry and move the budget balance by the same amount with
+    an F() update, in one transaction. Returns the entry.
+    """
+    amount = Decimal(str(amount or 0))
+    with transaction.atomic():
+        entry = SpendingEntry.objects.create(
+            user=user, budget=budget, shopping_list=shopping_list, kind=kind, amount=amount, note=note
+        )
+        if budget is not None and amount:
+            Budget.objects.filter(pk=budget.pk).update(amount_spent=F('amount_spent') + amount)
+    return entry
+
+
+def ledger_balances():
+    """Subquery expression: the sum of ledger entries for OuterRef('pk') budgets."""
+    totals = (
+        SpendingEntry.objects.filter(budget=OuterRef('pk'))
+        .order_by().values('budget').annotate(total=Sum('amount')).values('total')
+    )
+    return Coalesce(
+        Subquery(totals, output_field=DecimalField(max_digits=10, decimal_places=2)),
+        Value(Decimal('0.00'))
+    )
+
+
+def reconcile_budget_balances(budgets=None, fix=True):
+    """
+    Compare amount_spent with the ledger for each budget and, when fix is set,
+    reset drifted balances to the ledger total in one UPDATE.
+    Returns [(budget_id, stored, ledger)] for the budgets that drifted.
+    """
+    budgets = Budget.objects.all() if budgets is None else budgets
+    drift = [
+        (budget_id, stored, ledger)
+        for budget_id, stored, ledger in budgets.annotate(ledger_total=ledger_balances())
+        .values_list('pk', 'amount_spent', 'ledger_total')
+        if stored != ledger
+    ]
+    if drift and fix:
+        Budget.objects.filter(pk__in=[row[0] for row in drift]).update(amount_spent=ledger_balances())
+    return drift
@@ -0,0 +1,102 @@
+# core/services/spending_rollup.py
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.models import MonthlySpending, ShoppingList
+
+
+def month_start(value):
+    """First day of the calendar month containing a date or datetime."""
+    if hasattr(value, 'date') and callable(value.date):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def record_monthly_spend(user, when, amount, lists=1):
+    """
+    Add a confirmed list's spend to its month's rollup row with an F() update;
+    the row is only created on the first confirmation of the month.
+    """
+    month = month_start(when)
+    amount = Decimal(str(amount or 0))
+    updated = MonthlySpending.objects.filter(user=user, month=month).update(
+        amount=F('amount') + amount,
+        list_count=F('list_count') + lists,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MonthlySpending.objects.create(user=user, month=month, amount=amount, list_count=lists)
+    except IntegrityError:
+        # A concurrent confirmation created the row first
+        MonthlySpending.objects.filter(user=user, month=month).update(
+            amount=F('amount') + amount,
+            list_count=F('list_count') + lists,
+            updated_at=timezone.now(),
+        )
+
+
+def monthly_series(user, start, end):
+    """
+    Spending per calendar month from start to end (inclusive), zero-filled,
+    from one range query on the rollup table.
+    Returns [{'month': date, 'label': 'Oct 2026', 'amount': Decimal, 'lists': int}].
+    """
+    start, end = month_start(start), month_start(end)
+    rows = {
+        month: (amount, lists)
+        for month, amount, lists in MonthlySpending.objects.filter(
+            user=user, month__gte=start, month__lte=end
+        ).values_list('month', 'amount', 'list_count')
+    }
+    series = []
+    month = start
+    while month <= end:
+        amount, lists = rows.get(month, (Decimal('0.00'), 0))
+        series.append({'month': month, 'label': month.strftime('%b %Y'), 'amount': amount, 'lists': lists})
+        month = add_months(month, 1)
+    return series
+
+
+def rebuild_monthly_spending(user_ids=None):
+    """
+    Recompute the rollup from confirmed shopping lists with one TruncMonth
+    grouped query, replacing existing rows. Returns the number of rows written.
+    """
+    lists = ShoppingList.objects.filter(status='confirmed', completed_at__isnull=False)
+    rollup = MonthlySpending.objects.all()
+    if user_ids is not None:
+        lists = lists.filter(user_id__in=user_ids)
+        rollup = rollup.filter(user_id__in=user_ids)
+
+    grouped = (
+        lists.annotate(spend_month=TruncMonth('completed_at'))
+        .values('user_id', 'spend_month')
+        .annotate(amount=Sum('total_actual_cost'), list_count=Count('id'))
+        .order_by()
+    )
+    rows = [
+        MonthlySpending(
+            user_id=row['user_id'],
+            month=month_start(row['spend_month']),
+            amount=row['amount'] or Decimal('0.00'),
+            list_count=row['list_count'],
+        )
+        for row in grouped
+    ]
+    with transaction.atomic():
+        rollup.delete()
+        MonthlySpending.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
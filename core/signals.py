@@ -1,65 +1,48 @@
 # core/signals.py
-from django.db import transaction
 from django.utils import timezone
-from decimal import Decimal
-from django.db.models import Sum, Count
-from .models import UserPantry, FoodWasteRecord
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import UserProfile, UserGoal
+from .models import UserPantry, Budget, Recipe
+from .services.expiry_sweep import expire_pantry_items
+from .services.generation_cache import invalidate_pantry_fingerprint
+from .services.recipe_facets import bump_facet_version
+
+
+# Keep the per-user pantry fingerprint fresh whenever prompt inputs change.
+@receiver([post_save, post_delete], sender=UserPantry)
+@receiver([post_save, post_delete], sender=Budget)
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_fingerprint_for_user(sender, instance, **kwargs):
+    invalidate_pantry_fingerprint(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserGoal)
+def invalidate_fingerprint_for_goal(sender, instance, **kwargs):
+    user_id = UserProfile.objects.filter(pk=instance.user_profile_id).values_list('user_id', flat=True).first()
+    if user_id:
+        invalidate_pantry_fingerprint(user_id)
+
+
+# Any recipe write can change facet counts for every user.
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe_facets(sender, instance, **kwargs):
+    bump_facet_version()
 
 
 def detect_and_process_all_expired_items(user):
     """
-    Detects ALL expired items by comparing today's date with expiry_date
-    Creates waste records with actual quantities
+    Detects ALL of a user's expired items by comparing today's date with
+    expiry_date, creates waste records with actual quantities and marks the
+    items expired in a constant number of queries. The scheduled sweep
+    (core.tasks.sweep_expired_pantry_items) does the same for every user.
     """
     today = timezone.now().date()
-    newly_expired_count = 0
-    
-    # Find all active items that have expired
     expired_items = UserPantry.objects.filter(
         user=user,
         status='active',
         expiry_date__lt=today,
         quantity__gt=0
     )
-    
-    # Process each expired item
-    for item in expired_items:
-        try:
-            with transaction.atomic():
-                # Get the current quantity
-                current_quantity = item.quantity
-                
-                # Check if waste record already exists for TODAY
-                existing_waste_record = FoodWasteRecord.objects.filter(
-                    pantry_item=item,
-                    reason='expired',
-                    waste_date=today
-                ).exists()
-                
-                # Only create waste record if it doesn't exist
-                if not existing_waste_record:
-                    # Create the waste record with actual quantity
-                    FoodWasteRecord.objects.create(
-                        user=user,
-                        pantry_item=item,
-                        original_quantity=current_quantity,
-                        quantity_wasted=current_quantity,  # All of it expired
-                        unit=item.unit,
-                        cost=item.price or Decimal('0.00'),
-                        reason='expired',
-                        reason_details=f"Item expired on {item.expiry_date}",
-                        purchase_date=item.purchase_date,
-                        expiry_date=item.expiry_date,
-                        waste_date=today
-                    )
-                
-                # Mark the pantry item as expired (doesn't change quantity)
-                item.mark_as_expired()
-                
-                newly_expired_count += 1
-                
-        except Exception as e:
-            print(f"Error processing expired item {item.id} ({item.name}): {e}")
-            continue
-    
+    newly_expired_count, _ = expire_pantry_items(expired_items, today)
     return newly_expired_count
@@ -0,0 +1,22 @@
+# core/tasks.py
+from celery import shared_task
+from django.conf import settings
+
+from core.services import spending_ledger
+from core.services.expiry_sweep import sweep_expired_items
+
+
+@shared_task(name='core.sweep_expired_pantry_items')
+def sweep_expired_pantry_items(chunk_size=None):
+    """Periodic cross-user expiry sweep; returns the sweep's progress metrics."""
+    return sweep_expired_items(chunk_size=chunk_size or settings.EXPIRY_SWEEP_CHUNK_SIZE)
+
+
+@shared_task(name='core.reconcile_budget_balances')
+def reconcile_budget_balances():
+    """Periodic reset of budget balances that drifted from the spending ledger; returns the drift count."""
+    drift = spending_ledger.reconcile_budget_balances()
+    for budget_id, stored, ledger in drift:
+        print(f"Budget {budget_id}: amount_spent {stored} -> {ledger}")
+    print(f"Reconciled budget balances: repaired drift on {len(drift)} budgets")
+    return len(drift)
@@ -1,3 +1,1107 @@
-from django.test import TestCase
+import json
+import random
+import threading
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import (
+    RECIPE_TAG_MAX_LENGTH, Budget, FoodWasteRecord, Ingredient, MonthlySpending, PriceCatalogEntry, Recipe,
+    RecipeIngredient, RecipeSimilarity, RecipeSuggestion, ShoppingList, ShoppingListItem, SpendingEntry, UserPantry,
+    parse_dietary_tags
+)
+from core import tasks
+from core.services.ai_shopping_service import confirm_shopping_list
+from core.services.allergens import ALLERGEN_BITS, AhoCorasick, allergen_mask_for, get_user_allergen_matcher
+from core.services.category_classifier import (
+    DEFAULT_CATEGORY, CategoryClassifier, classify_category, get_category_classifier
+)
+from core.services.expiry_sweep import sweep_expired_items
+from core.services.generation_cache import (
+    compute_pantry_fingerprint, get_cached_generation, get_pantry_fingerprint, set_cached_generation
+)
+from core.services.pantry_gap import build_pantry_index, compute_gap
+from core.services.recipe_retrieval import find_reusable_recipes, suggest_recipes
+from core.services.recipe_similarity import (
+    estimated_jaccard, get_similar_recipes, minhash_signature, refresh_recipe_neighbors
+)
+from core.services.price_catalog import (
+    PRICE_EWMA_ALPHA, estimate_from_catalog, lookup_unit_prices, record_purchases
+)
+from core.services.prompt_builder import SHOPPING_PANTRY_COLUMNS, build_pantry_table
+from core.services.shopping_planner import knapsack_select, plan_shopping_list
+from core.services.shopping_regeneration import regenerate_shopping_list
+from core.signals import detect_and_process_all_expired_items
+from core.services.spending_ledger import reconcile_budget_balances, record_spending
+from core.services.spending_rollup import monthly_series, rebuild_monthly_spending, record_monthly_spend
+
+
+class ConfirmShoppingListTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='shopper@example.com', password='pass12345')
+        today = timezone.now().date()
+        self.budget = Budget.objects.create(
+            user=self.user, amount=Decimal('500.00'),
+            start_date=today - timedelta(days=1), end_date=today + timedelta(days=6)
+        )
+
+    def _make_list(self, size, prefix):
+        sl = ShoppingList.objects.create(
+            user=self.user, name=f"List {prefix}", status='generated',
+            budget_limit=self.budget.amount, year=timezone.now().year
+        )
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(
+                shopping_list=sl, item_name=f"{prefix} item {i}", category='vegetables',
+                quantity=1, unit='kg', estimated_price=Decimal('2.00')
+            )
+            for i in range(size)
+        ])
+        payload = [
+            {'shopping_list_item_id': item_id, 'actual_price': 1.5, 'purchased_quantity': 2, 'expiry_date': None}
+            for item_id in sl.items.values_list('id', flat=True)
+        ]
+        return sl, payload
+
+    def _confirm_queries(self, size, prefix):
+        sl, payload = self._make_list(size, prefix)
+        with CaptureQueriesContext(connection) as ctx:
+            result = confirm_shopping_list(self.user, sl.id, payload)
+        self.assertIsNotNone(result)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_list_size(self):
+        # The month's spending rollup row is created on the first confirmation only
+        record_monthly_spend(self.user, timezone.now(), 0, lists=0)
+        small = self._confirm_queries(3, 'small')
+        large = self._confirm_queries(40, 'large')
+        self.assertEqual(small, large)
+
+    def test_confirmation_updates_items_pantry_and_budget(self):
+        sl, payload = self._make_list(5, 'basic')
+        confirm_shopping_list(self.user, sl.id, payload)
+
+        sl.refresh_from_db()
+        self.budget.refresh_from_db()
+        self.assertEqual(sl.status, 'confirmed')
+        self.assertEqual(sl.total_actual_cost, Decimal('7.50'))
+        self.assertEqual(sl.items.filter(purchased=True, actual_price=Decimal('1.50')).count(), 5)
+        self.assertEqual(self.budget.amount_spent, Decimal('7.50'))
+
+        pantry = UserPantry.objects.filter(user=self.user)
+        self.assertEqual(pantry.count(), 5)
+        self.assertFalse(pantry.filter(ingredient__isnull=True).exists())
+        self.assertEqual(pantry.first().expiry_date, timezone.now().date() + timedelta(days=7))
+
+    def test_receipt_total_is_charged_to_budget_and_rollup(self):
+        sl, payload = self._make_list(2, 'receipt')
+        confirm_shopping_list(self.user, sl.id, payload, total_actual_cost=3.20)
+
+        sl.refresh_from_db()
+        self.budget.refresh_from_db()
+        self.assertEqual(sl.total_actual_cost, Decimal('3.20'))
+        self.assertEqual(self.budget.amount_spent, Decimal('3.20'))
+        self.assertEqual(SpendingEntry.objects.get(shopping_list=sl).amount, Decimal('3.20'))
+        self.assertEqual(MonthlySpending.objects.get(user=self.user).amount, Decimal('3.20'))
+        self.assertEqual(reconcile_budget_balances(Budget.objects.filter(pk=self.budget.pk)), [])
+
+
+    def test_price_learning_failure_does_not_abort_confirmation(self):
+        sl, payload = self._make_list(2, 'prices')
+        # A name too long for the catalog column makes the price insert fail in the database
+        with mock.patch('core.services.price_catalog._observations', return_value={('x' * 300, 'g'): 0.01}):
+            self.assertIsNotNone(confirm_shopping_list(self.user, sl.id, payload))
+
+        sl.refresh_from_db()
+        self.assertEqual(sl.status, 'confirmed')
+        self.assertEqual(UserPantry.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(PriceCatalogEntry.objects.exists())
+
+
+class ConfirmShoppingListAutocommitTests(TransactionTestCase):
+    """confirm_shopping_list must lock the list itself, without an outer transaction."""
+
+    def test_confirms_once_outside_a_transaction(self):
+        user = get_user_model().objects.create_user(email='autocommit@example.com', password='pass12345')
+        sl = ShoppingList.objects.create(
+            user=user, name="Autocommit", status='generated', budget_limit=Decimal('50.00'), year=timezone.now().year
+        )
+        item = ShoppingListItem.objects.create(
+            shopping_list=sl, item_name='beans', quantity=1, unit='kg', estimated_price=Decimal('2.00')
+        )
+        payload = [{'shopping_list_item_id': item.id, 'actual_price': 2.5, 'purchased_quantity': 1}]
+
+        self.assertIsNotNone(confirm_shopping_list(user, sl.id, payload))
+        self.assertIsNone(confirm_shopping_list(user, sl.id, payload))
+        sl.refresh_from_db()
+        self.assertEqual((sl.status, sl.total_actual_cost), ('confirmed', Decimal('2.50')))
+
+
+class ShoppingListDetailQueryTests(TestCase):
+    # session, user, list, items, active budget, onboarding status
+    QUERY_BUDGET = 6
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='viewer@example.com', password='pass12345')
+        self.client.force_login(self.user)
+
+    def _detail_queries(self, size):
+        sl = ShoppingList.objects.create(
+            user=self.user, name=f"List {size}", status='generated',
+            budget_limit=Decimal('100.00'), year=timezone.now().year
+        )
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(
+                shopping_list=sl, item_name=f"item {i}", quantity=1, unit='kg',
+                estimated_price=Decimal('1.00'), priority=('high', 'medium', 'low')[i % 3],
+                purchased=i % 2 == 0
+            )
+            for i in range(size)
+        ])
+        ShoppingList.objects.filter(pk=sl.pk).recompute_item_totals()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('shopping_list_detail', args=[sl.id]))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.context
+
+    def test_query_count_is_bounded_and_independent_of_list_size(self):
+        small, _ = self._detail_queries(3)
+        large, context = self._detail_queries(60)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.QUERY_BUDGET)
+        self.assertEqual(context['total_items'], 60)
+        self.assertEqual(context['purchased_items'], 30)
+        self.assertEqual(len(context['high_priority_items']), 20)
+        self.assertEqual(context['total_estimated'], Decimal('60.00'))
+
+
+class ShoppingListItemPatchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='patcher@example.com', password='pass12345')
+        self.client.force_login(self.user)
+        self.sl = ShoppingList.objects.create(
+            user=self.user, name="Patch list", status='generated',
+            budget_limit=Decimal('100.00'), year=timezone.now().year
+        )
+        self.apple, self.bread = ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(shopping_list=self.sl, item_name='Apples', quantity=1, unit='kg',
+                             estimated_price=Decimal('3.00')),
+            ShoppingListItem(shopping_list=self.sl, item_name='Bread', quantity=1, unit='pieces',
+                             estimated_price=Decimal('1.20')),
+        ])
+        ShoppingList.objects.filter(pk=self.sl.pk).recompute_item_totals()
+
+    def _patch(self, url, data):
+        return self.client.patch(url, data=json.dumps(data), content_type='application/json')
+
+    def test_patch_item_bumps_version_and_returns_totals(self):
+        url = reverse('shopping_list_item_api', args=[self.sl.id, self.apple.id])
+        response = self._patch(url, {'version': 1, 'purchased': True, 'actual_price': '2.50'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['items'][0]['version'], 2)
+        self.assertEqual(body['totals']['purchased_count'], 1)
+        self.assertEqual(body['totals']['total_actual'], 2.5)
+
+        stale = self._patch(url, {'version': 1, 'purchased': False})
+        self.assertEqual(stale.status_code, 409)
+        self.assertEqual(stale.json()['items'][0]['version'], 2)
+
+    def test_batch_patch_is_all_or_nothing(self):
+        url = reverse('shopping_list_items_api', args=[self.sl.id])
+        response = self._patch(url, {'items': [
+            {'id': self.apple.id, 'version': 1, 'purchased': True},
+            {'id': self.bread.id, 'version': 7, 'purchased': True},
+        ]})
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(ShoppingListItem.objects.filter(purchased=True).exists())
+
+
+class ShoppingListRunningTotalsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='totals@example.com', password='pass12345')
+        self.sl = ShoppingList.objects.create(
+            user=self.user, name="Totals list", status='generated',
+            budget_limit=Decimal('100.00'), year=timezone.now().year
+        )
+
+    def _totals(self):
+        self.sl.refresh_from_db()
+        return (self.sl.item_count, self.sl.purchased_count,
+                self.sl.total_estimated_cost, self.sl.items_actual_cost)
+
+    def test_item_save_and_delete_apply_deltas(self):
+        milk = ShoppingListItem.objects.create(
+            shopping_list=self.sl, item_name='Milk', quantity=1, unit='l', estimated_price=Decimal('1.10')
+        )
+        eggs = ShoppingListItem.objects.create(
+            shopping_list=self.sl, item_name='Eggs', quantity=12, unit='pieces', estimated_price=Decimal('2.40')
+        )
+        self.assertEqual(self._totals(), (2, 0, Decimal('3.50'), Decimal('0.00')))
+
+        milk = ShoppingListItem.objects.get(pk=milk.pk)
+        milk.purchased = True
+        milk.actual_price = Decimal('0.95')
+        milk.save()
+        self.assertEqual(self._totals(), (2, 1, Decimal('3.50'), Decimal('0.95')))
+
+        eggs.delete()
+        self.assertEqual(self._totals(), (1, 1, Decimal('1.10'), Decimal('0.95')))
+
+    def test_recompute_repairs_drift(self):
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(shopping_list=self.sl, item_name=f"item {i}", quantity=1, unit='kg',
+                             estimated_price=Decimal('1.00'), purchased=i == 0)
+            for i in range(3)
+        ])
+        self.assertEqual(self._totals()[0], 0)
+        ShoppingList.objects.filter(pk=self.sl.pk).recompute_item_totals()
+        self.assertEqual(self._totals(), (3, 1, Decimal('3.00'), Decimal('0.00')))
+
+
+class BudgetStatisticsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='budgeter@example.com', password='pass12345')
+        self.client.force_login(self.user)
+        today = timezone.now().date()
+        self.budget = Budget.objects.create(
+            user=self.user, amount=Decimal('50.00'),
+            start_date=today - timedelta(days=1), end_date=today + timedelta(days=6)
+        )
+        sl = ShoppingList.objects.create(
+            user=self.user, name="Budget list", status='generated',
+            budget_limit=Decimal('50.00'), year=today.year
+        )
+        milk, apples, _ = ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(shopping_list=sl, item_name='Milk', category='dairy', quantity=1, unit='l',
+                             estimated_price=Decimal('1.20')),
+            ShoppingListItem(shopping_list=sl, item_name='Apples', category='fruits', quantity=1, unit='kg',
+                             estimated_price=Decimal('3.00')),
+            ShoppingListItem(shopping_list=sl, item_name='Pears', category='fruits', quantity=1, unit='kg',
+                             estimated_price=Decimal('2.00')),
+        ])
+        confirm_shopping_list(self.user, sl.id, [
+            {'shopping_list_item_id': milk.id, 'actual_price': 1.0},
+            {'shopping_list_item_id': apples.id},
+        ])
+
+    def test_spend_and_breakdown_use_actual_else_estimated_price(self):
+        budget = Budget.objects.with_spent_from_lists().get(pk=self.budget.pk)
+        self.assertEqual(budget.spent_from_lists, Decimal('4.00'))
+        self.assertEqual(budget.get_spending_breakdown(), {
+            'fruits': {'amount': Decimal('3.00'), 'count': 1},
+            'dairy': {'amount': Decimal('1.00'), 'count': 1},
+        })
+        self.assertEqual(Budget.objects.filter(user=self.user).summary(), {
+            'total_budgets': 1, 'total_allocated': Decimal('50.00'), 'total_spent': Decimal('4.00'),
+        })
+
+    def test_budget_detail_runs_a_fixed_number_of_queries(self):
+        # session, user, budget with spend, confirmed lists, category breakdown
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('budget_detail', args=[self.budget.id]))
+        self.assertEqual(response.context['total_from_shopping_lists'], Decimal('4.00'))
+
+
+class MonthlySpendingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='monthly@example.com', password='pass12345')
+
+    def test_confirmed_spend_rolls_up_by_calendar_month(self):
+        record_monthly_spend(self.user, date(2026, 1, 31), Decimal('10.00'))
+        record_monthly_spend(self.user, date(2026, 1, 2), Decimal('5.50'))
+        record_monthly_spend(self.user, date(2026, 3, 1), Decimal('2.00'))
+
+        series = monthly_series(self.user, date(2025, 12, 15), date(2026, 3, 20))
+        self.assertEqual(
+            [(row['label'], row['amount'], row['lists']) for row in series],
+            [('Dec 2025', Decimal('0.00'), 0), ('Jan 2026', Decimal('15.50'), 2),
+             ('Feb 2026', Decimal('0.00'), 0), ('Mar 2026', Decimal('2.00'), 1)],
+        )
+
+    def test_rebuild_matches_confirmed_lists(self):
+        for day, cost in ((5, '7.25'), (20, '2.75')):
+            ShoppingList.objects.create(
+                user=self.user, status='confirmed', budget_limit=Decimal('50.00'), year=2026,
+                total_actual_cost=Decimal(cost),
+                completed_at=timezone.make_aware(timezone.datetime(2026, 2, day, 12, 0)),
+            )
+        self.assertEqual(rebuild_monthly_spending([self.user.id]), 1)
+        row = MonthlySpending.objects.get(user=self.user)
+        self.assertEqual((row.month, row.amount, row.list_count), (date(2026, 2, 1), Decimal('10.00'), 2))
+
+
+class SpendingLedgerTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='ledger@example.com', password='pass12345')
+        today = timezone.now().date()
+        self.budget = Budget.objects.create(
+            user=self.user, amount=Decimal('100.00'),
+            start_date=today - timedelta(days=1), end_date=today + timedelta(days=6)
+        )
+        self.client.force_login(self.user)
+
+    def test_confirm_view_charges_budget_once(self):
+        sl = ShoppingList.objects.create(
+            user=self.user, name="Ledger list", status='generated',
+            budget_limit=self.budget.amount, year=timezone.now().year
+        )
+        item = ShoppingListItem.objects.create(
+            shopping_list=sl, item_name='rice', quantity=1, unit='kg', estimated_price=Decimal('3.00')
+        )
+        self.client.post(reverse('shopping_list_detail', args=[sl.id]), {
+            'action': 'confirm', f'purchased_{item.id}': 'on', f'actual_price_{item.id}': '4.25',
+        })
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.amount_spent, Decimal('4.25'))
+        entry = SpendingEntry.objects.get(budget=self.budget)
+        self.assertEqual((entry.kind, entry.amount, entry.shopping_list_id), ('purchase', Decimal('4.25'), sl.id))
+
+    def test_current_budget_is_the_newest_active_one_covering_today(self):
+        today = timezone.now().date()
+        Budget.objects.create(
+            user=self.user, amount=Decimal('80.00'), start_date=today + timedelta(days=2), end_date=today + timedelta(days=9)
+        )
+        Budget.objects.create(
+            user=self.user, amount=Decimal('70.00'), start_date=today - timedelta(days=20), end_date=today - timedelta(days=13)
+        )
+        self.assertEqual(Budget.objects.current_for(self.user), self.budget)
+
+        open_ended = Budget.objects.create(user=self.user, amount=Decimal('60.00'), start_date=today)
+        self.assertEqual(Budget.objects.current_for(self.user), open_ended)
+
+    def test_reconcile_resets_drifted_balance_to_ledger(self):
+        record_spending(self.user, Decimal('6.00'), budget=self.budget)
+        record_spending(self.user, Decimal('-1.00'), budget=self.budget, kind='adjustment')
+        Budget.objects.filter(pk=self.budget.pk).update(amount_spent=Decimal('42.00'))
+
+        drift = reconcile_budget_balances(Budget.objects.filter(pk=self.budget.pk))
+        self.assertEqual(drift, [(self.budget.id, Decimal('42.00'), Decimal('5.00'))])
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.amount_spent, Decimal('5.00'))
+        self.assertEqual(reconcile_budget_balances(Budget.objects.filter(pk=self.budget.pk)), [])
+
+    def test_periodic_task_reconciles_and_is_scheduled(self):
+        record_spending(self.user, Decimal('6.00'), budget=self.budget)
+        Budget.objects.filter(pk=self.budget.pk).update(amount_spent=Decimal('1.00'))
+
+        self.assertEqual(tasks.reconcile_budget_balances.apply().get(), 1)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.amount_spent, Decimal('6.00'))
+        self.assertIn(
+            'core.reconcile_budget_balances', {entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        )
+
+
+class ExpiryProcessingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='expiry@example.com', password='pass12345')
+        self.today = timezone.now().date()
+
+    def _add_items(self, count, prefix, quantity=2):
+        UserPantry.objects.bulk_create([
+            UserPantry(
+                user=self.user, name=f"{prefix} {i}", quantity=quantity, unit='kg', price=Decimal('1.25'),
+                purchase_date=self.today - timedelta(days=10), expiry_date=self.today - timedelta(days=1)
+            )
+            for i in range(count)
+        ])
+
+    def _expire_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            count = detect_and_process_all_expired_items(self.user)
+        return count, len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_expired_items(self):
+        self._add_items(2, 'small')
+        small_count, small = self._expire_queries()
+        self._add_items(30, 'large')
+        large_count, large = self._expire_queries()
+        self.assertEqual((small_count, large_count), (2, 30))
+        self.assertEqual(small, large)
+
+    def test_waste_recorded_once_per_item_and_day(self):
+        self._add_items(3, 'milk')
+        self._add_items(1, 'empty', quantity=0)
+        self.assertEqual(detect_and_process_all_expired_items(self.user), 3)
+
+        UserPantry.objects.filter(user=self.user).update(status='active')
+        detect_and_process_all_expired_items(self.user)
+
+        self.assertEqual(FoodWasteRecord.objects.filter(user=self.user).count(), 3)
+        # Used-up items are not expired or counted as waste
+        self.assertEqual(
+            list(UserPantry.objects.filter(user=self.user, status='active').values_list('name', flat=True)),
+            ['empty 0'],
+        )
+        record = FoodWasteRecord.objects.filter(user=self.user).first()
+        self.assertEqual((record.quantity_wasted, record.cost), (2, Decimal('1.25')))
+
+    def test_repeated_partial_waste_on_the_same_day_is_kept(self):
+        item = UserPantry.objects.create(
+            user=self.user, name='spinach', quantity=5, unit='bunch', expiry_date=self.today + timedelta(days=2)
+        )
+        item.mark_as_wasted(1)
+        item.mark_as_wasted(1)
+        item.mark_as_wasted(1, reason='forgot_about')
+        item.mark_as_wasted(1, reason='forgot_about')
+
+        self.assertEqual(FoodWasteRecord.objects.filter(pantry_item=item).count(), 4)
+        item.refresh_from_db()
+        self.assertEqual((item.quantity, item.status), (1, 'active'))
+
+    def test_sweep_expires_every_users_items_in_chunks(self):
+        other = get_user_model().objects.create_user(email='expiry-other@example.com', password='pass12345')
+        self._add_items(5, 'bread')
+        UserPantry.objects.create(
+            user=other, name='yogurt', quantity=1, unit='pot',
+            purchase_date=self.today - timedelta(days=5), expiry_date=self.today - timedelta(days=2)
+        )
+        UserPantry.objects.create(
+            user=other, name='rice', quantity=1, unit='kg', expiry_date=self.today + timedelta(days=30)
+        )
+        UserPantry.objects.create(
+            user=other, name='flour', quantity=0, unit='kg', expiry_date=self.today - timedelta(days=3)
+        )
+
+        progress = []
+        stats = sweep_expired_items(chunk_size=2, progress=lambda stats, through: progress.append(through))
+
+        self.assertEqual((stats['items_expired'], stats['users'], stats['chunks']), (6, 2, 3))
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(FoodWasteRecord.objects.count(), 6)
+        self.assertEqual(
+            sorted(UserPantry.objects.filter(status='active').values_list('name', flat=True)), ['flour', 'rice']
+        )
+
+
+class PantryCatalogLinkTests(TestCase):
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(email=f'catalog{i}@example.com', password='pass12345')
+            for i in range(3)
+        ]
+        self.today = timezone.now().date()
+
+    def _pantry_item(self, user, name='Whole Milk', **fields):
+        return UserPantry.objects.create(
+            user=user, name=name, quantity=1, unit='l', expiry_date=self.today + timedelta(days=5), **fields
+        )
+
+    def test_resaving_a_linked_item_does_not_touch_the_catalog(self):
+        item = UserPantry.objects.get(pk=self._pantry_item(self.users[0]).pk)
+        item.quantity = 2
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        item.name = 'Oat Milk'
+        item.save()
+        self.assertEqual(item.ingredient.normalized_name, 'oat milk')
+
+    def test_pantry_nutrition_is_not_copied_into_the_shared_catalog(self):
+        item = self._pantry_item(self.users[0], calories=9999, category='dairy')
+        catalog = Ingredient.objects.get(pk=item.ingredient_id)
+        self.assertEqual(catalog.calories, 0)
+
+    def test_backfill_needs_agreement_from_enough_users(self):
+        for user, calories in zip(self.users, (60, 64, 900)):
+            self._pantry_item(user, calories=calories, protein=3, category='dairy')
+        Ingredient.objects.filter(normalized_name='whole milk').update(category='other')
+
+        call_command('backfill_ingredient_nutrition', min_users=4, stdout=StringIO())
+        self.assertFalse(Ingredient.objects.get(normalized_name='whole milk').has_nutrition())
+
+        call_command('backfill_ingredient_nutrition', min_users=3, stdout=StringIO())
+        catalog = Ingredient.objects.get(normalized_name='whole milk')
+        self.assertEqual((catalog.calories, catalog.protein, catalog.category), (64, 3, 'dairy'))
+
+
+class RecipeFacetTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='facets@example.com', password='pass12345')
+        self.client.force_login(self.user)
+        for cuisine, difficulty in (('kenyan', 'easy'), ('kenyan', 'hard'), ('italian', 'easy'), ('thai', 'medium')):
+            Recipe.objects.create(
+                name=f"{cuisine} {difficulty}", description='-', difficulty=difficulty, cuisine=cuisine,
+                servings=2, instructions='-', created_by=self.user
+            )
+
+    def _facets(self, **params):
+        facets = self.client.get(reverse('recipe_list'), params).context['facets']
+        return facets, {
+            name: {entry['value']: entry['count'] for entry in facets[name]} for name in ('cuisine', 'difficulty')
+        }
+
+    def test_each_facet_ignores_its_own_filter(self):
+        facets, counts = self._facets(cuisine='kenyan')
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(counts['cuisine'], {'kenyan': 2, 'italian': 1, 'thai': 1})
+        self.assertEqual(counts['difficulty'], {'easy': 1, 'hard': 1})
+
+        facets, counts = self._facets(cuisine='kenyan', difficulty='easy')
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(counts['cuisine'], {'kenyan': 1, 'italian': 1})
+        self.assertEqual(counts['difficulty'], {'easy': 1, 'hard': 1})
+
+    def test_chip_links_keep_the_other_active_filters(self):
+        Recipe.objects.filter(cuisine='kenyan').update(tags=['vegan'])
+        response = self.client.get(reverse('recipe_list'), {'tag': 'vegan', 'tag_mode': 'all', 'difficulty': 'easy'})
+        kenyan = next(f for f in response.context['cuisine_facets'] if f['value'] == 'kenyan')
+        self.assertEqual(
+            QueryDict(kenyan['query']).dict(), {'tag': 'vegan', 'tag_mode': 'all', 'difficulty': 'easy', 'cuisine': 'kenyan'}
+        )
+        easy = next(f for f in response.context['difficulty_facets'] if f['value'] == 'easy')
+        self.assertTrue(easy['active'])
+        self.assertEqual(QueryDict(easy['query']).dict(), {'tag': 'vegan', 'tag_mode': 'all'})
+
+    def test_long_tags_are_truncated_to_fit(self):
+        tags = parse_dietary_tags(f"vegan, {'very ' * 20}spicy")
+        self.assertEqual(tags[0], 'vegan')
+        self.assertEqual(len(tags[1]), RECIPE_TAG_MAX_LENGTH - 1)
+        recipe = Recipe.objects.create(
+            name='Long tags', description='-', difficulty='easy', cuisine='other', servings=1,
+            instructions='-', dietary_tags=f"{'x' * 80}"
+        )
+        self.assertEqual(recipe.tags, ['x' * RECIPE_TAG_MAX_LENGTH])
+
+
+    def test_search_vector_is_only_rebuilt_when_searchable_text_changes(self):
+        def vector_updates(recipe):
+            with CaptureQueriesContext(connection) as ctx:
+                recipe.save()
+            return [q for q in ctx.captured_queries if 'to_tsvector' in q['sql']]
+
+        recipe = Recipe.objects.get(name='kenyan easy')
+        recipe.servings = 4
+        self.assertEqual(vector_updates(recipe), [])
+        recipe.name = 'Kenyan pilau'
+        self.assertEqual(len(vector_updates(recipe)), 1)
+        self.assertEqual(vector_updates(recipe), [])
+        self.assertEqual(Recipe.objects.filter(search_vector='pilau').get(), recipe)
+
+    def test_tags_migration_parses_like_the_model(self):
+        parse_tags = import_module('core.migrations.0011_recipe_tags').parse_tags
+        for value in (
+            'Gluten Free, vegan, VEGAN', 'dairy_free,,  low   carb ', f"{'word ' * 12}, {'a' * 49} b", '', None,
+        ):
+            self.assertEqual(parse_tags(value), parse_dietary_tags(value), value)
+
+
+class AllergenMatcherTests(SimpleTestCase):
+    def test_overlapping_patterns_keep_leftmost_longest(self):
+        matcher = AhoCorasick([('milk', 'milk'), ('coconut milk', 'coconut'), ('nut', 'nut'), ('he', 'he'), ('she', 'she')])
+        self.assertEqual(
+            [(start, end, payload) for start, end, payload in matcher.iter_matches('coconut milk and nut')],
+            [(0, 12, 'coconut'), (17, 20, 'nut')],
+        )
+        self.assertEqual(matcher.search('she'), 'she')
+
+    def test_matches_only_on_word_boundaries(self):
+        matcher = AhoCorasick([('nut', 'nut')])
+        self.assertIsNone(matcher.search('nutmeg and peanutty doughnuts'))
+        self.assertEqual(matcher.search('Nut-free? no: pine nut, crushed'), 'nut')
+
+    def test_mask_bits(self):
+        self.assertEqual(allergen_mask_for('Peanut butter cookies'), ALLERGEN_BITS['peanut'])
+        self.assertEqual(
+            allergen_mask_for('egg noodles with soy sauce'),
+            ALLERGEN_BITS['egg'] | ALLERGEN_BITS['gluten'] | ALLERGEN_BITS['soy'],
+        )
+        self.assertEqual(allergen_mask_for('coconut milk, gluten-free oats, nutmeg'), 0)
+
+    def test_user_matcher_maps_aliases_and_keeps_unknown_terms(self):
+        matcher = get_user_allergen_matcher('Lactose intolerance; kiwi')
+        self.assertEqual(matcher.mask, ALLERGEN_BITS['dairy'])
+        self.assertEqual(matcher.unmapped_terms, ['kiwi'])
+        self.assertEqual(matcher.find('oat milk', 'cheddar'), 'dairy')
+        self.assertEqual(matcher.find('kiwi slices'), 'kiwi')
+        self.assertIsNone(matcher.find('coconut cream'))
+
+
+class PantryGapTests(SimpleTestCase):
+    def _gap(self, pantry, requirements):
+        return compute_gap(
+            build_pantry_index(pantry),
+            [(name, name, quantity, unit, recipe) for name, quantity, unit, recipe in requirements],
+        )
+
+    def test_missing_short_and_covered(self):
+        gap = self._gap(
+            [('Rice', 1, 'kg'), ('milk', 200, 'ml')],
+            [('rice', 500, 'g', 'Pilau'), ('milk', 0.5, 'l', 'Chai'), ('beans', 2, 'cups', 'Githeri')],
+        )
+        self.assertEqual([e['key'] for e in gap['covered']], ['rice'])
+        self.assertEqual(gap['covered'][0]['available_quantity'], 1000)
+        self.assertEqual([(e['key'], e['quantity'], e['unit']) for e in gap['short']], [('milk', 0.3, 'l')])
+        self.assertEqual([(e['key'], e['quantity'], e['unit']) for e in gap['missing']], [('beans', 2, 'cups')])
+
+    def test_requirements_across_recipes_are_summed_in_base_units(self):
+        gap = self._gap(
+            [('flour', 1, 'kg')],
+            [('flour', 600, 'g', 'Chapati'), ('flour', 0.5, 'kg', 'Mandazi')],
+        )
+        self.assertEqual(gap['stats']['short'], 1)
+        self.assertEqual((gap['short'][0]['quantity'], gap['short'][0]['unit']), (100, 'g'))
+        self.assertEqual(gap['short'][0]['recipes'], ['Chapati', 'Mandazi'])
+
+    def test_stock_in_an_incompatible_unit_is_not_assumed_to_cover(self):
+        gap = self._gap([('tomato', 2, 'pieces')], [('tomato', 500, 'g', 'Stew')])
+        self.assertEqual(gap['covered'], [])
+        entry = gap['short'][0]
+        self.assertTrue(entry['unit_mismatch'])
+        self.assertEqual((entry['quantity'], entry['unit'], entry['priority']), (500, 'g', 'medium'))
+        self.assertIn('pieces', entry['reason'])
+        self.assertEqual(gap['stats']['unit_mismatch'], 1)
+
+
+class PantryTableTests(SimpleTestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.items = [
+            UserPantry(name=f"item {i}", quantity=1, unit='kg', expiry_date=today + timedelta(days=i))
+            for i in range(40)
+        ]
+
+    def test_budgeted_table_drops_lower_priority_rows(self):
+        text, stats = build_pantry_table(self.items, SHOPPING_PANTRY_COLUMNS, token_budget=60)
+        self.assertGreater(stats['items_omitted'], 0)
+        self.assertIn('item 0|', text)
+        self.assertIn('lower-priority items omitted', text)
+
+    def test_untruncated_table_keeps_every_row(self):
+        text, stats = build_pantry_table(self.items, SHOPPING_PANTRY_COLUMNS, token_budget=60, truncate=False)
+        self.assertEqual((stats['items_included'], stats['items_omitted']), (40, 0))
+        self.assertEqual(len(text.splitlines()), 41)
+
+
+class RecipeSimilarityTests(TestCase):
+    def setUp(self):
+        self.ingredients = Ingredient.objects.resolve([f"ingredient {i}" for i in range(40)])
+        self.ingredient_ids = [self.ingredients[f"ingredient {i}"].id for i in range(40)]
+
+    def _recipe(self, name, ingredient_numbers, cuisine='other'):
+        recipe = Recipe.objects.create(
+            name=name, description='-', difficulty='easy', cuisine=cuisine, servings=2, instructions='-'
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient_id=self.ingredient_ids[i], quantity=100)
+            for i in ingredient_numbers
+        ])
+        return recipe
+
+    def test_minhash_estimates_jaccard(self):
+        ids = self.ingredient_ids
+        self.assertEqual(estimated_jaccard(minhash_signature(ids[:10]), minhash_signature(ids[:10])), 1.0)
+        self.assertEqual(estimated_jaccard(minhash_signature(ids[:10]), minhash_signature(ids[20:30])), 0.0)
+        self.assertEqual(minhash_signature([]), [])
+
+    def test_neighbours_for_identical_near_duplicate_and_disjoint_recipes(self):
+        base = self._recipe('Base', range(10))
+        twin = self._recipe('Twin', range(10))
+        near = self._recipe('Near', list(range(9)) + [10])
+        far = self._recipe('Far', range(20, 30))
+        refresh_recipe_neighbors([base, twin, near, far])
+
+        neighbours = get_similar_recipes(base, limit=10)
+        self.assertEqual(neighbours[0], twin)
+        self.assertIn(near, neighbours)
+        self.assertNotIn(far, neighbours)
+        self.assertEqual(get_similar_recipes(far), [])
+        # Reverse links: the twin lists the base too
+        self.assertIn(base, get_similar_recipes(twin, limit=10))
+
+    def test_batch_refresh_query_count_does_not_grow_with_batch_size(self):
+        def refresh_queries(count, offset):
+            # Overlapping ingredient windows, away from the other batch's ingredients
+            recipes = [self._recipe(f"r{offset + i}", range(offset + i, offset + i + 10)) for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                refresh_recipe_neighbors(recipes)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(refresh_queries(2, 0), refresh_queries(6, 20))
+
+    def test_reverse_merge_only_writes_changed_lists(self):
+        base = self._recipe('Base', range(10))
+        twin = self._recipe('Twin', range(10))
+        refresh_recipe_neighbors([base, twin])
+        link = RecipeSimilarity.objects.get(recipe=twin, similar_recipe=base)
+
+        refresh_recipe_neighbors([base])
+        self.assertTrue(RecipeSimilarity.objects.filter(pk=link.pk).exists())
+
+        # An edit that lowers the similarity rescores the twin's link
+        Recipe.objects.filter(pk=base.pk).update(cuisine='thai')
+        base.refresh_from_db()
+        refresh_recipe_neighbors([base])
+        link.refresh_from_db()
+        self.assertAlmostEqual(link.score, RecipeSimilarity.objects.get(recipe=base, similar_recipe=twin).score)
+        self.assertLess(link.score, 1.0)
+
+        # An edit that removes the similarity drops the twin's link to it
+        RecipeIngredient.objects.filter(recipe=base).delete()
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=base, ingredient_id=self.ingredient_ids[i], quantity=100) for i in range(20, 30)
+        ])
+        refresh_recipe_neighbors([base])
+        self.assertFalse(RecipeSimilarity.objects.filter(recipe=twin, similar_recipe=base).exists())
+        self.assertEqual(get_similar_recipes(base), [])
+
+
+class KnapsackSelectTests(SimpleTestCase):
+    def _candidates(self, *costs_and_values):
+        return [
+            {'name': f"item {i}", 'cost': Decimal(cost), 'value': value}
+            for i, (cost, value) in enumerate(costs_and_values)
+        ]
+
+    def test_picks_the_most_valuable_set_that_fits(self):
+        candidates = self._candidates(('6.00', 10), ('5.00', 6), ('5.00', 6))
+        selected, skipped = knapsack_select(candidates, Decimal('10.00'))
+        self.assertEqual([c['name'] for c in selected], ['item 1', 'item 2'])
+        self.assertEqual([c['name'] for c in skipped], ['item 0'])
+
+    def test_never_exceeds_the_budget(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            budget = Decimal(rng.randint(1, 5000)) / 100
+            candidates = self._candidates(*[
+                (Decimal(rng.randint(1, 2000)) / 100, rng.choice([1, 4, 10])) for _ in range(12)
+            ])
+            selected, skipped = knapsack_select(candidates, budget, max_buckets=50)
+            self.assertLessEqual(sum((c['cost'] for c in selected), Decimal('0')), budget)
+            self.assertEqual(len(selected) + len(skipped), len(candidates))
+
+    def test_costs_are_rounded_up_to_whole_buckets(self):
+        # Buckets of 2.50: an item costing 2.60 takes two, so only two of three fit
+        selected, _ = knapsack_select(self._candidates(*[('2.60', 1)] * 3), Decimal('10.00'), max_buckets=4)
+        self.assertEqual(len(selected), 2)
+        # Costs landing exactly on a bucket boundary use the whole budget
+        selected, _ = knapsack_select(self._candidates(*[('2.50', 1)] * 4), Decimal('10.00'), max_buckets=4)
+        self.assertEqual(len(selected), 4)
+
+    def test_zero_or_missing_budget_skips_everything(self):
+        candidates = self._candidates(('1.00', 10), ('0.01', 1))
+        for budget in (Decimal('0.00'), Decimal('-5.00'), None):
+            self.assertEqual(knapsack_select(candidates, budget), ([], candidates))
+        self.assertEqual(knapsack_select([], Decimal('10.00')), ([], []))
+
+    def test_selected_and_skipped_keep_input_order(self):
+        candidates = self._candidates(('3.00', 1), ('4.00', 10), ('9.00', 1), ('2.00', 10), ('1.00', 4))
+        selected, skipped = knapsack_select(candidates, Decimal('7.00'))
+        self.assertEqual([c['name'] for c in selected], ['item 1', 'item 3', 'item 4'])
+        self.assertEqual([c['name'] for c in skipped], ['item 0', 'item 2'])
+
+
+class ShoppingPlannerTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='planner@example.com', password='pass12345')
+        today = timezone.now().date()
+        self.budget = Budget.objects.create(
+            user=self.user, amount=Decimal('100.00'),
+            start_date=today - timedelta(days=1), end_date=today + timedelta(days=6)
+        )
+        ingredients = Ingredient.objects.resolve(['rice', 'chicken breast', 'onion'])
+        self.recipe = Recipe.objects.create(
+            name='Chicken pilau', description='-', difficulty='easy', cuisine='kenyan',
+            servings=4, instructions='-', created_by=self.user
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=self.recipe, ingredient=ingredients['rice'], quantity=500, unit='g'),
+            RecipeIngredient(recipe=self.recipe, ingredient=ingredients['chicken breast'], quantity=400, unit='g'),
+            RecipeIngredient(recipe=self.recipe, ingredient=ingredients['onion'], quantity=2, unit='pieces'),
+        ])
+        UserPantry.objects.create(
+            user=self.user, name='Rice', quantity=1, unit='kg', expiry_date=today + timedelta(days=90)
+        )
+
+    def test_plans_the_missing_ingredients_within_budget(self):
+        sl, stats = plan_shopping_list(self.user, recipes=[self.recipe], include_staples=False)
+
+        items = {item.item_name.lower(): item for item in sl.items.all()}
+        self.assertEqual(set(items), {'chicken breast', 'onion'})
+        self.assertTrue(all(item.priority == 'high' for item in items.values()))
+        self.assertEqual((sl.status, sl.item_count, stats['skipped']), ('generated', 2, []))
+        self.assertEqual(sl.total_estimated_cost, sum(item.estimated_price for item in items.values()))
+        self.assertLessEqual(sl.total_estimated_cost, stats['remaining_budget'])
+
+    def test_plans_against_the_remaining_budget(self):
+        Budget.objects.filter(pk=self.budget.pk).update(amount_spent=Decimal('99.00'))
+        sl, stats = plan_shopping_list(self.user, recipes=[self.recipe])
+
+        self.assertEqual(stats['remaining_budget'], Decimal('1.00'))
+        self.assertLessEqual(sl.total_estimated_cost, Decimal('1.00'))
+        self.assertTrue(stats['skipped'])
+        self.assertEqual(stats['selected'] + len(stats['skipped']), stats['candidates'])
+
+    def test_requires_a_current_budget(self):
+        self.budget.delete()
+        with self.assertRaises(ValueError):
+            plan_shopping_list(self.user, recipes=[self.recipe])
+
+
+class PriceCatalogTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='prices@example.com', password='pass12345')
+        self.other = get_user_model().objects.create_user(email='prices2@example.com', password='pass12345')
+
+    def _entry(self, user):
+        return PriceCatalogEntry.objects.get(user=user, normalized_name='rice', unit='g')
+
+    def test_first_observation_seeds_user_and_global_entries(self):
+        self.assertEqual(record_purchases(self.user, [('Rice', 2, 'kg', 4.00), ('Salt', 0, 'g', 1.00)]), 1)
+
+        for owner in (self.user, None):
+            entry = self._entry(owner)
+            self.assertAlmostEqual(entry.unit_price, 0.002)
+            self.assertAlmostEqual(entry.last_price, 0.002)
+            self.assertEqual(entry.sample_count, 1)
+        self.assertFalse(PriceCatalogEntry.objects.filter(normalized_name='salt').exists())
+
+    def test_repeat_observations_are_smoothed(self):
+        record_purchases(self.user, [('Rice', 2, 'kg', 4.00)])
+        # The same item twice in one purchase counts as a single averaged observation
+        record_purchases(self.user, [('rice', 500, 'g', 1.00), ('RICE', 1500, 'g', 5.00)])
+
+        entry = self._entry(self.user)
+        self.assertAlmostEqual(entry.last_price, 0.003)
+        self.assertAlmostEqual(entry.unit_price, PRICE_EWMA_ALPHA * 0.003 + (1 - PRICE_EWMA_ALPHA) * 0.002)
+        self.assertEqual(entry.sample_count, 2)
+
+    def test_existing_global_entry_is_smoothed_for_a_new_user(self):
+        record_purchases(self.other, [('Rice', 1, 'kg', 3.00)])
+        record_purchases(self.user, [('Rice', 1, 'kg', 2.00)])
+
+        self.assertEqual(self._entry(self.user).sample_count, 1)
+        self.assertAlmostEqual(self._entry(self.user).unit_price, 0.002)
+        entry = self._entry(None)
+        self.assertEqual(entry.sample_count, 2)
+        self.assertAlmostEqual(entry.unit_price, PRICE_EWMA_ALPHA * 0.002 + (1 - PRICE_EWMA_ALPHA) * 0.003)
+
+    def test_lookup_converts_units_and_prefers_the_users_prices(self):
+        record_purchases(self.other, [('Milk', 1, 'l', 2.00), ('Rice', 1, 'kg', 5.00)])
+        record_purchases(self.user, [('Rice', 2, 'kg', 4.00)])
+
+        prices = lookup_unit_prices(self.user, ['Rice', 'Milk', 'Saffron'])
+        self.assertAlmostEqual(estimate_from_catalog(prices, 'rice', 500, 'g'), 1.00)
+        self.assertAlmostEqual(estimate_from_catalog(prices, 'Rice', 1.5, 'kg'), 3.00)
+        self.assertAlmostEqual(estimate_from_catalog(prices, 'milk', 500, 'ml'), 1.00)
+        self.assertIsNone(estimate_from_catalog(prices, 'rice', 2, 'pieces'))
+        self.assertIsNone(estimate_from_catalog(prices, 'saffron', 1, 'g'))
+        self.assertEqual(lookup_unit_prices(self.user, ['']), {})
+
+
+class PriceCatalogConcurrencyTests(TransactionTestCase):
+    def test_concurrent_first_purchases_share_the_global_entry(self):
+        users = [
+            get_user_model().objects.create_user(email=f'concurrent{i}@example.com', password='pass12345')
+            for i in range(4)
+        ]
+        barrier = threading.Barrier(len(users))
+        errors = []
+
+        def confirm(user):
+            try:
+                barrier.wait()
+                record_purchases(user, [('Saffron', 1, 'g', 5.00)])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=confirm, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        entry = PriceCatalogEntry.objects.get(user__isnull=True, normalized_name='saffron')
+        self.assertEqual(entry.sample_count, len(users))
+        self.assertAlmostEqual(entry.unit_price, 5.00)
+        self.assertEqual(PriceCatalogEntry.objects.filter(user__isnull=False).count(), len(users))
+
+
+class CategoryClassifierTests(SimpleTestCase):
+    def setUp(self):
+        self.classifier = CategoryClassifier.train([])
+
+    def test_seed_keywords_classify_plain_names(self):
+        for name, category in (
+            ('Tomatoes', 'vegetables'), ('Chicken breast', 'meat'), ('Olive Oil', 'condiments'),
+            ('peas', 'legumes'), ('Bananas', 'fruits'),
+        ):
+            self.assertEqual(self.classifier.classify(name), category, name)
+
+    def test_unknown_names_fall_back_to_default(self):
+        for name in ('xyz gadget', '', None):
+            self.assertEqual(self.classifier.classify(name), DEFAULT_CATEGORY)
+        self.assertEqual(self.classifier.classify('xyz gadget', default='bakery'), 'bakery')
+
+    def test_longer_phrases_win_for_ambiguous_names(self):
+        for name, category in (
+            ('tomato sauce', 'condiments'), ('coconut milk', 'canned'), ('frozen peas', 'frozen'),
+            ('black pepper', 'spices'), ('red bell pepper', 'vegetables'), ('canned tomatoes', 'canned'),
+        ):
+            self.assertEqual(self.classifier.classify(name), category, name)
+
+    def test_training_learns_repeated_phrases_only(self):
+        trained = CategoryClassifier.train(
+            [('Kimchi jar', 'condiments'), ('kimchi', 'condiments'), ('Gochujang', 'condiments'), ('kimchi', 'other')]
+        )
+        self.assertEqual(trained.classify('Kimchi'), 'condiments')
+        self.assertEqual(trained.classify('gochujang'), DEFAULT_CATEGORY)
+        restored = CategoryClassifier.from_json(trained.to_json())
+        self.assertEqual(restored.classify('kimchi'), 'condiments')
+        self.assertEqual(restored.classify('coconut milk'), 'canned')
+
+    def test_missing_model_file_falls_back_to_seed_vocabulary(self):
+        get_category_classifier.cache_clear()
+        self.addCleanup(get_category_classifier.cache_clear)
+        with self.settings(CATEGORY_CLASSIFIER_PATH='/nonexistent/category_classifier.json'):
+            self.assertEqual(classify_category('tomato sauce'), 'condiments')
+
+
+class ShoppingRegenerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='regen@example.com', password='pass12345')
+        self.today = timezone.now().date()
+        Budget.objects.create(
+            user=self.user, amount=Decimal('100.00'),
+            start_date=self.today - timedelta(days=1), end_date=self.today + timedelta(days=6)
+        )
+        ingredients = Ingredient.objects.resolve(['rice', 'chicken breast', 'onion'])
+        recipe = Recipe.objects.create(
+            name='Chicken pilau', description='-', difficulty='easy', cuisine='kenyan',
+            servings=4, instructions='-', created_by=self.user, is_ai_generated=True
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient=ingredients['rice'], quantity=500, unit='g'),
+            RecipeIngredient(recipe=recipe, ingredient=ingredients['chicken breast'], quantity=400, unit='g'),
+            RecipeIngredient(recipe=recipe, ingredient=ingredients['onion'], quantity=2, unit='pieces'),
+        ])
+        RecipeSuggestion.objects.record(self.user, [recipe])
+        self._stock('Rice', 1, 'kg')
+
+    def _stock(self, name, quantity, unit):
+        return UserPantry.objects.create(
+            user=self.user, name=name, quantity=quantity, unit=unit, expiry_date=self.today + timedelta(days=30)
+        )
+
+    def test_needs_a_comparable_previous_list(self):
+        sl, stats = regenerate_shopping_list(self.user)
+        self.assertIsNone(sl)
+        self.assertEqual(stats, {'reason': 'no comparable previous list'})
+
+    def test_unchanged_pantry_reuses_the_previous_list(self):
+        base, _ = plan_shopping_list(self.user, include_staples=False)
+        # Restocking within the snapshot tolerance is not a change
+        UserPantry.objects.filter(user=self.user, name='Rice').update(quantity=1.0001)
+
+        sl, stats = regenerate_shopping_list(self.user)
+        self.assertEqual(sl, base)
+        self.assertEqual(stats['changed_ingredients'], [])
+        self.assertEqual(ShoppingList.objects.filter(user=self.user).count(), 1)
+
+    def test_pantry_change_replans_only_the_changed_ingredients(self):
+        base, _ = plan_shopping_list(self.user, include_staples=False)
+        onion = base.items.get(item_name__iexact='onion')
+        self._stock('Chicken breast', 1, 'kg')
+
+        sl, stats = regenerate_shopping_list(self.user)
+        self.assertNotEqual(sl, base)
+        self.assertEqual(sl.name, f"{base.name} (updated)")
+        self.assertEqual(stats['changed_ingredients'], ['chicken breast'])
+        self.assertEqual(stats['carried_over'], 1)
+        item = sl.items.get()
+        self.assertEqual((item.item_name, item.estimated_price), (onion.item_name, onion.estimated_price))
+        self.assertIn('chicken breast', sl.pantry_snapshot['pantry'])
+
+
+class GenerationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='gencache@example.com', password='pass12345')
+        self.pantry_item = UserPantry.objects.create(
+            user=self.user, name='Rice', quantity=1, unit='kg',
+            expiry_date=timezone.now().date() + timedelta(days=30)
+        )
+
+    def test_cached_generation_is_reused_while_the_pantry_is_unchanged(self):
+        set_cached_generation('recipes', self.user.id, ['Pilau'], params='3')
+        self.assertEqual(get_cached_generation('recipes', self.user.id, params='3'), ['Pilau'])
+        self.assertIsNone(get_cached_generation('recipes', self.user.id, params='5'))
+        self.assertIsNone(get_cached_generation('shopping', self.user.id, params='3'))
+        self.assertEqual(get_pantry_fingerprint(self.user.id), compute_pantry_fingerprint(self.user.id))
+
+    def test_pantry_edit_invalidates_cached_generation(self):
+        set_cached_generation('recipes', self.user.id, ['Pilau'])
+        before = get_pantry_fingerprint(self.user.id)
+
+        self.pantry_item.quantity = 2
+        self.pantry_item.save()
+        self.assertNotEqual(get_pantry_fingerprint(self.user.id), before)
+        self.assertIsNone(get_cached_generation('recipes', self.user.id))
+
+    def test_pantry_delete_invalidates_cached_generation(self):
+        set_cached_generation('recipes', self.user.id, ['Pilau'])
+        self.pantry_item.delete()
+        self.assertIsNone(get_cached_generation('recipes', self.user.id))
+
+
+class RecipeRetrievalTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='reuse@example.com', password='pass12345')
+        author = get_user_model().objects.create_user(email='author@example.com', password='pass12345')
+        today = timezone.now().date()
+        Budget.objects.create(
+            user=self.user, amount=Decimal('100.00'),
+            start_date=today - timedelta(days=1), end_date=today + timedelta(days=6)
+        )
+        ingredients = Ingredient.objects.resolve(['rice', 'chicken breast', 'onion', 'beef'])
+        self.catalog_recipe = self._recipe('Chicken pilau', author, [
+            (ingredients['rice'], 500, 'g'), (ingredients['chicken breast'], 400, 'g'), (ingredients['onion'], 2, 'pieces'),
+        ])
+        self.own_recipe = self._recipe('Beef stew', self.user, [(ingredients['beef'], 500, 'g')])
+        RecipeSuggestion.objects.record(self.user, [self.own_recipe])
+        for name, quantity, unit in (('Rice', 1, 'kg'), ('Onion', 4, 'pieces')):
+            UserPantry.objects.create(
+                user=self.user, name=name, quantity=quantity, unit=unit, expiry_date=today + timedelta(days=30)
+            )
+
+    def _recipe(self, name, user, ingredients):
+        recipe = Recipe.objects.create(
+            name=name, description='-', difficulty='easy', cuisine='kenyan', servings=2,
+            instructions='-', created_by=user, is_ai_generated=True
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, quantity=quantity, unit=unit)
+            for ingredient, quantity, unit in ingredients
+        ])
+        return recipe
+
+    def test_reused_recipe_is_planned_for_and_not_suggested_again(self):
+        recipes, stats = suggest_recipes(self.user, num_recipes=1)
+        self.assertEqual((recipes, stats['reused'], stats['generated']), ([self.catalog_recipe], 1, 0))
+        self.assertEqual(list(Recipe.objects.suggested_to(self.user)), [self.catalog_recipe, self.own_recipe])
+
+        sl, _ = plan_shopping_list(self.user, include_staples=False)
+        self.assertIn('chicken breast', {name.lower() for name in sl.items.values_list('item_name', flat=True)})
+        self.assertIn(self.catalog_recipe.id, sl.pantry_snapshot['recipes'])
+
+        self.assertEqual(find_reusable_recipes(self.user), [])
@@ -21,6 +21,7 @@ urlpatterns = [
     path('budgets/<int:budget_id>/delete/', views.delete_budget_view, name='delete_budget'),
     path('budgets/<int:budget_id>/toggle-active/', views.toggle_budget_active_view, name='toggle_budget_active'),
     path('budgets/analytics/', views.budget_analytics_view, name='budget_analytics'),
+    path('api/budgets/monthly-spending/', views.monthly_spending_api, name='monthly_spending_api'),
 
     # Shopping list URLs
     path('shopping_lists/', views.shopping_list_list_view, name='shopping_list_list'),
@@ -28,6 +29,9 @@ urlpatterns = [
     path('shopping_lists/add/', views.create_shopping_list_view, name='create_shopping_list'),
    # path('shopping_lists/<int:list_id>/edit/', views.edit_shopping_list_view, name='edit_shopping_list'),
     path('shopping_lists/<int:list_id>/delete/', views.delete_shopping_list_view, name='delete_shopping_list'),
+    path('api/shopping/gap/', views.pantry_gap_api, name='pantry_gap_api'),
+    path('api/shopping_lists/<int:list_id>/items/', views.shopping_list_items_api, name='shopping_list_items_api'),
+    path('api/shopping_lists/<int:list_id>/items/<int:item_id>/', views.shopping_list_item_api, name='shopping_list_item_api'),
 
     # Recipe URLs
     path('recipes/', views.recipe_list_view, name='recipe_list'),
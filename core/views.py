@@ -1,22 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
 from datetime import timedelta
 import json
-from .models import UserPantry, Recipe, Budget, ShoppingList, ShoppingListItem, FoodWasteRecord
+from .models import UserPantry, Recipe, Budget, ShoppingList, ShoppingListItem, FoodWasteRecord, parse_dietary_tags
 from django.db.models import Sum, Count
 from .forms import PantryItemForm, BudgetForm, ShoppingListForm, ShoppingListItemForm, RecipeForm
 from django.db.models import Q
 from django.forms import formset_factory
 from core.services.recipe_suggestion_ai import generate_ai_recipe_from_openai, generate_multiple_ai_recipes
+from core.services.recipe_retrieval import suggest_recipes
+from core.services.recipe_similarity import get_similar_recipes, refresh_recipe_neighbors
+from core.services.recipe_facets import get_recipe_facets
+from core.services.allergens import get_user_allergen_matcher
+from core.services.pantry_gap import analyze_pantry_gap
 from core.services.ai_shopping_service import generate_ai_shopping_list, confirm_shopping_list
+from core.services.shopping_planner import plan_shopping_list
+from core.services.shopping_regeneration import regenerate_shopping_list
+from core.services.spending_rollup import add_months, month_start, monthly_series
+from core.services.shopping_list_detail import summarize_items, get_onboarding_status
+from core.services.shopping_items import ItemVersionConflict, parse_item_changes, serialize_item, update_items
 from core.services.ai_image_processing import process_pantry_item_images
-from core.signals import detect_and_process_all_expired_items
 from decimal import Decimal
 from django.db import transaction
-from accounts.models import UserGoal
+from accounts.models import UserGoal, UserProfile
 import decimal
 
 
@@ -55,10 +65,7 @@ def pantry_dashboard_view(request):
     expiring_soon.sort(key=lambda x: x.days_until_expiry)
     
     # Get user's active budget
-    current_budget = Budget.objects.filter(
-        user=user, 
-        active=True
-    ).order_by('-start_date').first()
+    current_budget = Budget.objects.current_for(user)
     
     # Calculate budget percentage
     budget_percentage = 0
@@ -197,7 +204,7 @@ def get_recent_consumption(user):
     
     consumption_data = []
     for shopping_list in recent_lists:
-        items_count = shopping_list.items.filter(purchased=True).count()
+        items_count = shopping_list.purchased_count
         if items_count > 0:
             consumption_data.append({
                 'shopping_list': shopping_list,
@@ -217,15 +224,16 @@ def get_recipe_suggestions(user, pantry_items):
     # Get all recipes (limit to prevent performance issues)
     all_recipes = Recipe.objects.all()[:10]
     
+    pantry_ingredient_ids = {p.ingredient_id for p in pantry_items if p.ingredient_id}
+
     for recipe in all_recipes:
         # Get recipe ingredients through the proper relationship
-        recipe_ingredients = recipe.recipeingredient_set.all()
-        pantry_item_names = [p.name.lower() for p in pantry_items]
+        recipe_ingredients = recipe.recipeingredient_set.select_related('ingredient')
         
         matching_ingredients = []
         for ri in recipe_ingredients:
-            if ri.pantry_item.name.lower() in pantry_item_names:
-                matching_ingredients.append(ri.pantry_item.name)
+            if ri.ingredient_id in pantry_ingredient_ids:
+                matching_ingredients.append(ri.ingredient.name)
         
         # Calculate match percentage
         match_percentage = 0
@@ -406,20 +414,19 @@ def budget_list_view(request):
     """
     List all budgets for the user
     """
-    budgets = Budget.objects.filter(user=request.user).order_by('-start_date')
+    budgets_qs = Budget.objects.filter(user=request.user).order_by('-start_date')
+    budgets = list(budgets_qs)
     
-    # Calculate some statistics
-    active_budget = budgets.filter(active=True).first()
-    total_budgets = budgets.count()
-    total_amount_allocated = sum(budget.amount for budget in budgets)
-    total_amount_spent = sum(budget.amount_spent for budget in budgets)
+    # Calculate some statistics in one aggregate query
+    summary = budgets_qs.summary()
+    active_budget = next((budget for budget in budgets if budget.active), None)
     
     context = {
         'budgets': budgets,
         'active_budget': active_budget,
-        'total_budgets': total_budgets,
-        'total_amount_allocated': total_amount_allocated,
-        'total_amount_spent': total_amount_spent,
+        'total_budgets': summary['total_budgets'],
+        'total_amount_allocated': summary['total_allocated'],
+        'total_amount_spent': summary['total_spent'],
     }
     return render(request, 'core/budget_list.html', context)
 
@@ -428,17 +435,17 @@ def budget_detail_view(request, budget_id):
     """
     View budget details and spending analysis
     """
-    budget = get_object_or_404(Budget, id=budget_id, user=request.user)
+    budget = get_object_or_404(Budget.objects.with_spent_from_lists(), id=budget_id, user=request.user)
     
     # Calculate spending statistics using Budget model methods
     spending_percentage = budget.get_spending_percentage()
     days_remaining = (budget.end_date - timezone.now().date()).days if budget.end_date else 0
     daily_budget = budget.get_remaining_budget() / max(days_remaining, 1) if days_remaining > 0 else 0
     
-    # Get confirmed shopping lists using Budget model method
-    confirmed_shopping_lists = budget.get_confirmed_shopping_lists()
+    # Get the latest confirmed shopping lists using Budget model method
+    confirmed_shopping_lists = list(budget.get_confirmed_shopping_lists()[:10])
     
-    # Get spending breakdown by category
+    # Get spending breakdown by category (one grouped query)
     spending_breakdown = budget.get_spending_breakdown()
     
     context = {
@@ -446,7 +453,7 @@ def budget_detail_view(request, budget_id):
         'spending_percentage': min(spending_percentage, 100),
         'days_remaining': max(days_remaining, 0),
         'daily_budget': daily_budget,
-        'confirmed_shopping_lists': confirmed_shopping_lists[:10],
+        'confirmed_shopping_lists': confirmed_shopping_lists,
         'total_from_shopping_lists': budget.get_total_spent_from_shopping_lists(),
         'spending_breakdown': spending_breakdown,
         'remaining_budget': budget.get_remaining_budget(),
@@ -564,36 +571,51 @@ def budget_analytics_view(request):
     """
     budgets = Budget.objects.filter(user=request.user).order_by('start_date')
     
-    # Calculate monthly spending trends
-    monthly_spending = []
-    now = timezone.now().date()
-
-    for i in range(6):  # Last 6 months
-        month_start = (now.replace(day=1) - timedelta(days=30*i))
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        monthly_budget = sum(
-            budget.amount_spent for budget in budgets 
-            if budget.start_date and budget.end_date and 
-            budget.start_date <= month_end and budget.end_date >= month_start
-        )
-        
-        monthly_spending.append({
-            'month': month_start.strftime('%b %Y'),
-            'amount': monthly_budget
-        })
-    
-    monthly_spending.reverse()
+    # Monthly spending trends for the last 6 calendar months, from the rollup table
+    this_month = month_start(timezone.now())
+    monthly_spending = monthly_series(request.user, add_months(this_month, -5), this_month)
+    for month in monthly_spending:
+        month['month'] = month.pop('label')
     
+    summary = budgets.summary()
     context = {
         'budgets': budgets,
         'monthly_spending': monthly_spending,
-        'total_budgets': budgets.count(),
-        'total_allocated': sum(budget.amount for budget in budgets),
-        'total_spent': sum(budget.amount_spent for budget in budgets),
+        'monthly_spending_max': max((month['amount'] for month in monthly_spending), default=0),
+        'total_budgets': summary['total_budgets'],
+        'total_allocated': summary['total_allocated'],
+        'total_spent': summary['total_spent'],
     }
     return render(request, 'core/budget_analytics.html', context)
 
+@login_required(login_url='account_login')
+def monthly_spending_api(request):
+    """
+    Monthly spending time series for charts. Optional ?start=YYYY-MM and
+    ?end=YYYY-MM (inclusive) default to the last 12 months.
+    """
+    this_month = month_start(timezone.now())
+    try:
+        end = timezone.datetime.strptime(request.GET['end'], '%Y-%m').date() if request.GET.get('end') else this_month
+        start = (
+            timezone.datetime.strptime(request.GET['start'], '%Y-%m').date()
+            if request.GET.get('start') else add_months(end, -11)
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Use YYYY-MM for start and end.'}, status=400)
+    if start > end or add_months(start, 120) <= end:
+        return JsonResponse({'success': False, 'message': 'The range must be 1 to 120 months.'}, status=400)
+
+    series = monthly_series(request.user, start, end)
+    return JsonResponse({
+        'success': True,
+        'series': [
+            {'month': row['month'].strftime('%Y-%m'), 'label': row['label'],
+             'amount': float(row['amount']), 'lists': row['lists']}
+            for row in series
+        ],
+    })
+
 #-----------------------------------------------------SHOPPING LIST VIEWS-------------------------------------------------------------------------#
 @login_required(login_url='account_login')
 def shopping_list_list_view(request):
@@ -634,15 +656,45 @@ def create_shopping_list_view(request):
         period = request.POST.get("period") or "weekly"
 
         # validate user has an active budget
-        budget = Budget.objects.filter(user=request.user, active=True).order_by('-start_date').first()
+        budget = Budget.objects.current_for(request.user)
         if not budget:
             messages.error(request, "Please set an active budget before generating a shopping list.")
             return redirect('create_budget')
 
-        messages.info(request, "Generating AI-powered shopping list... Please wait a moment.")
+        # Fast mode plans the list locally; AI mode asks the LLM and falls back to the planner;
+        # update mode only re-plans ingredients that changed since the last list
+        mode = request.POST.get("mode") or "fast"
+        ai_list = None
+        if mode == "update":
+            try:
+                ai_list, stats = regenerate_shopping_list(
+                    request.user, use_ai=request.POST.get("update_with_ai") == "1"
+                )
+                if ai_list:
+                    messages.info(
+                        request,
+                        f"Updated from your last list: {len(stats['changed_ingredients'])} pantry change(s), "
+                        f"{stats['carried_over']} item(s) carried over."
+                    )
+                else:
+                    messages.info(request, "No comparable previous list, so a new list was planned.")
+            except Exception as e:
+                print(f"Error regenerating shopping list: {e}")
+                ai_list = None
+        elif mode == "ai":
+            messages.info(request, "Generating AI-powered shopping list... Please wait a moment.")
+            # reuses the last list for an unchanged pantry unless regenerating
+            regenerate = request.POST.get("regenerate") == "1"
+            ai_list = generate_ai_shopping_list(request.user, regenerate=regenerate)
+            if not ai_list:
+                messages.warning(request, "AI generation failed, so a list was planned from your pantry instead.")
 
-        # call the AI generator
-        ai_list = generate_ai_shopping_list(request.user)
+        if not ai_list:
+            try:
+                ai_list, _ = plan_shopping_list(request.user)
+            except Exception as e:
+                print(f"Error planning shopping list: {e}")
+                ai_list = None
 
         if ai_list:
             ai_list.status = "generated"
@@ -652,17 +704,17 @@ def create_shopping_list_view(request):
 
             messages.success(
                 request,
-                f'AI-generated shopping list "{ai_list.name}" created successfully within your budget of '
+                f'Shopping list "{ai_list.name}" created successfully within your budget of '
                 f'{budget.amount} {budget.currency}. '
                 f'Estimated total cost: {ai_list.total_estimated_cost}. '
                 f'Please review and confirm purchases after shopping.'
             )
             return redirect('shopping_list_detail', list_id=ai_list.id)
         else:
-            messages.error(request, "AI failed to generate a shopping list. Please try again later.")
+            messages.error(request, "Failed to generate a shopping list. Please try again later.")
             return redirect('shopping_list_list')
 
-    active_budget = Budget.objects.filter(user=request.user, active=True).order_by('-start_date').first()
+    active_budget = Budget.objects.current_for(request.user)
     if not active_budget:
         messages.warning(request, "You need to set an active budget before creating an AI shopping list.")
         return redirect('create_budget')
@@ -784,22 +836,13 @@ def shopping_list_detail_view(request, list_id):
                     )
 
                     if result is not None:  # Check for None explicitly
-                        # Update budget spending
-                        today = timezone.now().date()
-                        active_budget = Budget.objects.filter(
-                            user=request.user,
-                            active=True,
-                            start_date__lte=today,
-                            end_date__gte=today
-                        ).first()
+                        # The confirmation already charged the budget through the spending ledger
+                        active_budget = Budget.objects.current_for(request.user)
                         
                         if active_budget:
-                            # Use the sync_amount_spent method to ensure data consistency
-                            new_total_spent = active_budget.sync_amount_spent()
-                            
                             messages.success(request, 
                                 f'Shopping list confirmed successfully! £{total_actual_cost} spent. '
-                                f'Budget updated: £{new_total_spent} spent of £{active_budget.amount}. '
+                                f'Budget updated: £{active_budget.amount_spent} spent of £{active_budget.amount}. '
                                 f'Remaining budget: £{active_budget.get_remaining_budget()}'
                             )
                         else:
@@ -808,20 +851,6 @@ def shopping_list_detail_view(request, list_id):
                                 'No active budget found for tracking.'
                             )
                         
-                      
-                        try:
-                        
-                            expired_count = detect_and_process_all_expired_items(request.user)
-                            if expired_count > 0:
-                                messages.info(request, 
-                                    f"Food waste analysis completed. Found {expired_count} expired item(s). "
-                                    "Check your food waste analytics for details."
-                                )
-                        except Exception as waste_error:
-                            messages.warning(request, 
-                                f"Purchases confirmed, but food waste analysis encountered an issue: {str(waste_error)}"
-                            )
-                        
                         # Redirect to shopping list only if successful
                         return redirect('shopping_list_list')
                     
@@ -831,27 +860,14 @@ def shopping_list_detail_view(request, list_id):
             except Exception as e:
                 messages.error(request, f"Error confirming purchases: {str(e)}")
 
-    # Get items for display
-    items_qs = shopping_list.items.all().order_by('-priority', 'item_name')
-    high_priority_items = items_qs.filter(priority='high')
-    medium_priority_items = items_qs.filter(priority='medium')
-    low_priority_items = items_qs.filter(priority='low')
-
-    total_items = items_qs.count()
-    purchased_items = items_qs.filter(purchased=True).count()
-    purchased_percentage = (purchased_items / total_items * 100) if total_items > 0 else 0
-
-    total_estimated = items_qs.aggregate(total=Sum('estimated_price'))['total'] or Decimal('0.00')
-    total_actual = items_qs.aggregate(total=Sum('actual_price'))['total'] or Decimal('0.00')
+    # Fetch the items once and partition them in Python; totals are kept on the list
+    items = list(shopping_list.items.order_by('item_name'))
+    summary = summarize_items(shopping_list, items)
+    total_items = summary['total_items']
 
     # show list detail with enhanced context
     today = timezone.now().date()
-    active_budget = Budget.objects.filter(
-        user=request.user,
-        active=True,
-        start_date__lte=today,
-        end_date__gte=today
-    ).first()
+    active_budget = Budget.objects.current_for(request.user, today)
     
     # Calculate budget information for display
     budget_info = None
@@ -870,27 +886,14 @@ def shopping_list_detail_view(request, list_id):
     )
     
     # Check what user is missing for better AI shopping list generation
-    has_pantry_items = UserPantry.objects.filter(user=request.user, status='active').exists()
-    has_recipes = Recipe.objects.filter(created_by=request.user).exists()
-    has_budget = Budget.objects.filter(user=request.user, active=True).exists()
-    has_user_profile = hasattr(request.user, 'profile') and request.user.profile
-    
-    # Check if user has goals set up
-    has_user_goal = UserGoal.objects.filter(user_profile__user=request.user, active=True).exists()
+    onboarding = get_onboarding_status(request.user)
     
     # Form for adding custom items
     custom_item_form = ShoppingListItemForm()
 
     context = {
         'shopping_list': shopping_list,
-        'high_priority_items': high_priority_items,
-        'medium_priority_items': medium_priority_items,
-        'low_priority_items': low_priority_items,
-        'total_items': total_items,
-        'purchased_items': purchased_items,
-        'purchased_percentage': purchased_percentage,
-        'total_estimated': total_estimated,
-        'total_actual': total_actual,
+        **summary,
         'active_budget': active_budget,
         'budget_info': budget_info,
         'today': today,
@@ -898,11 +901,7 @@ def shopping_list_detail_view(request, list_id):
         
         # Context for showing helpful messages
         'is_ai_generated_empty': is_ai_generated_empty,
-        'has_pantry_items': has_pantry_items,
-        'has_recipes': has_recipes,
-        'has_budget': has_budget,
-        'has_user_profile': has_user_profile,
-        'has_user_goal': has_user_goal,
+        **onboarding,
     }
     return render(request, 'core/shopping_list_detail.html', context)
 
@@ -926,6 +925,22 @@ def delete_shopping_list_view(request, list_id):
 
 #--------------------------------------------------RECIPE MANAGEMENT VIEWS-------------------------------------------------------------------------#
 # core/views.py
+def _facet_links(request, name, entries, active_values):
+    """Facet chips whose links toggle one filter value and keep every other query parameter."""
+    links = []
+    for facet in entries:
+        active = facet['value'] in active_values
+        params = request.GET.copy()
+        if name == 'tag':
+            selected = [value for value in active_values if value != facet['value']]
+            params.setlist('tag', selected if active else selected + [facet['value']])
+        elif active:
+            params.pop(name, None)
+        else:
+            params[name] = facet['value']
+        links.append({**facet, 'active': active, 'query': params.urlencode()})
+    return links
+
 @login_required(login_url='account_login')
 def recipe_list_view(request):
     """Display all recipes with enhanced AI recipe handling"""
@@ -936,14 +951,22 @@ def recipe_list_view(request):
     search_query = request.GET.get('search', '')
     cuisine_filter = request.GET.get('cuisine', '')
     difficulty_filter = request.GET.get('difficulty', '')
+    tag_filters = parse_dietary_tags(','.join(request.GET.getlist('tag')))
+    tag_mode = 'all' if request.GET.get('tag_mode') == 'all' else 'any'
     
     # Apply filters
     if search_query:
-        recipes = recipes.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query) |
-            Q(dietary_tags__icontains=search_query)
-        )
+        recipes = recipes.search(search_query)
+    
+    if tag_filters:
+        recipes = recipes.with_tags(tag_filters, mode=tag_mode)
+    
+    # Hide recipes containing the user's allergens (precomputed bitmask, filtered in SQL)
+    profile = UserProfile.objects.filter(user=request.user).only('allergies').first()
+    allergen_mask = get_user_allergen_matcher(profile.allergies if profile else '').mask
+    recipes = recipes.safe_for(allergen_mask)
+    # Facets count each of cuisine/difficulty without its own filter
+    facet_recipes = recipes
     
     if cuisine_filter:
         recipes = recipes.filter(cuisine=cuisine_filter)
@@ -961,19 +984,35 @@ def recipe_list_view(request):
         del request.session['newly_generated_recipe_ids']
         request.session.modified = True
     
-    # Calculate stats
-    total_recipes = Recipe.objects.count()
-    user_recipes = Recipe.objects.filter(created_by=request.user).count()
-    ai_recipes = Recipe.objects.filter(is_ai_generated=True).count()
+    # Facet counts for the current filter set (one grouped query, cached)
+    facets = get_recipe_facets(facet_recipes, request.user, filters={
+        'search': search_query,
+        'cuisine': cuisine_filter,
+        'difficulty': difficulty_filter,
+        'tags': sorted(tag_filters),
+        'tag_mode': tag_mode,
+        'allergen_mask': allergen_mask,
+    })
+    
+    # Link that flips tag matching between any and all, keeping the other filters
+    mode_params = request.GET.copy()
+    mode_params['tag_mode'] = 'any' if tag_mode == 'all' else 'all'
     
     context = {
         'recipes': recipes,
-        'total_recipes': total_recipes,
-        'user_recipes': user_recipes,
-        'ai_recipes': ai_recipes,
+        'facets': facets,
+        'total_recipes': facets['total'],
+        'user_recipes': facets['mine'],
+        'ai_recipes': facets['ai_generated'],
         'search_query': search_query,
         'cuisine_filter': cuisine_filter,
         'difficulty_filter': difficulty_filter,
+        'tag_filters': tag_filters,
+        'tag_mode': tag_mode,
+        'cuisine_facets': _facet_links(request, 'cuisine', facets['cuisine'], [cuisine_filter]),
+        'difficulty_facets': _facet_links(request, 'difficulty', facets['difficulty'], [difficulty_filter]),
+        'tag_facets': _facet_links(request, 'tag', facets['tags'], tag_filters),
+        'tag_mode_query': mode_params.urlencode(),
         'newly_generated_recipes': newly_generated_recipes,  # Newly generated AI recipes
     }
     
@@ -986,8 +1025,22 @@ def recipe_detail_view(request, recipe_id):
     """
     recipe = get_object_or_404(Recipe, id=recipe_id)
 
+    # Refresh totals if a linked ingredient's nutrition changed since the last computation
+    if recipe.nutrition_dirty:
+        recipe.calculate_nutrition()
+
     # Get ingredients through the proper relationship
-    ingredients_list = recipe.recipeingredient_set.all().select_related('pantry_item')
+    ingredients_list = list(recipe.recipeingredient_set.all().select_related('ingredient'))
+
+    # Flag which catalog ingredients the viewer currently has in their pantry
+    in_pantry_ids = set(UserPantry.objects.filter(
+        user=request.user,
+        status='active',
+        quantity__gt=0,
+        ingredient_id__in=[ri.ingredient_id for ri in ingredients_list]
+    ).values_list('ingredient_id', flat=True))
+    for ri in ingredients_list:
+        ri.in_pantry = ri.ingredient_id in in_pantry_ids
 
     # Parse instructions into steps
     instructions_list = []
@@ -997,10 +1050,12 @@ def recipe_detail_view(request, recipe_id):
     # Handle prep_time and cook_time safely
     total_time = (recipe.prep_time or 0) + (recipe.cook_time or 0)
 
-    # Get similar recipes
-    similar_recipes = Recipe.objects.filter(
-        cuisine=recipe.cuisine
-    ).exclude(id=recipe.id).order_by('?')[:4]
+    # Get similar recipes from the precomputed neighbour table
+    similar_recipes = get_similar_recipes(recipe, limit=4)
+    if not similar_recipes:
+        similar_recipes = Recipe.objects.filter(
+            cuisine=recipe.cuisine
+        ).exclude(id=recipe.id).order_by('-average_rating', '-created_at')[:4]
 
     context = {
         'recipe': recipe,
@@ -1025,13 +1080,21 @@ def create_recipe_view(request):
     if request.method == 'POST':
         try:
             # Call the AI service to generate multiple recipes
-            recipes = generate_multiple_ai_recipes(request.user, num_recipes=3)
+            # Existing catalog recipes that fit the pantry are reused before calling the LLM
+            regenerate = request.POST.get('regenerate') == '1'
+            recipes, stats = suggest_recipes(request.user, num_recipes=3, regenerate=regenerate)
             
             if recipes:
                 # Store the IDs of newly generated recipes in session
                 request.session['newly_generated_recipe_ids'] = [recipe.id for recipe in recipes]
                 request.session.modified = True
                 
+                if stats['reused']:
+                    messages.info(
+                        request,
+                        f"{stats['reused']} recipe(s) matched your pantry from the existing catalog"
+                        f"{' - no AI call was needed' if stats['llm_calls_avoided'] else ''}."
+                    )
                 messages.success(request, f'Successfully generated {len(recipes)} AI recipes! They are highlighted below.')
                 return redirect('recipe_list')
             else:
@@ -1086,6 +1149,7 @@ def edit_recipe_view(request, recipe_id):
                 messages.info(request, 'Recipe image updated successfully!')
             
             updated_recipe.save()
+            refresh_recipe_neighbors([updated_recipe])
             messages.success(request, f'Recipe "{updated_recipe.name}" updated successfully!')
             return redirect('recipe_detail', recipe_id=updated_recipe.id)
         else:
@@ -1145,34 +1209,7 @@ def food_waste_analytics_view(request):
     user = request.user
     today = timezone.now().date()
 
-    signal_expired_count = detect_and_process_all_expired_items(user)
-
-    # Get IDs of items that need to be expired
-    expired_item_ids = UserPantry.objects.filter(
-        user=user,
-        status='active',
-        expiry_date__lt=today
-    ).values_list('id', flat=True)
-    
-    expired_count = 0
-    if expired_item_ids:
-        # Process each expired item
-        for item_id in expired_item_ids:
-            try:
-                item = UserPantry.objects.get(id=item_id, user=user)
-                # mark_as_expired() is idempotent and checks for duplicates
-                if item.mark_as_expired():
-                    expired_count += 1
-            except UserPantry.DoesNotExist:
-                pass  # Item was deleted or doesn't exist
-        
-        # Only show message if we actually processed items
-        if expired_count > 0:
-            messages.info(
-                request, 
-                f"Found and processed {expired_count} expired item(s)."
-            )
-    
+    # Expired items are processed by the scheduled sweep (core.tasks); this view only reads
     # Get all waste records including newly created ones
     waste_records = FoodWasteRecord.objects.filter(user=user)
     
@@ -1205,12 +1242,92 @@ def food_waste_analytics_view(request):
         "waste_records": waste_records.order_by('-waste_date'),
         "waste_by_reason": waste_by_reason,
         "expiring_soon": expiring_soon,
-        "expired_count": expired_count,
         "today": today,
     }
     
     return render(request, "core/food_waste_analytics.html", context)
 
+@login_required(login_url='account_login')
+def pantry_gap_api(request):
+    """
+    Missing and short ingredients for a set of recipes, computed locally
+    without an LLM call. Pass ?recipe=<id> (repeatable); defaults to the
+    three recipes most recently suggested to the user, as used for shopping lists.
+    """
+    recipe_ids = [int(rid) for rid in request.GET.getlist('recipe') if rid.isdigit()]
+    if recipe_ids:
+        recipes = list(Recipe.objects.filter(id__in=recipe_ids).only('id', 'name'))
+    else:
+        recipes = list(
+            Recipe.objects.suggested_to(request.user).only('id', 'name')[:3]
+        )
+
+    gap = analyze_pantry_gap(request.user, recipes)
+    return JsonResponse({
+        'success': True,
+        'recipes': [{'id': recipe.id, 'name': recipe.name} for recipe in recipes],
+        **gap,
+    })
+
+def _item_patch_response(request, list_id, parse_updates):
+    """Shared handling for the item PATCH endpoints."""
+    try:
+        body = json.loads(request.body or b"{}")
+        updates = parse_updates(body)
+        items, totals = update_items(request.user, list_id, updates)
+    except (json.JSONDecodeError, ValueError) as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except (ShoppingList.DoesNotExist, ShoppingListItem.DoesNotExist):
+        return JsonResponse({'success': False, 'message': 'Shopping list item not found.'}, status=404)
+    except ItemVersionConflict as conflict:
+        return JsonResponse({
+            'success': False,
+            'message': str(conflict),
+            'items': conflict.items,
+        }, status=409)
+
+    return JsonResponse({
+        'success': True,
+        'items': [serialize_item(item) for item in items],
+        'totals': totals,
+    })
+
+@login_required(login_url='account_login')
+@require_http_methods(["PATCH"])
+def shopping_list_item_api(request, list_id, item_id):
+    """
+    Update one shopping list item in place (purchased, actual_price, quantity,
+    expiry_date). The body must carry the item's current `version`; a stale
+    version returns 409 with the item's latest state.
+    """
+    def parse_updates(body):
+        version, changes = parse_item_changes(body)
+        return [(item_id, version, changes)]
+
+    return _item_patch_response(request, list_id, parse_updates)
+
+@login_required(login_url='account_login')
+@require_http_methods(["PATCH"])
+def shopping_list_items_api(request, list_id):
+    """
+    Update a small batch of items: {"items": [{"id": ..., "version": ..., ...}]}.
+    The batch is applied all-or-nothing.
+    """
+    def parse_updates(body):
+        entries = body.get('items') if isinstance(body, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError("Expected an 'items' list.")
+        updates = []
+        for entry in entries:
+            version, changes = parse_item_changes(entry)
+            try:
+                updates.append((int(entry['id']), version, changes))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Each item update needs a numeric 'id'.")
+        return updates
+
+    return _item_patch_response(request, list_id, parse_updates)
+
 @login_required(login_url='account_login')
 def process_pantry_image_api(request):
     """
@@ -1,5 +1,6 @@
 from decouple import config
 from pathlib import Path
+from celery.schedules import crontab
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'whitenoise.runserver_nostatic',
 
     # 'storages',
@@ -105,6 +107,50 @@ DATABASES = {
     }
 }
 
+# Cache configuration - Redis when REDIS_URL is set, local memory otherwise
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Celery: background tasks and periodic jobs (worker: `celery -A pantrycheff worker -B`)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=REDIS_URL or 'memory://')
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    # Record waste for and expire pantry items past their date, for every user
+    'sweep-expired-pantry-items': {
+        'task': 'core.sweep_expired_pantry_items',
+        'schedule': crontab(minute=5),
+    },
+    # Reset budget balances that drifted from the spending ledger
+    'reconcile-budget-balances': {
+        'task': 'core.reconcile_budget_balances',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# Pantry items processed per transaction by the expiry sweep
+EXPIRY_SWEEP_CHUNK_SIZE = config('EXPIRY_SWEEP_CHUNK_SIZE', default=500, cast=int)
+
+# Trained shopping-item category classifier (see `manage.py train_category_classifier`)
+CATEGORY_CLASSIFIER_PATH = config(
+    'CATEGORY_CLASSIFIER_PATH', default=str(BASE_DIR / 'var' / 'category_classifier.json')
+)
+
 # # Email configuration
 EMAIL_BACKEND = config('EMAIL_BACKEND')
 EMAIL_HOST = config('EMAIL_HOST')
@@ -201,4 +247,10 @@ ACCOUNT_SESSION_REMEMBER = True
 ACCOUNT_LOGOUT_ON_GET = True
 
 OPENAI_API_KEY= config('OPENAI_API_KEY').strip()
+
+# Approximate token budget for the pantry section of AI recipe/shopping prompts
+AI_PROMPT_TOKEN_BUDGET = config('AI_PROMPT_TOKEN_BUDGET', default=1500, cast=int)
+
+# How long (seconds) AI recipes/shopping lists are reused for an unchanged pantry fingerprint
+AI_GENERATION_CACHE_TTL = config('AI_GENERATION_CACHE_TTL', default=6 * 60 * 60, cast=int)
 CSRF_TRUSTED_ORIGINS = ['https://bleedingedge-production.up.railway.app', 'https://pantrychef.site', 'https://www.pantrychef.site']
\ No newline at end of file